@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import User, Project, ProjectFile, CompileJob ,LaTeXTemplate
+from .tasks.compile_tasks import compile_batch
 
 # 1. تسجيل موديل المستخدم المخصص
 # نستخدم UserAdmin الافتراضي لأنه يوفر واجهة تغيير كلمة المرور والصلاحيات جاهزة
@@ -33,10 +34,22 @@ class ProjectFileAdmin(admin.ModelAdmin):
 # 4. إعداد لوحة تحكم وظائف الترجمة (Compilation Jobs)
 @admin.register(CompileJob)
 class CompileJobAdmin(admin.ModelAdmin):
-    list_display = ('short_id', 'project', 'triggered_by', 'status', 'created_at')
-    list_filter = ('status', 'created_at')
+    list_display = ('short_id', 'project', 'triggered_by', 'status', 'queue', 'created_at')
+    list_filter = ('status', 'queue', 'created_at')
     # نجعل السجلات للقراءة فقط لمنع التلاعب بها يدوياً
-    readonly_fields = ('logs', 'pdf_url', 'created_at')
+    readonly_fields = (
+        'logs', 'error_message', 'cv_data', 'pdf_url', 'created_at',
+        'queue_wait_seconds', 'ai_seconds', 'render_seconds',
+        'compile_seconds', 'storage_seconds', 'duration_seconds'
+    )
+    actions = ['recompile_batch']
+    
+    # إعادة توليد الـ PDFs المختارة في Task واحدة (طابور compile.batch)
+    @admin.action(description='Recompile selected jobs (batch)')
+    def recompile_batch(self, request, queryset):
+        job_ids = [str(job_id) for job_id in queryset.values_list('id', flat=True)]
+        task = compile_batch.delay(job_ids=job_ids)
+        self.message_user(request, f"Batch compile queued for {len(job_ids)} job(s) (task {task.id})")
     
     # دالة صغيرة لعرض جزء من الـ UUID بدلاً من عرضه كاملاً
     def short_id(self, obj):
@@ -51,6 +64,14 @@ class LaTeXTemplateAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description', 'slug')
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ('usage_count', 'created_at', 'updated_at')
+    actions = ['regenerate_cvs']
+    
+    # بعد تصليح قالب: إعادة توليد كل السير الذاتية الناجحة اللي بتستخدمه
+    @admin.action(description='Regenerate all CVs using selected templates (batch)')
+    def regenerate_cvs(self, request, queryset):
+        for template in queryset:
+            task = compile_batch.delay(template_id=str(template.id))
+            self.message_user(request, f"Batch compile queued for template {template.name} (task {task.id})")
     
     fieldsets = (
         ('معلومات أساسية', {
@@ -1,5 +1,11 @@
 import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.services.realtime_service import TERMINAL_STATUSES, job_group, job_status_payload
 
 class EditorConsumer(AsyncWebsocketConsumer):
     """
@@ -59,6 +65,71 @@ class EditorConsumer(AsyncWebsocketConsumer):
         message = event['message']
         await self.send(bytes_data=message)
 
+class JobStatusConsumer(AsyncWebsocketConsumer):
+    """
+    Push لحالة الـ CompileJob بدل Polling على /api/check-job-status/<job_id>/
+
+    ws/jobs/<job_id>/?token=<auth token>
+        - أول رسالة: الحالة الحالية من الـ DB
+        - بعدها كل انتقال بيتبعت من transition() (الـ Workers) لـ Group job_<job_id>
+        - وأحداث الـ Pipeline ({"type": "cv_data.partial" | "cv_data.complete", ...}) على نفس الـ Group
+        - الـ Client ما بيبعتش حاجة: الرسايل منه بتتجاهل (مفيش Broadcast من Client لـ Group)
+        - الـ Socket بيتقفل بعد حالة نهائية (SUCCESS / FAILED / CANCELLED)
+    """
+    async def connect(self):
+        self.job_id = self.scope['url_route']['kwargs']['job_id']
+        self.group_name = job_group(self.job_id)
+
+        user = await self.get_user()
+        if user is None:
+            await self.close(code=4401)
+            return
+
+        # الاشتراك قبل قراية الحالة عشان ما يفوتناش انتقال بينهم
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        payload = await self.get_job_status(user)
+        if payload is None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await self.close(code=4404)
+            return
+
+        await self.accept()
+        await self.send_status(json.dumps(payload, ensure_ascii=False, cls=DjangoJSONEncoder))
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def job_status(self, event):
+        await self.send_status(event['message'])
+
+    async def job_event(self, event):
+        await self.send(text_data=event['message'])
+
+    async def send_status(self, message):
+        await self.send(text_data=message)
+        if json.loads(message)['status'] in TERMINAL_STATUSES:
+            await self.close()
+
+    async def get_user(self):
+        # الـ Browser WebSocket ما بيبعتش Authorization header، فالـ Token في الـ Query string
+        token = parse_qs(self.scope.get('query_string', b'').decode()).get('token', [None])[0]
+        if not token:
+            user = self.scope.get('user')
+            return user if user is not None and user.is_authenticated else None
+        return await database_sync_to_async(self._user_for_token)(token)
+
+    @staticmethod
+    def _user_for_token(key):
+        from rest_framework.authtoken.models import Token
+        token = Token.objects.select_related('user').filter(key=key).first()
+        return token.user if token and token.user.is_active else None
+
+    @database_sync_to_async
+    def get_job_status(self, user):
+        from core.models import CompileJob
+        job = CompileJob.objects.filter(id=self.job_id, triggered_by=user).first()
+        return job_status_payload(job) if job else None
+
 # Scientific Explanation:
 # 1. Group Layer: Channels uses Redis Pub/Sub to broadcast messages to all connected clients 
 #    in the same `project_id` group.
@@ -10,16 +10,29 @@ from django.utils import timezone
 from django.utils.html import strip_tags
 from django_ratelimit.decorators import ratelimit
 from django.core.cache import cache
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 
 from .models import LaTeXTemplate, CompileJob, Project
 from .serializers import TemplateSerializer
-from .services.openai_service import OpenAIService
 from .services.latex_service import LaTeXService
-from .tasks.compile_tasks import compile_latex_to_pdf
+from .services.pdf_import_cache_service import PDFImportCacheService, get_pdf_import_cache
+from .services.pdf_import_service import create_import, get_import
+from .services.job_status_cache_service import JobStatusCacheService, get_job_status_cache
+from .services.job_status_listener import get_job_status_listener, wait_for_change
+from .services.realtime_service import job_status_payload
+from .tasks.compile_tasks import compile_latex_to_pdf, cancel_superseded_jobs
+from .tasks.routing import get_queue
 
 from rest_framework.permissions import AllowAny 
 from django.core.cache import cache 
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -69,83 +82,102 @@ def get_current_user(request):
         'email': user.email,
         'is_premium': getattr(user, 'is_premium', False),
     })
-# في ملف backend/core/cv_views.py
-
-from rest_framework.parsers import MultiPartParser, FormParser
-from pypdf import PdfReader
-import io
-
-# ... (الاستيرادات السابقة)
-
 @api_view(['POST'])
 @permission_classes([AllowAny]) # مسموح للجميع
 def parse_cv_from_pdf(request):
     """
-    استلام ملف PDF واستخراج البيانات منه
+    استلام ملف PDF وبدء استخراج البيانات منه في الخلفية
+
+    POST /api/parse-cv-pdf/  ->  202 {import_id}
+    النتيجة من GET /api/import-status/<import_id>/ (أو 200 بالنتيجة على طول لو الملف نفسه اتحلل قبل كده)
     """
     if 'file' not in request.FILES:
         return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
     
     pdf_file = request.FILES['file']
-    
+    if pdf_file.size > settings.PDF_IMPORT_MAX_BYTES:
+        return Response(
+            {'error': f'حجم الملف أكبر من {settings.PDF_IMPORT_MAX_BYTES // (1024 * 1024)} ميجا.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if pdf_file.read(5) != b'%PDF-':
+        return Response({'error': 'يرجى رفع ملف بصيغة PDF فقط.'}, status=status.HTTP_400_BAD_REQUEST)
+    pdf_file.seek(0)
+
     try:
-        # 1. قراءة الملف واستخراج النص
-        reader = PdfReader(io.BytesIO(pdf_file.read()))
-        raw_text = ""
-        for page in reader.pages:
-            raw_text += page.extract_text() + "\n"
-            
-        if len(raw_text.strip()) < 50:
-            return Response({'error': 'لم نتمكن من قراءة النص، الملف قد يكون صورة.'}, status=400)
-
-        # 2. تحليل النص بالذكاء الاصطناعي
-        openai_service = OpenAIService()
-        from core.schemas.classic import ClassicArabicCVSchema
-        structured_data = openai_service.parse_resume_text(raw_text, ClassicArabicCVSchema)
-        
-        # 3. تجهيز البيانات
-        cv_data = structured_data.model_dump()
-        default_template = LaTeXTemplate.objects.filter(is_active=True).first()
-        cv_data['template_id'] = str(default_template.id) if default_template else None
-
-        # 4. معالجة التخزين حسب حالة المستخدم (الحل هنا ✅)
-        if request.user.is_authenticated:
-            # -- الحالة الأولى: مستخدم مسجل --
-            # ننشئ له مشروع ونحفظه في الداتابيز عادي
-            project = Project.objects.create(
-                name=f"Imported CV - {cv_data.get('full_name', 'User')}",
-                owner=request.user 
-            )
-            
-            job = CompileJob.objects.create(
-                project=project,
-                triggered_by=request.user,
-                status='SUCCESS',
-                cv_data=cv_data
-            )
-            
-            return Response({
-                'success': True,
-                'job_id': str(job.id),  # بنرجع الـ ID عشان المحرر يفتحه
-                'cv_data': cv_data,
-                'is_guest': False
-            })
-            
-        else:
-            # -- الحالة الثانية: زائر (Guest) --
-            # 🛑 لا ننشئ مشروع في الداتابيز لتجنب خطأ الـ owner_id null
-            # نرجع البيانات بس، والفرونت يخزنها عنده مؤقتاً
+        from core.tasks.import_tasks import finish_import, import_cv_from_pdf
+
+        user = request.user if request.user.is_authenticated else None
+        state = create_import(owner_id=user.id if user else None)
+
+        # 1. نفس الملف اتحلل قبل كده؟ (بصمة المحتوى، قبل أي Parsing)
+        file_digest = PDFImportCacheService.compute_digest(pdf_file)
+        import_cache = get_pdf_import_cache()
+        cached = import_cache.get(file_digest) if import_cache else None
+        if cached and cached['cv_data'] is not None:
+            state = finish_import(state['import_id'], cached['cv_data'], str(user.id) if user else None)
             return Response({
+                'import_id': state['import_id'],
+                'status': state['status'],
                 'success': True,
-                'job_id': None,  # مفيش ID لأنه متسجلش
-                'cv_data': cv_data,
-                'is_guest': True
+                'job_id': state['job_id'],
+                'cv_data': state['cv_data'],
+                'is_guest': user is None,
             })
 
+        # 2. حفظ الملف على الـ Storage بالـ Chunks (من غير ما يتقري كله في الذاكرة)
+        file_name = default_storage.save(f"imports/{state['import_id']}.pdf", pdf_file)
+
+        # 3. الاستخراج والتحليل في الـ Worker
+        import_cv_from_pdf.apply_async(
+            args=[state['import_id'], file_name, str(user.id) if user else None, file_digest],
+            queue=get_queue('pipeline', user)
+        )
+
+        return Response({
+            'import_id': state['import_id'],
+            'status': state['status'],
+            'is_guest': user is None,
+        }, status=status.HTTP_202_ACCEPTED)
+
     except Exception as e:
-        # طباعة الخطأ في التيرمينال عشان نشوفه لو حصل حاجة تانية
-        print(f"Server Error in PDF Parsing: {e}")
+        logger.error(f"PDF import could not start: {str(e)}")
         return Response({'error': f'فشل تحليل الملف: {str(e)}'}, status=500)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def pdf_import_status(request, import_id):
+    """
+    حالة استيراد PDF
+
+    GET /api/import-status/<import_id>/
+    """
+    state = get_import(import_id)
+    if state is None:
+        return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    # استيراد مستخدم مسجل مايظهرش لغيره
+    if state.get('owner_id') and str(getattr(request.user, 'id', '')) != state['owner_id']:
+        return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    response_data = {
+        'import_id': state['import_id'],
+        'status': state['status'],
+        'is_guest': not state.get('owner_id'),
+    }
+    if state['status'] == 'SUCCESS':
+        response_data.update({
+            'success': True,
+            'job_id': state.get('job_id'),  # بنرجع الـ ID عشان المحرر يفتحه (None للضيف)
+            'cv_data': state.get('cv_data'),
+        })
+    elif state['status'] == 'FAILED':
+        response_data['error'] = state.get('error')
+
+    return Response(response_data)
+
+
 # في ملف cv_views.py
 
 @api_view(['POST'])
@@ -252,10 +284,12 @@ def generate_cv_with_ai(request):
             owner=request.user if is_authenticated else None # دعم الضيوف
         )
         
+        queue = get_queue('pipeline', request.user)
         job = CompileJob.objects.create(
             project=project,
             triggered_by=request.user if is_authenticated else None,
             status='QUEUED',
+            queue=queue,
             cv_data={'raw_prompt': user_prompt, 'template_id': template_id, 'language': language}
         )
 
@@ -265,7 +299,7 @@ def generate_cv_with_ai(request):
 
         # 8. إطلاق الـ Pipeline الخلفي (AI + LaTeX + PDF)
         from core.tasks.compile_tasks import full_ai_cv_pipeline
-        full_ai_cv_pipeline.delay(str(job.id))
+        full_ai_cv_pipeline.apply_async(args=[str(job.id)], queue=queue)
 
         # 9. رد فوري للفرونت إند (Speed & SEO Compatibility)
         return Response({
@@ -278,6 +312,20 @@ def generate_cv_with_ai(request):
     except Exception as e:
         return Response({'error': f'فشل في بدء العملية: {str(e)}'}, status=500)
     
+def snapshot_response(request, data, etag, modified):
+    """
+    رد بـ ETag / Last-Modified، و 304 من غير Body لو الـ Client عنده نفس النسخة
+    """
+    etag = f'"{etag}"'
+    last_modified = int(modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified) or Response(data)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # الـ Browser يحتفظ بالرد بس يتأكد كل مرة (If-None-Match)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_cv_data(request, job_id):
@@ -285,29 +333,102 @@ def get_cv_data(request, job_id):
     ✅ جلب بيانات السيرة الذاتية للتعديل
     
     GET /api/get-cv-data/<job_id>/
+    من الـ Snapshot في Redis لو موجود، والـ DB لو لأ
     """
-    try:
-        job = CompileJob.objects.get(id=job_id, triggered_by=request.user)
-        
-        if not job.cv_data:
+    status_cache = get_job_status_cache()
+    snapshot = status_cache.get(job_id, with_cv_data=True) if status_cache else None
+    
+    if snapshot is None:
+        try:
+            job = CompileJob.objects.select_related('payload').get(id=job_id, triggered_by=request.user)
+        except CompileJob.DoesNotExist:
+            return Response(
+                {'error': 'Job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        cv_data = job.cv_data
+        if not cv_data:
             return Response(
                 {'error': 'No CV data found for this job'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
+        snapshot = status_cache.store(job, cv_data) if status_cache else JobStatusCacheService.build_snapshot(job, cv_data)
+        job_status, pdf_url = job.status, job.pdf_url
+    
+    elif snapshot['owner'] != str(request.user.id):
+        return Response(
+            {'error': 'Job not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    else:
+        cv_data = snapshot['cv_data']
+        job_status, pdf_url = snapshot['status']['status'], snapshot['pdf_url']
+    
+    return snapshot_response(request, {
+        'success': True,
+        'cv_data': cv_data,
+        'template_id': cv_data.get('template_id'),
+        'status': job_status,
+        'pdf_url': pdf_url
+    }, f"{snapshot['status_etag']}-{snapshot['cv_etag']}", snapshot['modified'])
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def preview_cv_html(request):
+    """
+    ✅ معاينة HTML فورية أثناء التعديل (بدون Tectonic)
+
+    POST /api/preview-cv/
+    Body:
+    {
+        "cv_data": {...},
+        "template_id": "uuid"  (اختياري)
+    }
+
+    الـ PDF النهائي بيتولد فقط من update-cv-data
+    """
+    cv_data = request.data.get('cv_data')
+    template_id = request.data.get('template_id')
+
+    if not cv_data:
+        return Response(
+            {'error': 'cv_data is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    template_id = template_id or cv_data.get('template_id')
+    if template_id:
+        try:
+            template_id = uuid.UUID(str(template_id))
+        except ValueError:
+            return Response({'error': 'Invalid template_id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        template_file = None
+        if template_id:
+            template = LaTeXTemplate.objects.get(id=template_id, is_active=True)
+            template_file = template.latex_file_name
+
+        html = LaTeXService().render_html_preview(template_file, cv_data)
+
         return Response({
             'success': True,
-            'cv_data': job.cv_data,
-            'template_id': job.cv_data.get('template_id'),
-            'status': job.status,
-            'pdf_url': job.pdf_url
+            'html': html
         })
-        
-    except CompileJob.DoesNotExist:
+
+    except LaTeXTemplate.DoesNotExist:
         return Response(
-            {'error': 'Job not found'},
+            {'error': 'Template not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+    except Exception as e:
+        logger.error(f"CV preview failed: {str(e)}")
+        return Response(
+            {'error': f'Failed to render preview: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 
 @api_view(['POST'])
@@ -346,29 +467,38 @@ def update_cv_data(request):
         
         # Generate new LaTeX
         latex_service = LaTeXService()
+        render_started = time.perf_counter()
         latex_content = latex_service.render_latex(
             template_name=template.latex_file_name,
             data=cv_data
         )
+        render_seconds = time.perf_counter() - render_started
         
         # Create new CompileJob
+        queue = get_queue('compile', request.user)
         new_job = CompileJob.objects.create(
             project=old_job.project,
             triggered_by=request.user,
             status='QUEUED',
+            queue=queue,
+            render_seconds=render_seconds,
             cv_data=cv_data
         )
         
         # Queue compilation
         font_path = latex_service.get_arabic_font_path()
         task = compile_latex_to_pdf.apply_async(
-            args=[latex_content, str(new_job.id), font_path],
-            countdown=2
+            args=[latex_content, str(new_job.id), font_path, template.latex_file_name],
+            countdown=2,
+            queue=queue
         )
         
         new_job.celery_task_id = task.id
         new_job.save(update_fields=['celery_task_id'])
         
+        # Latest-wins: أي Compile أقدم لنفس المشروع مبقاش له لازمة
+        cancel_superseded_jobs(new_job)
+        
         logger.info(f"CV updated: new job {new_job.id} created from old job {job_id}")
         
         return Response({
@@ -398,37 +528,115 @@ def update_cv_data(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def check_job_status(request, job_id):
+def current_job_status(request, job_id):
     """
     التحقق من حالة توليد السيرة الذاتية
+
+    بيرد من الـ Snapshot في Redis (304 لو الحالة ما اتغيرتش)، والـ DB بس لو مفيش Snapshot
     """
-    try:
-        job = CompileJob.objects.get(id=job_id, triggered_by=request.user)
-        
-        response_data = {
-            'job_id': str(job.id),
-            'status': job.status,
-            'created_at': job.created_at,
-        }
-        
-        if job.status == 'SUCCESS':
-            response_data.update({
-                'pdf_url': job.pdf_url,
-                'completed_at': job.completed_at,
-                'duration_seconds': job.duration_seconds,
-            })
-        elif job.status == 'FAILED':
-            response_data['error'] = job.error_message
-        elif job.status == 'PROCESSING':
-            response_data['message'] = 'جاري توليد السيرة الذاتية...'
-        
-        return Response(response_data)
-        
-    except CompileJob.DoesNotExist:
+    status_cache = get_job_status_cache()
+    snapshot = status_cache.get(job_id) if status_cache else None
+    
+    if snapshot is None:
+        try:
+            job = CompileJob.objects.get(id=job_id, triggered_by=request.user)
+        except CompileJob.DoesNotExist:
+            return Response(
+                {'error': 'Job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        snapshot = status_cache.store(job) if status_cache else JobStatusCacheService.build_snapshot(job)
+        response_data = job_status_payload(job)
+    
+    elif snapshot['owner'] != str(request.user.id):
         return Response(
             {'error': 'Job not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+    
+    else:
+        response_data = snapshot['status']
+    
+    return snapshot_response(request, response_data, snapshot['status_etag'], snapshot['modified'])
+
+
+async def check_job_status(request, job_id):
+    """
+    GET /api/check-job-status/<job_id>/[?wait=<seconds>]
+
+    الـ Client يفضّل ws/jobs/<job_id>/ (Push)، والـ Endpoint ده Fallback
+    مع wait + If-None-Match: لو الحالة هي نفس اللي عند الـ Client، الطلب بيستنى (Async، من غير Thread)
+    لحد أول انتقال أو لحد الـ wait، وبعدها بيرد بالحالة الجديدة (أو 304)
+    """
+    check = sync_to_async(current_job_status)
+    try:
+        wait = min(float(request.GET.get('wait', 0)), settings.JOB_STATUS_LONG_POLL_MAX_SECONDS)
+    except ValueError:
+        wait = 0
+    
+    # الـ Listener عايش في الـ Event loop بتاع الـ Process، وده موجود تحت ASGI بس
+    # (تحت WSGI كل طلب Async بيتنفذ في Loop جديد، فالطلب بيرد فوراً زي الـ Polling العادي)
+    long_poll = wait > 0 and settings.JOB_STATUS_CACHE_ENABLED and isinstance(request, ASGIRequest)
+    listener = await get_job_status_listener() if long_poll else None
+    if listener is None:
+        return await check(request, job_id)
+    
+    with listener.watch(job_id) as changed:
+        response = await check(request, job_id)
+        if response.status_code != status.HTTP_304_NOT_MODIFIED:
+            return response
+        await wait_for_change(changed, wait)
+    return await check(request, job_id)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_job_status(request):
+    """
+    حالة مجموعة Jobs في طلب واحد (الـ Dashboard / التاريخ) بدل check-job-status لكل Job
+
+    POST /api/job-statuses/
+    Body: {"job_ids": ["uuid", ...]}
+
+    الـ Snapshots من Redis في Round trip واحد، واللي مش موجود في Query واحدة على الـ DB
+    (Jobs المستخدم بس، والباقي في not_found)
+    """
+    job_ids = request.data.get('job_ids')
+    if not isinstance(job_ids, list) or not job_ids:
+        return Response({'error': 'job_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(job_ids) > settings.JOB_STATUS_BATCH_MAX_IDS:
+        return Response(
+            {'error': f'Too many job_ids (max {settings.JOB_STATUS_BATCH_MAX_IDS})'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        job_ids = list(dict.fromkeys(str(uuid.UUID(str(job_id))) for job_id in job_ids))
+    except ValueError:
+        return Response({'error': 'Invalid job id'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    user_id = str(request.user.id)
+    status_cache = get_job_status_cache()
+    snapshots = status_cache.get_many(job_ids) if status_cache else {}
+    statuses = {
+        job_id: snapshot['status']
+        for job_id, snapshot in snapshots.items() if snapshot['owner'] == user_id
+    }
+    
+    missing = [job_id for job_id in job_ids if job_id not in snapshots]
+    if missing:
+        # رسالة الخطأ في الـ Payload: بتيجي في نفس الـ Query من غير الـ logs والـ cv_data
+        jobs = CompileJob.objects.filter(id__in=missing, triggered_by=request.user) \
+            .select_related('payload').defer('payload__logs_blob', 'payload__cv_data_blob')
+        jobs = list(jobs)
+        for job in jobs:
+            statuses[str(job.id)] = job_status_payload(job)
+        if status_cache:
+            status_cache.store_many(jobs)
+    
+    return Response({
+        'jobs': [statuses[job_id] for job_id in job_ids if job_id in statuses],
+        'not_found': [job_id for job_id in job_ids if job_id not in statuses],
+    })
 
 
 @api_view(['GET'])
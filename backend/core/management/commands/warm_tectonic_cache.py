@@ -0,0 +1,111 @@
+"""
+Warm the shared Tectonic cache at deploy time
+
+Usage:
+    python manage.py warm_tectonic_cache
+    python manage.py warm_tectonic_cache --template classic-arabic --verify-offline
+    python manage.py warm_tectonic_cache --rebuild-formats
+"""
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import LaTeXTemplate
+from core.services.latex_service import LaTeXService
+from core.services.preamble_format_service import PreambleFormatService
+from core.services.tectonic_service import get_cache_dir, run_tectonic
+
+
+class Command(BaseCommand):
+    help = (
+        'Compile every active template once so the Tectonic bundle and format cache are pre-seeded, '
+        'and build precompiled preamble formats when xelatex is available'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--template',
+            help='Slug of a single template to warm (default: all active templates)'
+        )
+        parser.add_argument(
+            '--verify-offline',
+            action='store_true',
+            help='Re-compile each template with --only-cached to prove no network is needed'
+        )
+        parser.add_argument(
+            '--rebuild-formats',
+            action='store_true',
+            help='Retry preamble formats whose previous build failed'
+        )
+
+    def handle(self, *args, **options):
+        templates = LaTeXTemplate.objects.filter(is_active=True)
+        if options['template']:
+            templates = templates.filter(slug=options['template'])
+
+        latex_service = LaTeXService()
+        targets = [(t.latex_file_name, t.schema_class_name) for t in templates]
+
+        # لو الداتابيز فاضية (أول Deploy) نستخدم ملفات القوالب مباشرة
+        if not targets and not options['template']:
+            template_dir = Path(latex_service.jinja_env.loader.searchpath[0])
+            targets = [(p.name, 'ClassicArabicCVSchema') for p in sorted(template_dir.glob('*.tex'))]
+
+        if not targets:
+            raise CommandError('No templates to warm')
+
+        self.stdout.write(f"Tectonic cache: {get_cache_dir()}")
+        preamble_format = PreambleFormatService()
+
+        failures = 0
+        for template_name, schema_class_name in targets:
+            latex_content = latex_service.render_latex(
+                template_name,
+                latex_service.get_sample_data(schema_class_name)
+            )
+
+            passes = [('online', False)]
+            if options['verify_offline']:
+                passes.append(('offline', True))
+
+            for label, offline in passes:
+                elapsed, error = self._compile(latex_content, latex_service.get_arabic_font_path(), offline)
+                if error:
+                    failures += 1
+                    self.stderr.write(self.style.ERROR(f"{template_name} [{label}] failed: {error}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{template_name} [{label}] {elapsed:.2f}s"))
+
+            # Precompiled preamble (مرة واحدة لكل نسخة قالب؛ الـ Workers ما بيبنوهوش)
+            if preamble_format.is_available():
+                fmt_path = preamble_format.build_format(template_name, force=options['rebuild_formats'])
+                if fmt_path:
+                    self.stdout.write(self.style.SUCCESS(f"{template_name} [format] {fmt_path.name}"))
+                else:
+                    self.stdout.write(self.style.WARNING(f"{template_name} [format] not built, Tectonic will be used"))
+
+        if failures:
+            raise CommandError(f"{failures} compile(s) failed while warming the cache")
+
+    def _compile(self, latex_content: str, font_path: str, offline: bool):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            tex_file = tmpdir / 'cv.tex'
+            tex_file.write_text(latex_content, encoding='utf-8')
+            if font_path:
+                shutil.copy(font_path, tmpdir / Path(font_path).name)
+
+            started = time.perf_counter()
+            try:
+                # أول تشغيل ممكن يحمل الـ Bundle كله، فبنديله وقت أطول من الـ Worker
+                result = run_tectonic(tex_file, cwd=tmpdir, timeout=900, offline=offline)
+            except FileNotFoundError:
+                raise CommandError('tectonic executable not found on PATH')
+            elapsed = time.perf_counter() - started
+
+            if result.returncode != 0 or not (tmpdir / 'cv.pdf').exists():
+                return elapsed, (result.stderr or result.stdout)[:500]
+            return elapsed, None
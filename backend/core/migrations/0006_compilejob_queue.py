@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 02:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_latextemplate_is_premium'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compilejob',
+            name='queue',
+            field=models.CharField(blank=True, default='', help_text='Celery queue the job was dispatched to', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='projects', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
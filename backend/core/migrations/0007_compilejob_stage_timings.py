@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_compilejob_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compilejob',
+            name='ai_seconds',
+            field=models.FloatField(blank=True, help_text='OpenAI extraction', null=True),
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='compile_seconds',
+            field=models.FloatField(blank=True, help_text='Tectonic / xelatex', null=True),
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='queue_wait_seconds',
+            field=models.FloatField(blank=True, help_text='created_at -> started_at', null=True),
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='render_seconds',
+            field=models.FloatField(blank=True, help_text='Jinja LaTeX rendering', null=True),
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='storage_seconds',
+            field=models.FloatField(blank=True, help_text='PDF upload to storage', null=True),
+        ),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 6.0 on 2026-10-18 02:15
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BATCH_SIZE = 500
+
+
+# نسخة ثابتة من core.services.payload_codec وقت الـ Migration دي: تغيير الـ Codec بعد كده ما يأثرش عليها
+# (أول بايت: b'Z' zstd، b'z' zlib، b'R' بدون ضغط)
+def _encode_bytes(raw):
+    if len(raw) < 64:
+        return b'R' + raw
+    if zstandard is not None:
+        return b'Z' + zstandard.ZstdCompressor(level=3).compress(raw)
+    return b'z' + zlib.compress(raw, 6)
+
+
+def _decode_bytes(blob):
+    blob = bytes(blob)
+    codec, body = blob[:1], blob[1:]
+    if codec == b'Z':
+        return zstandard.ZstdDecompressor().decompress(body)
+    if codec == b'z':
+        return zlib.decompress(body)
+    return body
+
+
+def _encode_text(text):
+    return _encode_bytes(text.encode('utf-8')) if text else None
+
+
+def _decode_text(blob):
+    return _decode_bytes(blob).decode('utf-8') if blob is not None else ''
+
+
+def _encode_json(data):
+    if data is None:
+        return None
+    return _encode_bytes(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def _decode_json(blob):
+    return json.loads(_decode_bytes(blob)) if blob is not None else None
+
+
+def move_payloads_out_of_row(apps, schema_editor):
+    CompileJob = apps.get_model('core', 'CompileJob')
+    CompileJobPayload = apps.get_model('core', 'CompileJobPayload')
+
+    payloads, templated = [], []
+
+    def flush():
+        CompileJobPayload.objects.bulk_create(payloads)
+        CompileJob.objects.bulk_update(templated, ['cv_template_id'])
+        payloads.clear()
+        templated.clear()
+
+    jobs = CompileJob.objects.only('id', 'logs', 'error_message', 'cv_data')
+    for job in jobs.iterator(chunk_size=BATCH_SIZE):
+        template_id = job.cv_data.get('template_id') if isinstance(job.cv_data, dict) else None
+        if template_id:
+            job.cv_template_id = str(template_id)
+            templated.append(job)
+        if job.logs or job.error_message or job.cv_data is not None:
+            payloads.append(CompileJobPayload(
+                job_id=job.id,
+                logs_blob=_encode_text(job.logs),
+                error_blob=_encode_text(job.error_message),
+                cv_data_blob=_encode_json(job.cv_data),
+            ))
+        if len(payloads) >= BATCH_SIZE or len(templated) >= BATCH_SIZE:
+            flush()
+    flush()
+
+
+def move_payloads_back_in_row(apps, schema_editor):
+    CompileJob = apps.get_model('core', 'CompileJob')
+    CompileJobPayload = apps.get_model('core', 'CompileJobPayload')
+
+    jobs = []
+    for payload in CompileJobPayload.objects.iterator(chunk_size=BATCH_SIZE):
+        jobs.append(CompileJob(
+            id=payload.job_id,
+            logs=_decode_text(payload.logs_blob),
+            error_message=_decode_text(payload.error_blob),
+            cv_data=_decode_json(payload.cv_data_blob),
+        ))
+        if len(jobs) >= BATCH_SIZE:
+            CompileJob.objects.bulk_update(jobs, ['logs', 'error_message', 'cv_data'])
+            jobs = []
+    CompileJob.objects.bulk_update(jobs, ['logs', 'error_message', 'cv_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_compilejob_stage_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompileJobPayload',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='core.compilejob')),
+                ('logs_blob', models.BinaryField(blank=True, null=True)),
+                ('error_blob', models.BinaryField(blank=True, null=True)),
+                ('cv_data_blob', models.BinaryField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Compile Job Payload',
+                'verbose_name_plural': 'Compile Job Payloads',
+            },
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='cv_template_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.RunPython(move_payloads_out_of_row, move_payloads_back_in_row),
+        migrations.RemoveField(
+            model_name='compilejob',
+            name='cv_data',
+        ),
+        migrations.RemoveField(
+            model_name='compilejob',
+            name='error_message',
+        ),
+        migrations.RemoveField(
+            model_name='compilejob',
+            name='logs',
+        ),
+    ]
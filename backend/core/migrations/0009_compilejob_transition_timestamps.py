@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_compilejob_payload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compilejob',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
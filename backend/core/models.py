@@ -2,7 +2,7 @@ from django.db import models
 
 # Create your models here.
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 
@@ -110,9 +110,14 @@ class CompileJob(models.Model):
         blank=True,
         db_index=True
     )
+    queue = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Celery queue the job was dispatched to"
+    )
     
-    # Results
-    logs = models.TextField(blank=True, default='')
+    # Results (logs / error_message / cv_data محفوظين مضغوطين في CompileJobPayload)
     pdf_url = models.URLField(max_length=500, blank=True, null=True)
     pdf_size_bytes = models.IntegerField(null=True, blank=True)
     
@@ -120,12 +125,20 @@ class CompileJob(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     duration_seconds = models.FloatField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
     
-    # CV Data (JSON)
-    cv_data = models.JSONField(null=True, blank=True)
+    # Stage Timing (seconds) - عشان نعرف الوقت راح فين
+    queue_wait_seconds = models.FloatField(null=True, blank=True, help_text="created_at -> started_at")
+    ai_seconds = models.FloatField(null=True, blank=True, help_text="OpenAI extraction")
+    render_seconds = models.FloatField(null=True, blank=True, help_text="Jinja LaTeX rendering")
+    compile_seconds = models.FloatField(null=True, blank=True, help_text="Tectonic / xelatex")
+    storage_seconds = models.FloatField(null=True, blank=True, help_text="PDF upload to storage")
+    
+    # Narrow copy of cv_data['template_id'] so we can filter without loading the payload
+    cv_template_id = models.CharField(max_length=64, blank=True, default='', db_index=True)
     
     # Error Tracking
-    error_message = models.TextField(blank=True, default='')
     retry_count = models.IntegerField(default=0)
     
     # Timestamps
@@ -163,7 +176,213 @@ class CompileJob(models.Model):
             delta = self.completed_at - self.started_at
             self.duration_seconds = delta.total_seconds()
         
+        # حقول الـ Payload مش أعمدة في الجدول ده: بتتحفظ في CompileJobPayload بعد الـ save
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = [f for f in update_fields if f not in self.PAYLOAD_FIELDS]
+        
+        was_adding = self._state.adding
         super().save(*args, **kwargs)
+        self._save_payload(was_adding)
+    
+    # =============================================
+    # State machine (compare-and-set transitions)
+    # =============================================
+    
+    # status -> الحالات المسموح الانتقال لها
+    TRANSITIONS = {
+        'QUEUED': ('PROCESSING', 'FAILED', 'CANCELLED'),
+        'PROCESSING': ('SUCCESS', 'FAILED', 'CANCELLED', 'QUEUED'),  # QUEUED = retry
+        'SUCCESS': ('PROCESSING',),  # recompile (compile_batch)
+        'FAILED': ('PROCESSING',),   # recompile (compile_batch)
+        'CANCELLED': (),
+    }
+    
+    # الـ Timestamps اللي بتتسجل مع كل انتقال
+    TRANSITION_TIMESTAMPS = {
+        'QUEUED': (),
+        'PROCESSING': ('started_at',),
+        'SUCCESS': ('completed_at',),
+        'FAILED': ('completed_at', 'failed_at'),
+        'CANCELLED': ('completed_at', 'cancelled_at'),
+    }
+    
+    @classmethod
+    def allowed_sources(cls, to_status):
+        return tuple(source for source, targets in cls.TRANSITIONS.items() if to_status in targets)
+    
+    @classmethod
+    def _transition_values(cls, to_status, fields):
+        now = timezone.now()
+        values = dict(fields)
+        for field in cls.TRANSITION_TIMESTAMPS[to_status]:
+            values.setdefault(field, now)
+        values['status'] = to_status
+        values['updated_at'] = now
+        return values
+    
+    @classmethod
+    def bulk_transition(cls, queryset, to_status, from_statuses=None, **fields) -> int:
+        """
+        نقل مجموعة Jobs لحالة جديدة في UPDATE واحد مشروط بالحالة الحالية
+
+        Returns:
+            عدد الـ Jobs اللي اتنقلت فعلاً
+        """
+        from_statuses = from_statuses or cls.allowed_sources(to_status)
+        return queryset.filter(status__in=from_statuses).update(
+            **cls._transition_values(to_status, fields)
+        )
+    
+    def transition(self, to_status, from_statuses=None, **fields) -> bool:
+        """
+        Compare-and-set: UPDATE ... WHERE id = ? AND status IN (...) في Query واحدة
+        بدل get() ثم save()، عشان الـ Retries والإلغاء ما يكتبوش فوق بعض
+
+        Args:
+            to_status: الحالة الجديدة
+            from_statuses: الحالات المقبولة حالياً (الافتراضي من TRANSITIONS)
+            **fields: أعمدة تتحدث مع الانتقال (F() مسموح، وحقول الـ Payload كمان)
+
+        Returns:
+            True لو الانتقال حصل، False لو الحالة الحالية مش مسموح لها
+        """
+        payload_values = {name: fields.pop(name) for name in self.PAYLOAD_FIELDS if name in fields}
+        values = self._transition_values(to_status, fields)
+        
+        if 'completed_at' in values:
+            started_at = values.get('started_at', self.started_at)
+            if started_at:
+                values['duration_seconds'] = (values['completed_at'] - started_at).total_seconds()
+        
+        # الحالة والـ Payload مع بعض: لو كتابة الـ Payload فشلت الانتقال نفسه يترجع
+        with transaction.atomic():
+            updated = type(self).bulk_transition(
+                type(self).objects.filter(pk=self.pk),
+                to_status,
+                from_statuses,
+                **{k: v for k, v in values.items() if k != 'status'}
+            )
+            if not updated:
+                return False
+            
+            if payload_values:
+                for name, value in payload_values.items():
+                    setattr(self, name, value)
+                self._save_payload()
+                if 'cv_data' in payload_values:
+                    type(self).objects.filter(pk=self.pk).update(cv_template_id=self.cv_template_id)
+        
+        for name, value in values.items():
+            # F() expressions قيمتها الحقيقية في الـ DB بس
+            if not hasattr(value, 'resolve_expression'):
+                setattr(self, name, value)
+        
+        # Snapshot للـ Polling + Push على ws/jobs/<job_id>/ (بعد الـ Commit عشان الـ Client ما يقراش حالة مش موجودة)
+        from core.services.job_status_cache_service import job_status_changed
+        transaction.on_commit(lambda: job_status_changed(self, payload_values.get('cv_data')))
+        return True
+    
+    # =============================================
+    # Out-of-row payload (lazy, compressed)
+    # =============================================
+    
+    PAYLOAD_FIELDS = ('logs', 'error_message', 'cv_data')
+    PAYLOAD_DEFAULTS = {'logs': '', 'error_message': '', 'cv_data': None}
+    
+    def _get_payload_value(self, name):
+        pending = self.__dict__.get('_payload_pending')
+        if pending and name in pending:
+            return pending[name]
+        if self._state.adding:
+            return self.PAYLOAD_DEFAULTS[name]
+        try:
+            # أول وصول بيعمل Query واحدة وبعدها Django بيعمل cache للـ relation
+            payload = self.payload
+        except CompileJobPayload.DoesNotExist:
+            return self.PAYLOAD_DEFAULTS[name]
+        return payload.get_value(name)
+    
+    def _set_payload_value(self, name, value):
+        self.__dict__.setdefault('_payload_pending', {})[name] = value
+        if name == 'cv_data':
+            template_id = value.get('template_id') if isinstance(value, dict) else None
+            self.cv_template_id = str(template_id) if template_id else ''
+    
+    def _save_payload(self, was_adding=False):
+        pending = self.__dict__.pop('_payload_pending', None)
+        if not pending:
+            return
+        if was_adding:
+            if not any(pending.values()):
+                return
+            payload = CompileJobPayload(job=self)
+        else:
+            try:
+                payload = self.payload
+            except CompileJobPayload.DoesNotExist:
+                payload = CompileJobPayload(job=self)
+        
+        for name, value in pending.items():
+            payload.set_value(name, value)
+        payload.save()
+        self.payload = payload
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """
+        القيم المعلقة (لسه ما اتحفظتش) والـ Payload المتكاش (ومعاه الـ Blobs المفكوكة) بيتشالوا
+        عشان القراية الجاية تيجي من الـ DB؛ ممكن fields تحتوي logs / error_message / cv_data
+        """
+        payload_names = set(self.PAYLOAD_FIELDS)
+        if fields is not None:
+            fields = set(fields)
+            payload_names &= fields
+            if payload_names:
+                # الـ Payload relation كلها بتتقري تاني (Query واحدة عند أول وصول)
+                fields = (fields - payload_names) | {'payload'}
+
+        pending = self.__dict__.get('_payload_pending')
+        if pending:
+            for name in payload_names:
+                pending.pop(name, None)
+
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    @classmethod
+    def bulk_save_payloads(cls, jobs):
+        """
+        حفظ الـ Payloads المعلقة لمجموعة Jobs (بعد bulk_update) بـ upsert واحد لكل مجموعة حقول
+        """
+        groups = {}
+        for job in jobs:
+            pending = job.__dict__.pop('_payload_pending', None)
+            if not pending:
+                continue
+            payload = CompileJobPayload(job=job)
+            for name, value in pending.items():
+                payload.set_value(name, value)
+            groups.setdefault(tuple(sorted(pending)), []).append(payload)
+        
+        for names, payloads in groups.items():
+            CompileJobPayload.objects.bulk_create(
+                payloads,
+                update_conflicts=True,
+                unique_fields=['job'],
+                update_fields=[CompileJobPayload.BLOB_FIELDS[name] for name in names] + ['updated_at'],
+            )
+    
+    logs = property(
+        lambda self: self._get_payload_value('logs'),
+        lambda self, value: self._set_payload_value('logs', value),
+    )
+    error_message = property(
+        lambda self: self._get_payload_value('error_message'),
+        lambda self, value: self._set_payload_value('error_message', value),
+    )
+    cv_data = property(
+        lambda self: self._get_payload_value('cv_data'),
+        lambda self, value: self._set_payload_value('cv_data', value),
+    )
     
     @property
     def is_complete(self):
@@ -179,6 +398,60 @@ class CompileJob(models.Model):
         """
         return self.status in ['QUEUED', 'PROCESSING']
 
+
+class CompileJobPayload(models.Model):
+    """
+    الأجزاء الكبيرة من الـ CompileJob (Tectonic logs، رسالة الخطأ، cv_data)
+    مضغوطة بـ zstd في جدول جانبي عشان صفوف compile_job تفضل صغيرة
+    وما بتتحملش إلا لما حد يطلبها (get_cv_data / الـ Admin)
+    """
+    
+    BLOB_FIELDS = {
+        'logs': 'logs_blob',
+        'error_message': 'error_blob',
+        'cv_data': 'cv_data_blob',
+    }
+    
+    job = models.OneToOneField(
+        CompileJob,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='payload'
+    )
+    logs_blob = models.BinaryField(null=True, blank=True)
+    error_blob = models.BinaryField(null=True, blank=True)
+    cv_data_blob = models.BinaryField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Compile Job Payload'
+        verbose_name_plural = 'Compile Job Payloads'
+    
+    def __str__(self):
+        return f"Payload for job {self.job_id}"
+    
+    def get_value(self, name):
+        from core.services import payload_codec
+        
+        decoded = self.__dict__.setdefault('_decoded', {})
+        if name not in decoded:
+            blob = getattr(self, self.BLOB_FIELDS[name])
+            if name == 'cv_data':
+                decoded[name] = payload_codec.decode_json(blob)
+            else:
+                decoded[name] = payload_codec.decode_text(blob)
+        return decoded[name]
+    
+    def set_value(self, name, value):
+        from core.services import payload_codec
+        
+        if name == 'cv_data':
+            blob = payload_codec.encode_json(value)
+        else:
+            blob = payload_codec.encode_text(value)
+        setattr(self, self.BLOB_FIELDS[name], blob)
+        self.__dict__.setdefault('_decoded', {})[name] = value
+
 # Scientific Explanation:
 # 1. UUIDs: Used for all PKs to prevent URL enumeration (e.g., guessing project ID /project/5).
 # 2. Denormalization: We store content in `ProjectFile` for simplicity. For scale >1TB, text content 
@@ -85,10 +85,9 @@ class ProjectSerializer(serializers.ModelSerializer):
         # Try to get from latest job annotation
         try:
             latest_job = obj.compile_jobs.order_by('-created_at').first()
-            if latest_job and latest_job.cv_data:
-                cv_data = latest_job.cv_data
-                if isinstance(cv_data, dict):
-                    return cv_data.get('template_id')
+            # cv_template_id بدل cv_data عشان ما نحملش الـ Payload المضغوط
+            if latest_job and latest_job.cv_template_id:
+                return latest_job.cv_template_id
         except:
             pass
         return None
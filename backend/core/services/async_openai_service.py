@@ -0,0 +1,307 @@
+"""
+Async OpenAI Service
+نفس OpenAIService لكن فوق openai.AsyncOpenAI: كل الـ Extractions في الـ Process
+بتشتغل على Event loop واحد في الخلفية بدل ما كل طلب يحجز Thread/Process لحد ما الرد يرجع
+
+- حد أقصى للطلبات المتزامنة في الـ Process (OPENAI_MAX_IN_FLIGHT)
+- Token bucket لكل Model في Redis (requests/tokens per minute من OPENAI_RATE_LIMITS)،
+  مشترك بين كل الـ Processes عشان الحد يفضل حد الحساب مش مضروب في عدد الـ Workers
+- الـ Methods المتزامنة (extract_cv_data / parse_resume_text) بترجع نفس الأنواع
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import openai
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from pydantic import BaseModel
+
+from .llm_cache_service import get_llm_cache
+from .resume_chunking import fill_schema, merge_partial_data, missing_fields, partial_schema
+from .openai_service import (
+    OpenAIService, StructuredOutputStream, count_message_tokens, get_response_format, log_completion,
+    parse_structured_completion
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RedisTokenBucket:
+    """
+    Token bucket في Redis: بيتملى بمعدل rate_per_minute وبيستوعب لحد capacity
+
+    الحالة (tokens / updated) في Hash واحد بيتعدل بـ WATCH/MULTI،
+    فكل الـ Processes بتسحب من نفس الرصيد
+    """
+
+    def __init__(self, key: str, rate_per_minute: float, capacity: Optional[float] = None):
+        self.redis = get_redis_connection('default')
+        self.key = cache.make_key(key)
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        # الـ Bucket اللي ما اتلمسش المدة دي بيكون اتملى على الآخر، فمفيش داعي نسيبه
+        self.ttl = int(self.capacity / self.rate) + 60
+
+    def take(self, amount: float) -> float:
+        """
+        سحب amount لو متاح
+
+        Returns:
+            0 لو اتسحب، أو عدد الثواني لحد ما الرصيد يكفي
+        """
+        def take(pipe):
+            tokens, updated = pipe.hmget(self.key, 'tokens', 'updated')
+            now = time.time()
+            tokens = self.capacity if tokens is None else float(tokens)
+            if updated is not None:
+                tokens = min(self.capacity, tokens + max(0.0, now - float(updated)) * self.rate)
+
+            wait = 0.0 if tokens >= amount else (amount - tokens) / self.rate
+            if not wait:
+                tokens -= amount
+            pipe.multi()
+            pipe.hset(self.key, mapping={'tokens': tokens, 'updated': now})
+            pipe.expire(self.key, self.ttl)
+            return wait
+
+        return self.redis.transaction(take, self.key, value_from_callable=True)
+
+    async def acquire(self, amount: float = 1):
+        # طلب أكبر من السعة كلها بياخد السعة بس (وإلا هيستنى للأبد)
+        amount = min(amount, self.capacity)
+        while True:
+            try:
+                # Redis متزامن، فبيتنادى في Thread عشان ما يوقفش الـ Loop
+                wait = await asyncio.to_thread(self.take, amount)
+            except Exception as e:
+                # من غير Redis الطلب بيعدي، والـ SDK بيتعامل مع الـ 429 بالـ Retries
+                logger.warning(f"OpenAI rate limiter unavailable: {str(e)}")
+                return
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class AsyncOpenAIService(OpenAIService):
+    """
+    Usage (async):
+        data = await service.aextract_cv_data(prompt, schema, 'ar')
+
+    Usage (sync، من Celery task أو View):
+        data = service.extract_cv_data(prompt, schema, 'ar')
+    """
+
+    def __init__(self):
+        self.client = openai.AsyncOpenAI(
+            api_key=getattr(settings, 'OPENAI_API_KEY', None),
+            max_retries=settings.OPENAI_MAX_RETRIES,  # الـ SDK بيحترم retry-after في 429
+            timeout=settings.OPENAI_TIMEOUT,
+        )
+        self.max_in_flight = settings.OPENAI_MAX_IN_FLIGHT
+        # بيتعملوا جوه الـ Event loop عند أول استخدام
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._buckets: Dict[str, Dict[str, RedisTokenBucket]] = {}
+
+    # =============================================
+    # Limits
+    # =============================================
+
+    def _model_buckets(self, model: str) -> Dict[str, RedisTokenBucket]:
+        if model not in self._buckets:
+            limits = settings.OPENAI_RATE_LIMITS.get(model, {})
+            buckets = {}
+            if limits.get('rpm'):
+                buckets['requests'] = RedisTokenBucket(f'openai_rate:{model}:requests', limits['rpm'])
+            if limits.get('tpm'):
+                buckets['tokens'] = RedisTokenBucket(f'openai_rate:{model}:tokens', limits['tpm'])
+            self._buckets[model] = buckets
+        return self._buckets[model]
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        # Tokens المدخل (tiktoken) + هامش للرد
+        tokens = count_message_tokens(messages, self.MODEL)
+        return tokens['static'] + tokens['dynamic'] + settings.OPENAI_COMPLETION_TOKENS_ESTIMATE
+
+    async def _parse(
+        self, messages, schema: Type[BaseModel], temperature: float,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> BaseModel:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        buckets = self._model_buckets(self.MODEL)
+        if 'requests' in buckets:
+            await buckets['requests'].acquire(1)
+        if 'tokens' in buckets:
+            await buckets['tokens'].acquire(self._estimate_tokens(messages))
+
+        async with self._semaphore:
+            if on_partial is not None:
+                return await self._stream(messages, schema, temperature, on_partial)
+
+            started = time.perf_counter()
+            completion = await self.client.chat.completions.create(
+                model=self.MODEL,
+                messages=messages,
+                response_format=get_response_format(schema),
+                temperature=temperature
+            )
+        log_completion(self.MODEL, messages, completion.usage, time.perf_counter() - started)
+        return parse_structured_completion(completion, schema)
+
+    async def _stream(self, messages, schema: Type[BaseModel], temperature: float, on_partial) -> BaseModel:
+        stream = StructuredOutputStream(schema)
+        chunks = await self.client.chat.completions.create(
+            model=self.MODEL,
+            messages=messages,
+            response_format=get_response_format(schema),
+            temperature=temperature,
+            stream=True,
+            stream_options={'include_usage': True}
+        )
+        async for chunk in chunks:
+            partial = stream.feed(chunk)
+            if partial is not None:
+                # الـ Callback متزامن (Channels / DB)، فبيتنادى برّه الـ Loop
+                await asyncio.to_thread(on_partial, partial)
+
+        log_completion(self.MODEL, messages, stream.usage, stream.elapsed, stream.first_token_seconds)
+        return stream.result()
+
+    # =============================================
+    # Async API
+    # =============================================
+
+    async def _acached_parse(
+        self, messages, schema: Type[BaseModel], temperature: float, language: str = '',
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> BaseModel:
+        # Redis متزامن، فبيتنادى في Thread عشان ما يوقفش الـ Loop
+        llm_cache = await asyncio.to_thread(get_llm_cache)
+        if llm_cache is None:
+            return await self._parse(messages, schema, temperature, on_partial)
+
+        cached, key = await asyncio.to_thread(
+            llm_cache.lookup, self.MODEL, messages, schema, language, temperature
+        )
+        if cached is not None:
+            return cached
+
+        result = await self._parse(messages, schema, temperature, on_partial)
+        await asyncio.to_thread(llm_cache.store, key, result)
+        return result
+
+    async def aextract_cv_data(
+        self, user_prompt: str, schema: Type[BaseModel], language: str = 'ar',
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> BaseModel:
+        try:
+            return await self._acached_parse(
+                self._extract_messages(user_prompt, schema, language), schema,
+                temperature=0.3,  # إبداع بسيط لتحسين الصياغة
+                language=language,
+                on_partial=on_partial
+            )
+        except Exception as e:
+            raise Exception(f"OpenAI API Error: {str(e)}")
+
+    async def aparse_resume_text(self, resume_text: str, schema: Type[BaseModel]) -> BaseModel:
+        try:
+            chunks = self._resume_chunks(resume_text)
+            if len(chunks) <= 1:
+                return await self._acached_parse(
+                    self._resume_messages(chunks[0] if chunks else ''), schema,
+                    temperature=0.0  # صفر إبداع = دقة نقل 100%
+                )
+
+            partials = await self._aparse_resume_chunks(chunks, partial_schema(schema))
+            merged = merge_partial_data(partials, schema)
+
+            missing = missing_fields(merged, schema)
+            if missing:
+                filled = await self._acached_parse(
+                    self._reduce_messages(merged, missing), fill_schema(schema, tuple(missing)), temperature=0.0
+                )
+                merged.update(filled.model_dump())
+            return schema.model_validate(merged)
+        except Exception as e:
+            raise Exception(f"Resume Parsing Error: {str(e)}")
+
+    async def _aparse_resume_chunks(self, chunks: List[str], schema: Type[BaseModel]) -> List[BaseModel]:
+        # الـ Semaphore والـ Token buckets بيحكموا التوازي الفعلي
+        return list(await asyncio.gather(*[
+            self._acached_parse(self._resume_messages(chunk, index, len(chunks)), schema, temperature=0.0)
+            for index, chunk in enumerate(chunks, start=1)
+        ]))
+
+    # =============================================
+    # Sync API (نفس توقيع OpenAIService)
+    # =============================================
+
+    def _parse_resume_chunks(self, chunks: List[str], schema: Type[BaseModel]) -> List[BaseModel]:
+        return run_in_loop(self._aparse_resume_chunks(chunks, schema))
+
+    def _parse_completion(self, messages, schema: Type[BaseModel], temperature: float, on_partial=None) -> BaseModel:
+        # الكاش بيتشيّك في الـ Thread المتزامن (OpenAIService._cached_parse)، والـ Request بس هو اللي بيروح للـ Loop
+        return run_in_loop(self._parse(messages, schema, temperature, on_partial))
+
+
+# =============================================
+# Background event loop (واحد لكل Process)
+# =============================================
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_service: Optional[AsyncOpenAIService] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop شغال في Thread منفصل (بيتعمل من جديد بعد fork)
+    """
+    global _loop, _loop_pid, _service
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            # الـ Client والـ Semaphore مربوطين بالـ Loop القديم
+            _service = None
+            threading.Thread(target=_loop.run_forever, name='openai-event-loop', daemon=True).start()
+        return _loop
+
+
+def run_in_loop(coro, timeout: Optional[float] = None):
+    """
+    تشغيل Coroutine على الـ Loop المشترك والانتظار على النتيجة من Thread عادي
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    try:
+        return future.result(timeout or settings.OPENAI_TIMEOUT * (settings.OPENAI_MAX_RETRIES + 1) * 2)
+    except TimeoutError:
+        # من غير cancel الـ Coroutine يفضل شغال على الـ Loop وماسك مكان في الـ Semaphore
+        future.cancel()
+        raise
+
+
+def get_async_openai_service() -> AsyncOpenAIService:
+    global _service
+    get_event_loop()
+    with _loop_lock:
+        if _service is None:
+            _service = AsyncOpenAIService()
+        return _service
+
+
+def get_openai_service() -> OpenAIService:
+    """
+    الخدمة اللي المفروض الـ Callers يستخدموها (Async لو OPENAI_ASYNC_ENABLED)
+    """
+    if settings.OPENAI_ASYNC_ENABLED:
+        return get_async_openai_service()
+    return OpenAIService()
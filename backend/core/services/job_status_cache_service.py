@@ -0,0 +1,214 @@
+"""
+Job Status Snapshots
+الـ Workers بيكتبوا حالة الـ CompileJob في Redis مع كل انتقال، وcheck-job-status / get-cv-data
+بيردوا منها (ETag / Last-Modified و 304 لو الـ Client عنده آخر نسخة) من غير Query على الـ DB
+"""
+import hashlib
+import json
+import logging
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django_redis import get_redis_connection
+
+from .payload_codec import decode_json, encode_json
+from .realtime_service import job_status_payload, publish_job_status
+
+logger = logging.getLogger(__name__)
+
+
+def _etag(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:20]
+
+
+class JobStatusCacheService:
+    """
+    في Redis: job_status:<job_id> hash بـ TTL
+        - owner:    triggered_by_id (نفس شرط الـ DB: الـ Job تظهر لصاحبها بس)
+        - status:   JSON بنفس شكل رد check-job-status، و status_etag بتاعه
+        - pdf_url:  للـ get-cv-data
+        - modified: updated_at (epoch) — نسخة أقدم ما تكتبش فوق أحدث
+        - cv_data:  مضغوط (payload_codec) و cv_etag، بيتكتب بس لما الـ cv_data تكون معروفة
+
+    وكل كتابة / مسح بيتعمله PUBLISH على job_status_events:<job_id> (الـ Long-poll بيستناه)
+    """
+
+    STATUS_FIELDS = ('owner', 'status', 'status_etag', 'pdf_url', 'modified')
+
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.ttl = settings.JOB_STATUS_CACHE_TTL
+
+    def _key(self, job_id) -> str:
+        return cache.make_key(f'job_status:{job_id}')
+
+    @staticmethod
+    def events_channel(job_id) -> str:
+        return cache.make_key(f'job_status_events:{job_id}')
+
+    @staticmethod
+    def build_snapshot(job, cv_data=None) -> Dict[str, Any]:
+        status_json = json.dumps(job_status_payload(job), ensure_ascii=False, cls=DjangoJSONEncoder).encode('utf-8')
+        snapshot = {
+            'owner': str(job.triggered_by_id or ''),
+            'status': status_json,
+            'status_etag': _etag(status_json),
+            'pdf_url': job.pdf_url or '',
+            'modified': job.updated_at.timestamp(),
+        }
+        if cv_data is not None:
+            cv_json = json.dumps(cv_data, ensure_ascii=False, sort_keys=True, cls=DjangoJSONEncoder).encode('utf-8')
+            snapshot['cv_data'] = encode_json(cv_data)
+            snapshot['cv_etag'] = _etag(cv_json)
+        return snapshot
+
+    def store(self, job, cv_data=None) -> Dict[str, Any]:
+        """
+        كتابة الـ Snapshot (مشروطة: لو الموجود أحدث من الـ Job دي بنسيبه)
+
+        Returns:
+            الـ Snapshot المبني (حتى لو ما اتكتبش)
+        """
+        snapshot = self.build_snapshot(job, cv_data)
+        key = self._key(job.id)
+
+        def write(pipe):
+            current = pipe.hget(key, 'modified')
+            if current is not None and float(current) > snapshot['modified']:
+                return
+            pipe.multi()
+            pipe.hset(key, mapping=snapshot)
+            pipe.expire(key, self.ttl)
+            pipe.publish(self.events_channel(job.id), snapshot['status_etag'])
+
+        try:
+            # كتابة تانية سبقتنا على نفس الـ Job: redis-py بيعيد write() فتقارن بالـ modified الجديد
+            self.redis.transaction(write, key)
+        except Exception as e:
+            logger.warning(f"Job status snapshot for {job.id} failed: {str(e)}")
+        return snapshot
+
+    def store_many(self, jobs):
+        """
+        كتابة Snapshots لمجموعة Jobs (الـ Batch endpoint بيملا اللي مش موجود) بنفس شرط store():
+        WATCH على الكل + قراية الـ modified في Pipeline واحد + MULTI/EXEC واحد للكتابة
+
+        من غير PUBLISH: الحالة نفسها ما اتغيرتش، فاللي مستنيين على الـ Long-poll ما يصحوش على الفاضي
+        """
+        snapshots = {self._key(job.id): self.build_snapshot(job) for job in jobs}
+        if not snapshots:
+            return
+        keys = list(snapshots)
+
+        def write(pipe):
+            # الـ WATCH على connection الـ pipe، فالقراية من Pipeline عادي ما بتلغيهوش
+            reader = self.redis.pipeline(transaction=False)
+            for key in keys:
+                reader.hget(key, 'modified')
+            current = reader.execute()
+            pipe.multi()
+            for key, modified in zip(keys, current):
+                snapshot = snapshots[key]
+                if modified is not None and float(modified) > snapshot['modified']:
+                    continue
+                pipe.hset(key, mapping=snapshot)
+                pipe.expire(key, self.ttl)
+
+        try:
+            # كتابة سبقتنا على أي Job منهم: redis-py بيعيد (والأحدث بيتساب)
+            self.redis.transaction(write, *keys)
+        except Exception as e:
+            logger.warning(f"Job status snapshot batch store failed: {str(e)}")
+
+    def get(self, job_id, with_cv_data=False) -> Optional[Dict[str, Any]]:
+        """
+        Returns:
+            {'owner', 'status' (dict), 'status_etag', 'pdf_url', 'modified', ['cv_data', 'cv_etag']}
+            أو None لو مفيش Snapshot (أو من غير cv_data لما with_cv_data)
+        """
+        fields = self.STATUS_FIELDS + (('cv_data', 'cv_etag') if with_cv_data else ())
+        try:
+            row = self.redis.hmget(self._key(job_id), fields)
+        except Exception as e:
+            logger.warning(f"Job status snapshot lookup for {job_id} failed: {str(e)}")
+            return None
+        return self._decode(dict(zip(fields, row)), with_cv_data)
+
+    @staticmethod
+    def _decode(values: Dict[str, Any], with_cv_data=False) -> Optional[Dict[str, Any]]:
+        if values['status'] is None or (with_cv_data and values['cv_data'] is None):
+            return None
+
+        snapshot = {
+            'owner': values['owner'].decode(),
+            'status': json.loads(values['status']),
+            'status_etag': values['status_etag'].decode(),
+            'pdf_url': values['pdf_url'].decode() or None,
+            'modified': float(values['modified']),
+        }
+        if with_cv_data:
+            snapshot['cv_data'] = decode_json(values['cv_data'])
+            snapshot['cv_etag'] = values['cv_etag'].decode()
+        return snapshot
+
+    def get_many(self, job_ids) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshots لمجموعة Jobs في Round trip واحد (من غير cv_data)
+
+        Returns:
+            job_id -> {'owner', 'status', 'status_etag', 'pdf_url', 'modified'} (الموجود بس)
+        """
+        job_ids = [str(job_id) for job_id in job_ids]
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for job_id in job_ids:
+                pipe.hmget(self._key(job_id), self.STATUS_FIELDS)
+            rows = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Job status snapshot batch lookup failed: {str(e)}")
+            return {}
+
+        snapshots = {}
+        for job_id, row in zip(job_ids, rows):
+            snapshot = self._decode(dict(zip(self.STATUS_FIELDS, row)))
+            if snapshot is not None:
+                snapshots[job_id] = snapshot
+        return snapshots
+
+    def invalidate(self, job_ids):
+        """
+        مسح الـ Snapshots (انتقالات جماعية بـ UPDATE واحد مش بتعدي على transition())
+        """
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(*[self._key(job_id) for job_id in job_ids])
+            for job_id in job_ids:
+                pipe.publish(self.events_channel(job_id), '')
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Job status snapshot invalidation failed: {str(e)}")
+
+
+def get_job_status_cache() -> Optional[JobStatusCacheService]:
+    if not settings.JOB_STATUS_CACHE_ENABLED:
+        return None
+    try:
+        return JobStatusCacheService()
+    except Exception as e:
+        logger.warning(f"Job status cache unavailable: {str(e)}")
+        return None
+
+
+def job_status_changed(job, cv_data=None):
+    """
+    بعد كل انتقال: Snapshot في Redis (للـ Polling) + Push على ws/jobs/<job_id>/
+    """
+    status_cache = get_job_status_cache()
+    if status_cache:
+        status_cache.store(job, cv_data)
+    publish_job_status(job)
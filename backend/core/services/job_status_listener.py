@@ -0,0 +1,149 @@
+"""
+Job Status Listener (Long-poll)
+اشتراك واحد لكل Process (PSUBSCRIBE على job_status_events:*) بيصحّي الطلبات المستنية
+على /api/check-job-status/<job_id>/?wait=N، بدل Loop أو Connection لكل طلب
+"""
+import asyncio
+import logging
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+from .job_status_cache_service import JobStatusCacheService
+
+logger = logging.getLogger(__name__)
+
+_listener: Optional['JobStatusListener'] = None
+# Lock لكل Event loop (الـ asyncio.Lock مربوط بالـ Loop اللي اتعمل فيه)
+_start_locks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]' = weakref.WeakKeyDictionary()
+
+
+class JobStatusListener:
+    """
+    - waiters: job_id -> Futures الطلبات المستنية (في نفس الـ Event loop)
+    - أي رسالة على job_status_events:<job_id> بتكمّل الـ Futures بتاعته
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.redis = aioredis.Redis.from_url(settings.CACHES['default']['LOCATION'])
+        self.pattern = JobStatusCacheService.events_channel('*')
+        self.prefix = self.pattern[:-1]
+        self.waiters: Dict[str, Set[asyncio.Future]] = {}
+        self.pubsub = None
+        self.reader = None
+
+    async def start(self):
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.psubscribe(self.pattern)
+        self.reader = asyncio.create_task(self._read())
+
+    @property
+    def alive(self) -> bool:
+        return self.reader is not None and not self.reader.done() and self.loop is asyncio.get_running_loop()
+
+    async def _read(self):
+        try:
+            async for message in self.pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                channel = message['channel'].decode()
+                for future in self.waiters.pop(channel[len(self.prefix):], ()):
+                    if not future.done():
+                        future.set_result(True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # الاتصال وقع: اللي مستنيين يرجعوا فوراً، والطلب الجاي يفتح Listener جديد
+            logger.warning(f"Job status listener stopped: {str(e)}")
+            for futures in self.waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(False)
+            self.waiters.clear()
+
+    async def close(self):
+        """
+        إيقاف الـ Reader وقفل الـ PubSub والـ Connection (لازم يتنادى من الـ Loop بتاعه)
+        """
+        if self.reader is not None and not self.reader.done():
+            self.reader.cancel()
+            try:
+                await self.reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        try:
+            if self.pubsub is not None:
+                await self.pubsub.aclose()
+            await self.redis.aclose()
+        except Exception as e:
+            logger.warning(f"Job status listener close failed: {str(e)}")
+
+    def discard(self):
+        """
+        الـ Listener اتستبدل: يتقفل في الـ Loop بتاعه لو لسه شغال
+        (لو الـ Loop اتقفل خلاص مفيش Loop نقفل فيه الـ Connection)
+        """
+        if self.loop is asyncio.get_running_loop():
+            return asyncio.ensure_future(self.close())
+        if self.loop.is_running():
+            return asyncio.run_coroutine_threadsafe(self.close(), self.loop)
+        logger.warning("Job status listener replaced after its event loop closed")
+
+    @contextmanager
+    def watch(self, job_id):
+        """
+        Future بيخلص مع أول تغيير في حالة الـ Job
+        (بيتسجل قبل قراية الحالة عشان ما يفوتناش انتقال بينهم)
+        """
+        job_id = str(job_id)
+        future = self.loop.create_future()
+        self.waiters.setdefault(job_id, set()).add(future)
+        try:
+            yield future
+        finally:
+            futures = self.waiters.get(job_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    self.waiters.pop(job_id, None)
+
+
+async def get_job_status_listener() -> Optional[JobStatusListener]:
+    """
+    Listener الـ Process (None لو Redis مش متاح: الطلب يرجع فوراً زي الـ Polling العادي)
+    """
+    global _listener
+    if _listener is not None and _listener.alive:
+        return _listener
+
+    # طلبات متزامنة أول ما الـ Process يقوم: واحد بس يفتح الاشتراك والباقي يستخدموه
+    lock = _start_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+    async with lock:
+        if _listener is not None:
+            if _listener.alive:
+                return _listener
+            _listener.discard()
+            _listener = None
+        try:
+            listener = JobStatusListener()
+            await listener.start()
+        except Exception as e:
+            logger.warning(f"Job status listener unavailable: {str(e)}")
+            return None
+        _listener = listener
+        return listener
+
+
+async def wait_for_change(future: asyncio.Future, timeout: float) -> bool:
+    """
+    Returns:
+        True لو الحالة اتغيرت قبل الـ timeout
+    """
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        return False
@@ -1,13 +1,20 @@
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
 from pathlib import Path
 from typing import Dict, Any
+import hashlib
 import re
 
+# Cache لبصمات القوالب: {filename: (mtime, version)}
+_TEMPLATE_VERSIONS: Dict[str, tuple] = {}
+
+
 class LaTeXService:
     """
     خدمة لملء قوالب LaTeX باستخدام Jinja2
     """
     
+    DEFAULT_PREVIEW_TEMPLATE = 'classic_arabic_v1.html'
+    
     def __init__(self):
         # مسار مجلد Templates
         template_dir = Path(__file__).parent.parent / 'latex_templates'
@@ -25,6 +32,15 @@ class LaTeXService:
         # إضافة Custom Filters
         self.jinja_env.filters['escape_latex'] = self.escape_latex_chars
         self.jinja_env.filters['format_date'] = self.format_date_range
+        
+        # Environment منفصل لمعاينة HTML (مع HTML escaping)
+        self.html_env = Environment(
+            loader=FileSystemLoader(str(Path(__file__).parent.parent / 'preview_templates')),
+            autoescape=select_autoescape(['html']),
+            trim_blocks=True,
+            lstrip_blocks=True
+        )
+        self.html_env.filters['format_date'] = self.format_date_range
     
     def render_template(
         self, 
@@ -55,6 +71,28 @@ class LaTeXService:
         """
         return self.render_template(template_name, data)
     
+    def render_html_preview(self, template_filename: str, cv_data: Dict[str, Any]) -> str:
+        """
+        معاينة HTML سريعة (RTL) لنفس بيانات السيرة الذاتية بدون Tectonic
+
+        Args:
+            template_filename: اسم ملف قالب LaTeX (يتم اختيار قالب HTML بنفس الاسم)
+            cv_data: بيانات السيرة الذاتية (dict)
+
+        Returns:
+            صفحة HTML كاملة
+        """
+        html_filename = f"{Path(template_filename or self.DEFAULT_PREVIEW_TEMPLATE).stem}.html"
+        try:
+            template = self.html_env.get_template(html_filename)
+        except TemplateNotFound:
+            template = self.html_env.get_template(self.DEFAULT_PREVIEW_TEMPLATE)
+
+        try:
+            return template.render(**cv_data)
+        except Exception as e:
+            raise Exception(f"Preview rendering error: {str(e)}")
+
     def get_schema_class(self, schema_class_name: str):
         """
         Get schema class by name
@@ -67,7 +105,15 @@ class LaTeXService:
         """
         from core.schemas import get_schema_by_name
         return get_schema_by_name(schema_class_name)
-    
+
+    def get_sample_data(self, schema_class_name: str) -> Dict[str, Any]:
+        """
+        بيانات تجريبية من مثال الـ Schema (للـ Warm-up والـ Benchmarks)
+        """
+        schema_class = self.get_schema_class(schema_class_name)
+        example = schema_class.model_config.get('json_schema_extra', {}).get('example', {})
+        return schema_class.model_validate(example).model_dump()
+
     def get_arabic_font_path(self) -> str:
         """
         Get path to Arabic font file
@@ -80,7 +126,31 @@ class LaTeXService:
         if font_path.exists():
             return str(font_path)
 
-    
+    @staticmethod
+    def get_template_version(template_filename: str) -> str:
+        """
+        بصمة قصيرة لمحتوى ملف القالب (تتغير عند تعديل القالب)
+
+        Returns:
+            أول 16 حرف من SHA-256 أو '' لو القالب غير موجود
+        """
+        if not template_filename:
+            return ''
+
+        template_path = Path(__file__).parent.parent / 'latex_templates' / template_filename
+        try:
+            mtime = template_path.stat().st_mtime
+        except OSError:
+            return ''
+
+        cached = _TEMPLATE_VERSIONS.get(template_filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        version = hashlib.sha256(template_path.read_bytes()).hexdigest()[:16]
+        _TEMPLATE_VERSIONS[template_filename] = (mtime, version)
+        return version
+
     @staticmethod
     def escape_latex_chars(text: str) -> str:
         """
@@ -0,0 +1,205 @@
+"""
+LLM Result Cache
+نفس الـ Prompt (أو نفس نص الـ PDF) مع نفس الـ Schema واللغة والـ Model ونسخة الـ Prompt
+= نفس النتيجة، فبنرجعها من Redis بدل رحلة كاملة لـ OpenAI
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Type
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Cache لبصمات الـ Schemas: {schema class: digest}
+_SCHEMA_DIGESTS: Dict[type, str] = {}
+
+
+@lru_cache(maxsize=64)
+def _prompt_digest(system_prompt: str) -> str:
+    # الـ System prompts متحسبة مسبقاً، فبصمتها كمان بتتحسب مرة واحدة
+    return hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+
+
+class LLMCacheKey(NamedTuple):
+    digest: str
+    scope: str
+    text: str
+
+
+class LLMCacheService:
+    """
+    كاش لنتائج extract_cv_data / parse_resume_text
+
+    في Redis:
+        - entry:<digest>: نتيجة الـ Model (JSON) بـ TTL
+        - lru:            digest -> آخر استخدام (Sorted Set) للـ Eviction بالعدد
+        - hits / misses:  للـ Hit rate
+
+    مطابقة تامة بس (بعد توحيد النص): Prompt قريب مش معناه نفس النتيجة، لأن التعديل البسيط
+    (اسم، تاريخ، جملة في الخبرة) هو بالظبط اللي المستخدم عايزه يظهر في الـ CV
+    """
+
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.ttl = settings.LLM_CACHE_TTL_SECONDS
+        self.max_entries = settings.LLM_CACHE_MAX_ENTRIES
+
+        self.lru_key = cache.make_key('llm_cache:lru')
+        self.hits_key = cache.make_key('llm_cache:hits')
+        self.misses_key = cache.make_key('llm_cache:misses')
+
+    def _entry_key(self, digest: str) -> str:
+        return cache.make_key(f'llm_cache:entry:{digest}')
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """
+        توحيد الشكل: NFKC + حذف التطويل + مسافات موحدة (نفس المحتوى بكتابة مختلفة = نفس المفتاح)
+        """
+        text = unicodedata.normalize('NFKC', text or '')
+        text = text.replace('ـ', '')  # التطويل (ـ)
+        return _WHITESPACE_RE.sub(' ', text).strip()
+
+    @staticmethod
+    def _schema_digest(schema: Type[BaseModel]) -> str:
+        if schema not in _SCHEMA_DIGESTS:
+            schema_json = json.dumps(schema.model_json_schema(), sort_keys=True)
+            _SCHEMA_DIGESTS[schema] = hashlib.sha256(schema_json.encode('utf-8')).hexdigest()[:16]
+        return _SCHEMA_DIGESTS[schema]
+
+    @classmethod
+    def compute_key(
+        cls,
+        model: str,
+        messages: List[Dict[str, str]],
+        schema: Type[BaseModel],
+        language: str = '',
+        temperature: float = 0.0
+    ) -> 'LLMCacheKey':
+        """
+        الـ scope = Model + نسخة الـ Prompt (بصمة الـ System prompt) + الـ Schema + اللغة
+        الـ digest = الـ scope + المدخل بعد التوحيد
+        """
+        system_prompt = ''.join(m['content'] for m in messages if m['role'] == 'system')
+        user_input = cls.normalize_text('\n'.join(m['content'] for m in messages if m['role'] != 'system'))
+        prompt_version = _prompt_digest(system_prompt)
+
+        scope = hashlib.sha256()
+        for part in (
+            settings.LLM_CACHE_VERSION, model, prompt_version,
+            f'{schema.__name__}:{cls._schema_digest(schema)}',
+            language or '', str(temperature),
+        ):
+            scope.update(part.encode('utf-8'))
+            scope.update(b'\x00')
+        scope = scope.hexdigest()[:24]
+
+        digest = hashlib.sha256(f'{scope}\x00{user_input}'.encode('utf-8')).hexdigest()
+        return LLMCacheKey(digest=digest, scope=scope, text=user_input)
+
+    def lookup(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        schema: Type[BaseModel],
+        language: str = '',
+        temperature: float = 0.0
+    ) -> Tuple[Optional[BaseModel], 'LLMCacheKey']:
+        """
+        Returns:
+            (النتيجة أو None, المفتاح اللي هيتخزن بيه لو None)
+        """
+        key = self.compute_key(model, messages, schema, language, temperature)
+        return self.get(key.digest, schema), key
+
+    def store(self, key: 'LLMCacheKey', result: BaseModel):
+        self.set(key.digest, result)
+
+    def get(self, digest: str, schema: Type[BaseModel]) -> Optional[BaseModel]:
+        try:
+            raw = self.redis.get(self._entry_key(digest))
+            if raw is None:
+                pipe = self.redis.pipeline()
+                pipe.zrem(self.lru_key, digest)
+                pipe.incr(self.misses_key)
+                pipe.execute()
+                return None
+
+            pipe = self.redis.pipeline()
+            pipe.zadd(self.lru_key, {digest: time.time()})
+            pipe.incr(self.hits_key)
+            pipe.execute()
+            return schema.model_validate_json(raw)
+
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {str(e)}")
+            return None
+
+    def set(self, digest: str, result: BaseModel):
+        try:
+            pipe = self.redis.pipeline()
+            pipe.set(self._entry_key(digest), result.model_dump_json(), ex=self.ttl)
+            pipe.zadd(self.lru_key, {digest: time.time()})
+            pipe.execute()
+            self.evict()
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {str(e)}")
+
+    def evict(self) -> int:
+        """
+        شيل اللي انتهى الـ TTL بتاعه من الـ Index، وبعدين الأقدم استخداماً لحد ما العدد يرجع للحد
+
+        Returns:
+            عدد الـ entries اللي اتشالت بسبب الحجم
+        """
+        self.redis.zremrangebyscore(self.lru_key, 0, time.time() - self.ttl)
+
+        overflow = self.redis.zcard(self.lru_key) - self.max_entries
+        if overflow <= 0:
+            return 0
+
+        oldest = self.redis.zpopmin(self.lru_key, overflow)
+        if oldest:
+            self.redis.delete(*[self._entry_key(self._decode(digest)) for digest, _ in oldest])
+            logger.info(f"LLM cache evicted {len(oldest)} entries")
+        return len(oldest)
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    def stats(self) -> Dict[str, Any]:
+        hits = int(self.redis.get(self.hits_key) or 0)
+        misses = int(self.redis.get(self.misses_key) or 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'entries': self.redis.zcard(self.lru_key),
+            'max_entries': self.max_entries,
+        }
+
+
+def get_llm_cache() -> Optional[LLMCacheService]:
+    """
+    الكاش لو مفعّل، وNone لو مقفول أو Redis مش متاح (الطلب يكمل على OpenAI عادي)
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    try:
+        return LLMCacheService()
+    except Exception as e:
+        logger.warning(f"LLM cache unavailable: {str(e)}")
+        return None
@@ -0,0 +1,209 @@
+"""
+Compile Metrics
+توقيت كل مرحلة في الـ CompileJob (طابور، OpenAI، Jinja، Tectonic، Storage)
+محفوظ كـ Histograms في Redis ومعروض بصيغة Prometheus text
+"""
+import logging
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# stage -> CompileJob field
+STAGE_FIELDS = {
+    'queue_wait': 'queue_wait_seconds',
+    'ai': 'ai_seconds',
+    'render': 'render_seconds',
+    'compile': 'compile_seconds',
+    'storage': 'storage_seconds',
+    'total': 'duration_seconds',
+}
+
+# حدود الـ Buckets بالثواني (من Jinja السريع لحد Tectonic البارد)
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class MetricsService:
+    """
+    Histograms تراكمية في Redis (hash لكل stage/queue):
+        - le:<bucket>: عدد الـ Jobs اللي وقعت في الـ Bucket ده بالظبط
+        - sum / count
+
+    الـ Gauges (عمق الطوابير) بتتحسب من الـ DB وقت الـ Scrape.
+    """
+
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.jobs_key = cache.make_key('metrics:jobs')
+        self.stages_key = cache.make_key('metrics:stages')
+
+    def _stage_key(self, stage: str, queue: str) -> str:
+        return cache.make_key(f'metrics:stage:{stage}:{queue}')
+
+    @staticmethod
+    def _bucket_for(value: float) -> str:
+        for bound in BUCKETS:
+            if value <= bound:
+                return f'le:{bound}'
+        return 'le:+Inf'
+
+    def observe_job(self, job):
+        """
+        تسجيل توقيتات Job وصلت لحالة نهائية (SUCCESS / FAILED)
+        """
+        queue = job.queue or 'default'
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hincrby(self.jobs_key, f'{queue}|{job.status}', 1)
+            for stage, field in STAGE_FIELDS.items():
+                value = getattr(job, field, None)
+                if value is None:
+                    continue
+                key = self._stage_key(stage, queue)
+                pipe.sadd(self.stages_key, f'{stage}|{queue}')
+                pipe.hincrby(key, self._bucket_for(value), 1)
+                pipe.hincrbyfloat(key, 'sum', value)
+                pipe.hincrby(key, 'count', 1)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Metrics observe failed for job {job.id}: {str(e)}")
+
+    def observe_jobs(self, jobs):
+        for job in jobs:
+            self.observe_job(job)
+
+    def _histogram_lines(self) -> List[str]:
+        lines = [
+            '# HELP cvmaker_compile_stage_seconds Time spent per CompileJob stage',
+            '# TYPE cvmaker_compile_stage_seconds histogram',
+        ]
+        for member in sorted(m.decode() if isinstance(m, bytes) else m for m in self.redis.smembers(self.stages_key)):
+            stage, queue = member.split('|', 1)
+            raw = self.redis.hgetall(self._stage_key(stage, queue))
+            data = {
+                (k.decode() if isinstance(k, bytes) else k): float(v)
+                for k, v in raw.items()
+            }
+            labels = f'stage="{stage}",queue="{queue}"'
+            cumulative = 0
+            for bound in BUCKETS:
+                cumulative += int(data.get(f'le:{bound}', 0))
+                lines.append(f'cvmaker_compile_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += int(data.get('le:+Inf', 0))
+            lines.append(f'cvmaker_compile_stage_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'cvmaker_compile_stage_seconds_sum{{{labels}}} {data.get("sum", 0.0)}')
+            lines.append(f'cvmaker_compile_stage_seconds_count{{{labels}}} {int(data.get("count", 0))}')
+        return lines
+
+    def _jobs_lines(self) -> List[str]:
+        lines = [
+            '# HELP cvmaker_compile_jobs_total CompileJobs that reached a terminal state',
+            '# TYPE cvmaker_compile_jobs_total counter',
+        ]
+        for field, value in sorted(self.redis.hgetall(self.jobs_key).items()):
+            field = field.decode() if isinstance(field, bytes) else field
+            queue, status = field.split('|', 1)
+            lines.append(f'cvmaker_compile_jobs_total{{queue="{queue}",status="{status}"}} {int(value)}')
+        return lines
+
+    @staticmethod
+    def _queue_depth_lines() -> List[str]:
+        from core.models import CompileJob
+
+        depth: Dict[tuple, int] = {}
+        for queue in settings.CELERY_QUEUE_CONCURRENCY:
+            depth[(queue, 'QUEUED')] = 0
+            depth[(queue, 'PROCESSING')] = 0
+
+        rows = CompileJob.objects.filter(
+            status__in=['QUEUED', 'PROCESSING']
+        ).values('queue', 'status').annotate(total=Count('id'))
+        for row in rows:
+            depth[(row['queue'] or 'default', row['status'])] = row['total']
+
+        lines = [
+            '# HELP cvmaker_compile_queue_depth CompileJobs waiting or running per queue',
+            '# TYPE cvmaker_compile_queue_depth gauge',
+        ]
+        for (queue, status), total in sorted(depth.items()):
+            lines.append(f'cvmaker_compile_queue_depth{{queue="{queue}",status="{status.lower()}"}} {total}')
+        return lines
+
+    @staticmethod
+    def _pdf_cache_lines() -> List[str]:
+        from core.services.pdf_cache_service import PDFCacheService
+
+        stats = PDFCacheService().stats()
+        return [
+            '# HELP cvmaker_pdf_cache_hits_total PDF cache hits',
+            '# TYPE cvmaker_pdf_cache_hits_total counter',
+            f'cvmaker_pdf_cache_hits_total {stats["hits"]}',
+            '# HELP cvmaker_pdf_cache_misses_total PDF cache misses',
+            '# TYPE cvmaker_pdf_cache_misses_total counter',
+            f'cvmaker_pdf_cache_misses_total {stats["misses"]}',
+            '# HELP cvmaker_pdf_cache_bytes Bytes of PDFs indexed by the cache',
+            '# TYPE cvmaker_pdf_cache_bytes gauge',
+            f'cvmaker_pdf_cache_bytes {stats["bytes"]}',
+        ]
+
+    @staticmethod
+    def _llm_cache_lines() -> List[str]:
+        from core.services.llm_cache_service import LLMCacheService
+
+        stats = LLMCacheService().stats()
+        return [
+            '# HELP cvmaker_llm_cache_hits_total LLM extraction cache hits',
+            '# TYPE cvmaker_llm_cache_hits_total counter',
+            f'cvmaker_llm_cache_hits_total {stats["hits"]}',
+            '# HELP cvmaker_llm_cache_misses_total LLM extraction cache misses',
+            '# TYPE cvmaker_llm_cache_misses_total counter',
+            f'cvmaker_llm_cache_misses_total {stats["misses"]}',
+            '# HELP cvmaker_llm_cache_entries LLM extraction results currently cached',
+            '# TYPE cvmaker_llm_cache_entries gauge',
+            f'cvmaker_llm_cache_entries {stats["entries"]}',
+        ]
+
+    @staticmethod
+    def _pdf_import_cache_lines() -> List[str]:
+        from core.services.pdf_import_cache_service import PDFImportCacheService
+
+        stats = PDFImportCacheService().stats()
+        return [
+            '# HELP cvmaker_pdf_import_cache_hits_total PDF imports answered from the file-hash cache',
+            '# TYPE cvmaker_pdf_import_cache_hits_total counter',
+            f'cvmaker_pdf_import_cache_hits_total {stats["hits"]}',
+            '# HELP cvmaker_pdf_import_cache_misses_total PDF imports that needed parsing',
+            '# TYPE cvmaker_pdf_import_cache_misses_total counter',
+            f'cvmaker_pdf_import_cache_misses_total {stats["misses"]}',
+            '# HELP cvmaker_pdf_import_cache_bytes Bytes of extracted text and cv_data cached',
+            '# TYPE cvmaker_pdf_import_cache_bytes gauge',
+            f'cvmaker_pdf_import_cache_bytes {stats["bytes"]}',
+        ]
+
+    def render_prometheus(self) -> str:
+        """
+        كل المقاييس بصيغة Prometheus text exposition (0.0.4)
+        """
+        lines = self._queue_depth_lines()
+        for section in (self._jobs_lines, self._histogram_lines, self._pdf_cache_lines, self._llm_cache_lines,
+                        self._pdf_import_cache_lines):
+            try:
+                lines.extend(section())
+            except Exception as e:
+                # Redis واقع مش لازم يوقف عمق الطوابير
+                logger.warning(f"Metrics section {section.__name__} failed: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+def observe_job(job):
+    """
+    Shortcut للـ Tasks: تسجيل Job واحدة بدون ما يأثر فشل Redis على الـ Job
+    """
+    try:
+        MetricsService().observe_job(job)
+    except Exception as e:
+        logger.warning(f"Metrics unavailable: {str(e)}")
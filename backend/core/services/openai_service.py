@@ -1,13 +1,302 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Type, Dict, Any, List, Callable, Optional
+
+import jiter
 import openai
-from typing import Type, Dict, Any
 from pydantic import BaseModel
 from django.conf import settings
 
+from .llm_cache_service import get_llm_cache
+from .resume_chunking import (
+    build_chunks, compact_resume_text, fill_schema, merge_partial_data, missing_fields, partial_schema
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is in requirements.txt
+    tiktoken = None
+
+# نسخة الـ System prompts: أي تعديل في نصهم لازم يزوّدها
+PROMPT_VERSION = 2
+
+LANGUAGE_NAMES = {
+    'ar': 'العربية',
+    'en': 'الإنجليزية'
+}
+
+# =============================================
+# System prompts
+# =============================================
+
+# الجزء الثابت أولاً (Prefix مشترك بين كل الطلبات عشان الـ Prompt caching عند OpenAI)،
+# والسطر اللي بيتغير باللغة في الآخر
+EXTRACT_SYSTEM_PROMPT = """
+أنت خبير دولي في صياغة السير الذاتية (Resume Expert) المتوافقة مع أنظمة الـ ATS.
+مهمتك: تحويل مسودة المستخدم إلى سيرة ذاتية احترافية، مركزة على النتائج، ومناسبة لمجاله الوظيفي أيًا كان.
+
+## القواعد الأساسية للصياغة لكل المهن:
+
+### 1. الأسلوب والمنظور (Tone & Perspective):
+- **ممنوع صيغة الغائب**: لا تستخدم "هو"، "لديه"، "يسعى".
+- **استخدم الصيغة المباشرة**: ابدأ بالمسمى الوظيفي أو الفعل مباشرة (مثال: "محاسب قانوني.." بدل "هو يعمل كمحاسب").
+- **تجنب العبارات الإنشائية**: بدلاً من "شخص مجتهد يحب العمل"، ركز على "محترف مخصص لتحقيق أهداف المؤسسة من خلال [مهارة معينة]".
+
+### 2. الملخص المهني (Professional Summary):
+- اجعل الصياغة قوية ومكثفة (2-4 جمل).
+- الهيكل: [المسمى الوظيفي] + [عدد سنوات الخبرة] + [أبرز التخصصات/المهارات] + [القيمة التي تضيفها للشركة].
+
+### 3. الخبرات والمسؤوليات (Experience):
+- ابدأ كل نقطة (Bullet Point) بـ **فعل حركة قوي** (Action Verb).
+- ركز على **الإنجازات** وليس فقط المهام الروتينية.
+
+### 4. المهارات (Skills):
+- المصطلحات التقنية بالإنجليزية.
+- المهارات الناعمة بلغة الـ CV (المحددة في آخر التعليمات).
+
+### 5. القواعد العامة:
+- حافظ على الدقة الإملائية.
+- لا تخترع بيانات واترك الحقول الفارغة null.
+- نسق التواريخ بصيغة: "MMM YYYY - MMM YYYY".
+
+الآن، استخرج البيانات من نص المستخدم وصغها باحترافية تامة وفقاً للـ Schema.
+"""
+
+
+@lru_cache(maxsize=None)
+def build_system_prompt(schema: Type[BaseModel], language: str, prompt_version: int = PROMPT_VERSION) -> str:
+    """
+    System prompt التوليد لكل (Schema, لغة, نسخة)، بيتبني مرة واحدة
+    """
+    return (
+        f"{EXTRACT_SYSTEM_PROMPT.strip()}\n\n"
+        f"لغة الـ CV: {LANGUAGE_NAMES.get(language, 'العربية')}"
+    )
+
+
+# =============================================
+# Response schemas / token counts
+# =============================================
+
+def _strict_json_schema(node: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strict mode: كل Object بـ additionalProperties false وكل الـ Properties في required،
+    والـ $ref اللي جنبه Keys تانية (description مثلاً) بيتفك مكانه
+    """
+    for defs_key in ('$defs', 'definitions'):
+        for definition in node.get(defs_key, {}).values():
+            _strict_json_schema(definition, root)
+
+    if node.get('type') == 'object':
+        node.setdefault('additionalProperties', False)
+    if isinstance(node.get('properties'), dict):
+        node['required'] = list(node['properties'])
+        for prop in node['properties'].values():
+            _strict_json_schema(prop, root)
+    if isinstance(node.get('items'), dict):
+        _strict_json_schema(node['items'], root)
+    for variant in node.get('anyOf', ()):
+        _strict_json_schema(variant, root)
+
+    all_of = node.get('allOf')
+    if all_of:
+        if len(all_of) == 1:
+            node.update(_strict_json_schema(node.pop('allOf')[0], root))
+        else:
+            for entry in all_of:
+                _strict_json_schema(entry, root)
+
+    # Optional fields: الـ Schema فيها null أصلاً، والـ Model بيحط None لوحده
+    if 'default' in node and node['default'] is None:
+        node.pop('default')
+
+    ref = node.get('$ref')
+    if ref and len(node) > 1:
+        resolved = root
+        for part in ref[2:].split('/'):
+            resolved = resolved[part]
+        node.update({**resolved, **node})
+        node.pop('$ref')
+        return _strict_json_schema(node, root)
+    return node
+
+
+@lru_cache(maxsize=None)
+def get_response_format(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    الـ Strict JSON schema للـ response_format (بيتحسب مرة واحدة لكل Schema بدل كل Request)
+    مبني من model_json_schema() هنا بدل الـ Helpers الداخلية بتاعة الـ SDK
+    """
+    json_schema = schema.model_json_schema()
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'schema': _strict_json_schema(json_schema, json_schema),
+            'name': schema.__name__,
+            'strict': True,
+        },
+    }
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        # ملف الـ BPE بيتنزل أول مرة (TIKTOKEN_CACHE_DIR في الـ Deploy)
+        logger.warning(f"tiktoken unavailable for {model}, estimating tokens: {str(e)}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+
+@lru_cache(maxsize=64)
+def count_static_tokens(text: str, model: str) -> int:
+    # الـ System prompts ثابتة، فعددها بيتحسب مرة واحدة
+    return count_tokens(text, model)
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str) -> Dict[str, int]:
+    """
+    static = الـ System prompt (الجزء اللي الـ Provider بيعمله Cache كـ Prefix)، dynamic = مدخل المستخدم
+    """
+    static = sum(count_static_tokens(m['content'], model) for m in messages if m['role'] == 'system')
+    dynamic = sum(count_tokens(m['content'], model) for m in messages if m['role'] != 'system')
+    return {'static': static, 'dynamic': dynamic}
+
+
+def parse_structured_completion(completion, schema: Type[BaseModel]) -> BaseModel:
+    message = completion.choices[0].message
+    if getattr(message, 'refusal', None):
+        raise ValueError(f"Model refused the request: {message.refusal}")
+    return schema.model_validate_json(message.content)
+
+
+def log_completion(
+    model: str,
+    messages: List[Dict[str, str]],
+    usage,
+    elapsed: float,
+    first_token_seconds: Optional[float] = None
+):
+    """
+    Log لعدد الـ Tokens (تقديرنا + أرقام OpenAI والـ cached_tokens من الـ Prompt caching) والوقت
+    """
+    tokens = count_message_tokens(messages, model)
+    details = getattr(usage, 'prompt_tokens_details', None)
+    ttft = f", first_token={first_token_seconds:.2f}s" if first_token_seconds is not None else ''
+    logger.info(
+        f"OpenAI {model}: {elapsed:.2f}s{ttft}, "
+        f"static_tokens={tokens['static']}, dynamic_tokens={tokens['dynamic']}, "
+        f"prompt_tokens={getattr(usage, 'prompt_tokens', None)}, "
+        f"cached_tokens={getattr(details, 'cached_tokens', None)}, "
+        f"completion_tokens={getattr(usage, 'completion_tokens', None)}"
+    )
+
+
+class StructuredOutputStream:
+    """
+    تجميع Chunks الـ Streaming لـ Structured output:
+        - feed(chunk) بترجع الـ JSON الجزئي (dict) لو اتغير ومرّ OPENAI_STREAM_PUSH_INTERVAL من آخر مرة
+        - result() بترجع الـ Schema كاملة بعد نهاية الـ Stream
+
+    الـ Parsing الجزئي بـ jiter (partial_mode) فالنصوص اللي لسه بتتكتب بتظهر زي ما هي.
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.schema = schema
+        self.parts: List[str] = []
+        self.refusal: List[str] = []
+        self.usage = None
+        self.started = time.perf_counter()
+        self.first_token_seconds: Optional[float] = None
+        self.push_interval = settings.OPENAI_STREAM_PUSH_INTERVAL
+        self._last_push = 0.0
+        self._last_partial = None
+
+    def feed(self, chunk) -> Optional[Dict[str, Any]]:
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return None
+
+        delta = chunk.choices[0].delta
+        if getattr(delta, 'refusal', None):
+            self.refusal.append(delta.refusal)
+        if not delta.content:
+            return None
+
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+        self.parts.append(delta.content)
+
+        now = time.perf_counter()
+        if now - self._last_push < self.push_interval:
+            return None
+        try:
+            partial = jiter.from_json(''.join(self.parts).encode('utf-8'), partial_mode='trailing-strings')
+        except ValueError:
+            return None
+        if not isinstance(partial, dict) or partial == self._last_partial:
+            return None
+
+        self._last_push = now
+        self._last_partial = partial
+        return partial
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def result(self) -> BaseModel:
+        if self.refusal:
+            raise ValueError(f"Model refused the request: {''.join(self.refusal)}")
+        return self.schema.model_validate_json(''.join(self.parts))
+
+
 class OpenAIService:
     """
     خدمة لاستخراج بيانات السيرة الذاتية من Prompt باستخدام OpenAI
     """
     
+    MODEL = "gpt-4o-mini"
+    
+    RESUME_PARSER_PROMPT = """
+        You are a precise Data Extraction Expert.
+        Your task is to extract structured data from the provided Resume/CV text.
+        
+        Rules:
+        1. Extract data EXACTLY as it appears. Do not invent or hallucinate information.
+        2. Map the data strictly to the provided JSON Schema.
+        3. If a field is missing in the text, leave it as null or empty list.
+        4. Detect the language of the resume automatically.
+        5. For 'skills', try to categorize them if possible, otherwise put them in a 'General' category.
+        """
+    
+    # Reduce step للـ Resumes المتقسمة: الحقول الإجبارية اللي ما ظهرتش في أي جزء
+    RESUME_REDUCE_PROMPT = """
+        You are completing a CV that was extracted from a long resume in several parts.
+        You receive the merged extracted data as JSON and the names of the fields that are still missing.
+        
+        Rules:
+        1. Return ONLY the requested fields.
+        2. Use only information present in the merged data. Do not invent names, dates, places or numbers.
+        3. Summary fields (e.g. professional_summary) are written from the experience, education and skills in the data.
+        4. List fields are filled with the entries that the data supports, in the language of the data.
+        """
+    
     def __init__(self):
         # استخدم API Key من Settings
         self.client = openai.OpenAI(
@@ -18,101 +307,171 @@ class OpenAIService:
         self,
         user_prompt: str,
         schema: Type[BaseModel],
-        language: str = 'ar'
+        language: str = 'ar',
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> BaseModel:
         """
         استخراج بيانات السيرة الذاتية من Prompt المستخدم (وضع الكتابة/التأليف)
+
+        on_partial: لو موجودة الرد بيتعمله Stream وبتتنادى بالـ JSON الجزئي أول بأول
         """
-        system_prompt = self._build_system_prompt(schema, language)
-        
         try:
-            completion = self.client.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format=schema,
-                temperature=0.3  # إبداع بسيط لتحسين الصياغة
+            return self._cached_parse(
+                self._extract_messages(user_prompt, schema, language), schema,
+                temperature=0.3,  # إبداع بسيط لتحسين الصياغة
+                language=language,
+                on_partial=on_partial
             )
             
-            return completion.choices[0].message.parsed
-            
         except Exception as e:
             raise Exception(f"OpenAI API Error: {str(e)}")
     
     def parse_resume_text(self, resume_text: str, schema: Type[BaseModel]) -> BaseModel:
         """
         ✅ استخراج البيانات من نص PDF (وضع التحليل الصارم)
-        """
-        system_prompt = """
-        You are a precise Data Extraction Expert.
-        Your task is to extract structured data from the provided Resume/CV text.
-        
-        Rules:
-        1. Extract data EXACTLY as it appears. Do not invent or hallucinate information.
-        2. Map the data strictly to the provided JSON Schema.
-        3. If a field is missing in the text, leave it as null or empty list.
-        4. Detect the language of the resume automatically.
-        5. For 'skills', try to categorize them if possible, otherwise put them in a 'General' category.
-        """
 
+        النص الطويل بيتقسم لـ Chunks بتتحلل بالتوازي وبتتدمج (بدل ما يتقص عند حد ثابت)
+        """
         try:
-            completion = self.client.beta.chat.completions.parse(
-                model="gpt-4o-mini", 
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Resume Text:\n{resume_text[:10000]}"}
-                ],
-                response_format=schema,
-                temperature=0.0  # صفر إبداع = دقة نقل 100%
-            )
+            chunks = self._resume_chunks(resume_text)
+            if len(chunks) <= 1:
+                return self._cached_parse(
+                    self._resume_messages(chunks[0] if chunks else ''), schema,
+                    temperature=0.0  # صفر إبداع = دقة نقل 100%
+                )
+
+            partials = self._parse_resume_chunks(chunks, partial_schema(schema))
+            merged = merge_partial_data(partials, schema)
             
-            return completion.choices[0].message.parsed
+            # Reduce: الحقول الإجبارية اللي ما ظهرتش في أي Chunk بتتكمّل من البيانات المدموجة
+            missing = missing_fields(merged, schema)
+            if missing:
+                filled = self._cached_parse(
+                    self._reduce_messages(merged, missing), fill_schema(schema, tuple(missing)), temperature=0.0
+                )
+                merged.update(filled.model_dump())
+            return schema.model_validate(merged)
             
         except Exception as e:
             raise Exception(f"Resume Parsing Error: {str(e)}")
 
-    def _build_system_prompt(self, schema: Type[BaseModel], language: str) -> str:
+    @staticmethod
+    def _resume_chunks(resume_text: str) -> List[str]:
+        chunks = build_chunks(compact_resume_text(resume_text), settings.RESUME_CHUNK_CHARS)
+        if len(chunks) > settings.RESUME_MAX_CHUNKS:
+            logger.warning(f"Resume has {len(chunks)} chunks, parsing the first {settings.RESUME_MAX_CHUNKS}")
+        return chunks[:settings.RESUME_MAX_CHUNKS]
+
+    def _parse_resume_chunks(self, chunks: List[str], schema: Type[BaseModel]) -> List[BaseModel]:
         """
-        بناء System Prompt قوي للحصول على أفضل نتائج في التوليد
+        Map: كل Chunk في طلب منفصل بالتوازي (Threads، الطلبات I/O)
         """
-        lang_map = {
-            'ar': 'العربية',
-            'en': 'الإنجليزية'
-        }
-        
-        prompt = f"""
-أنت خبير دولي في صياغة السير الذاتية (Resume Expert) المتوافقة مع أنظمة الـ ATS.
-مهمتك: تحويل مسودة المستخدم إلى سيرة ذاتية احترافية، مركزة على النتائج، ومناسبة لمجاله الوظيفي أيًا كان.
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            return list(executor.map(
+                lambda indexed: self._cached_parse(
+                    self._resume_messages(indexed[1], indexed[0], len(chunks)), schema, temperature=0.0
+                ),
+                enumerate(chunks, start=1)
+            ))
 
-## القواعد الأساسية للصياغة لكل المهن:
+    def _cached_parse(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Type[BaseModel],
+        temperature: float,
+        language: str = '',
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> BaseModel:
+        """
+        نفس المدخل + Schema + لغة + Model + Prompt = نتيجة من الكاش بدل OpenAI
+        """
+        llm_cache = get_llm_cache()
+        if llm_cache is None:
+            return self._parse_completion(messages, schema, temperature, on_partial)
 
-### 1. الأسلوب والمنظور (Tone & Perspective):
-- **ممنوع صيغة الغائب**: لا تستخدم "هو"، "لديه"، "يسعى".
-- **استخدم الصيغة المباشرة**: ابدأ بالمسمى الوظيفي أو الفعل مباشرة (مثال: "محاسب قانوني.." بدل "هو يعمل كمحاسب").
-- **تجنب العبارات الإنشائية**: بدلاً من "شخص مجتهد يحب العمل"، ركز على "محترف مخصص لتحقيق أهداف المؤسسة من خلال [مهارة معينة]".
+        cached, key = llm_cache.lookup(self.MODEL, messages, schema, language, temperature)
+        if cached is not None:
+            return cached
 
-### 2. الملخص المهني (Professional Summary):
-- اجعل الصياغة قوية ومكثفة (2-4 جمل).
-- الهيكل: [المسمى الوظيفي] + [عدد سنوات الخبرة] + [أبرز التخصصات/المهارات] + [القيمة التي تضيفها للشركة].
+        result = self._parse_completion(messages, schema, temperature, on_partial)
+        llm_cache.store(key, result)
+        return result
 
-### 3. الخبرات والمسؤوليات (Experience):
-- ابدأ كل نقطة (Bullet Point) بـ **فعل حركة قوي** (Action Verb).
-- ركز على **الإنجازات** وليس فقط المهام الروتينية.
+    def _parse_completion(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Type[BaseModel],
+        temperature: float,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> BaseModel:
+        if on_partial is not None:
+            return self._stream_completion(messages, schema, temperature, on_partial)
 
-### 4. المهارات (Skills):
-- المصطلحات التقنية بالإنجليزية.
-- المهارات الناعمة بلغة الـ CV ({lang_map.get(language, 'العربية')}).
+        started = time.perf_counter()
+        completion = self.client.chat.completions.create(
+            model=self.MODEL,
+            messages=messages,
+            response_format=get_response_format(schema),
+            temperature=temperature
+        )
+        log_completion(self.MODEL, messages, completion.usage, time.perf_counter() - started)
+        return parse_structured_completion(completion, schema)
 
-### 5. القواعد العامة:
-- حافظ على الدقة الإملائية.
-- لا تخترع بيانات واترك الحقول الفارغة null.
-- نسق التواريخ بصيغة: "MMM YYYY - MMM YYYY".
+    def _stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Type[BaseModel],
+        temperature: float,
+        on_partial: Callable[[Dict[str, Any]], None]
+    ) -> BaseModel:
+        stream = StructuredOutputStream(schema)
+        chunks = self.client.chat.completions.create(
+            model=self.MODEL,
+            messages=messages,
+            response_format=get_response_format(schema),
+            temperature=temperature,
+            stream=True,
+            stream_options={'include_usage': True}
+        )
+        for chunk in chunks:
+            partial = stream.feed(chunk)
+            if partial is not None:
+                on_partial(partial)
 
-الآن، استخرج البيانات من نص المستخدم وصغها باحترافية تامة وفقاً للـ Schema.
-"""
-        return prompt.strip()
+        log_completion(self.MODEL, messages, stream.usage, stream.elapsed, stream.first_token_seconds)
+        return stream.result()
+
+    def _extract_messages(self, user_prompt: str, schema: Type[BaseModel], language: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self._build_system_prompt(schema, language)},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _resume_messages(self, resume_text: str, part: int = 1, parts: int = 1) -> List[Dict[str, str]]:
+        if parts > 1:
+            header = (
+                f"Resume Text (part {part} of {parts}). "
+                f"Extract only what appears in this part and leave every other field null:"
+            )
+        else:
+            header = "Resume Text:"
+        return [
+            {"role": "system", "content": self.RESUME_PARSER_PROMPT},
+            {"role": "user", "content": f"{header}\n{resume_text}"}
+        ]
+
+    def _reduce_messages(self, merged: Dict[str, Any], fields: List[str]) -> List[Dict[str, str]]:
+        logger.info(f"Chunked resume is missing {fields}, filling from the merged data")
+        return [
+            {"role": "system", "content": self.RESUME_REDUCE_PROMPT},
+            {"role": "user", "content": (
+                f"Fields to fill: {', '.join(fields)}\n"
+                f"Merged CV data:\n{json.dumps(merged, ensure_ascii=False)}"
+            )}
+        ]
+
+    def _build_system_prompt(self, schema: Type[BaseModel], language: str) -> str:
+        return build_system_prompt(schema, language, PROMPT_VERSION)
     
     def check_missing_fields(self, cv_data: BaseModel) -> Dict[str, Any]:
         """
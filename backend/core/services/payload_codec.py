@@ -0,0 +1,69 @@
+"""
+Payload Codec
+ضغط الـ Payloads الكبيرة للـ CompileJob (logs / error_message / cv_data)
+قبل تخزينها في جدول جانبي
+
+كل Blob بيبدأ ببايت يحدد طريقة الضغط عشان نقدر نغيّر الـ Codec
+من غير ما نعيد كتابة البيانات القديمة:
+    b'Z' zstd   b'z' zlib (لو zstandard مش متسطب)   b'R' بدون ضغط
+"""
+import json
+import zlib
+from typing import Any, Optional
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is in requirements.txt
+    zstandard = None
+
+CODEC_ZSTD = b'Z'
+CODEC_ZLIB = b'z'
+CODEC_RAW = b'R'
+
+# Payloads أصغر من كده مش بتستاهل تكلفة الضغط
+MIN_COMPRESS_BYTES = 64
+
+
+def encode_bytes(raw: bytes) -> bytes:
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return CODEC_RAW + raw
+    if zstandard is not None:
+        level = getattr(settings, 'COMPILE_PAYLOAD_ZSTD_LEVEL', 3)
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=level).compress(raw)
+    return CODEC_ZLIB + zlib.compress(raw, 6)
+
+
+def decode_bytes(blob) -> bytes:
+    blob = bytes(blob)  # BinaryField ممكن يرجع memoryview
+    codec, body = blob[:1], blob[1:]
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(body)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    return body
+
+
+def encode_text(text: Optional[str]) -> Optional[bytes]:
+    if not text:
+        return None
+    return encode_bytes(text.encode('utf-8'))
+
+
+def decode_text(blob) -> str:
+    if blob is None:
+        return ''
+    return decode_bytes(blob).decode('utf-8')
+
+
+def encode_json(data: Any) -> Optional[bytes]:
+    if data is None:
+        return None
+    return encode_bytes(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_json(blob) -> Any:
+    if blob is None:
+        return None
+    return json.loads(decode_bytes(blob))
@@ -0,0 +1,212 @@
+"""
+Content-addressed PDF Cache
+يمنع تشغيل Tectonic مرة أخرى لو نفس المحتوى اتحول لـ PDF قبل كده
+"""
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django_redis import get_redis_connection
+
+from .latex_service import LaTeXService
+
+logger = logging.getLogger(__name__)
+
+# Cache لبصمات الخطوط: {path: (mtime, size, digest)}
+_FONT_DIGESTS: Dict[str, tuple] = {}
+
+
+class PDFCacheService:
+    """
+    كاش للـ PDFs مفتاحه SHA-256 لمحتوى LaTeX + ملف الخط + نسخة القالب + المحرك
+
+    الـ Index محفوظ في Redis:
+        - entries: digest -> {path, size}
+        - lru:     digest -> آخر استخدام (Sorted Set)
+        - bytes:   مجموع أحجام الـ PDFs المفهرسة
+
+    الكاش لا ينسخ الملفات: كل entry تشير لـ PDF محفوظ بالفعل في الـ Storage.
+    لما الحجم الكلي يعدي PDF_CACHE_MAX_BYTES بنشيل الأقدم استخداماً (LRU)
+    من الـ Index، وبنمسح الملف من الـ Storage كمان إلا لو فيه CompileJob
+    لسه الـ pdf_url بتاعه بيشاور عليه (الملف ساعتها تابع للـ Job مش للكاش).
+    """
+
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.max_bytes = getattr(settings, 'PDF_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+
+        self.entries_key = cache.make_key('pdf_cache:entries')
+        self.lru_key = cache.make_key('pdf_cache:lru')
+        self.bytes_key = cache.make_key('pdf_cache:bytes')
+        self.hits_key = cache.make_key('pdf_cache:hits')
+        self.misses_key = cache.make_key('pdf_cache:misses')
+
+    @staticmethod
+    def compute_digest(
+        latex_content: str,
+        font_path: Optional[str] = None,
+        template_name: Optional[str] = None,
+        engine: str = 'tectonic'
+    ) -> str:
+        """
+        حساب بصمة المدخلات اللي بتحدد شكل الـ PDF
+        (engine: Tectonic أو xelatex بـ Precompiled preamble، الملفين مش متطابقين)
+        """
+        digest = hashlib.sha256()
+        digest.update(b'engine:')
+        digest.update(engine.encode('utf-8'))
+        digest.update(b'\n')
+        digest.update(b'template:')
+        digest.update((template_name or '').encode('utf-8'))
+        digest.update(b':')
+        digest.update(LaTeXService.get_template_version(template_name).encode('utf-8'))
+        digest.update(b'\nfont:')
+        digest.update(PDFCacheService._font_digest(font_path).encode('utf-8'))
+        digest.update(b'\nsource:')
+        digest.update(latex_content.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _font_digest(font_path: Optional[str]) -> str:
+        """
+        بصمة ملف الخط (محسوبة مرة واحدة لكل mtime)
+        """
+        if not font_path:
+            return ''
+
+        try:
+            stat = Path(font_path).stat()
+        except OSError:
+            return ''
+
+        cached = _FONT_DIGESTS.get(font_path)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            return cached[2]
+
+        font_digest = hashlib.sha256(Path(font_path).read_bytes()).hexdigest()
+        _FONT_DIGESTS[font_path] = (stat.st_mtime, stat.st_size, font_digest)
+        return font_digest
+
+    def lookup(self, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        البحث عن PDF محفوظ بنفس البصمة
+
+        Returns:
+            dict فيه path و url و size، أو None لو مش موجود
+        """
+        try:
+            raw = self.redis.hget(self.entries_key, digest)
+            if raw is None:
+                self.redis.incr(self.misses_key)
+                return None
+
+            entry = json.loads(raw)
+
+            # الملف ممكن يكون اتمسح من الـ Storage
+            if not default_storage.exists(entry['path']):
+                self._remove(digest)
+                self.redis.incr(self.misses_key)
+                return None
+
+            pipe = self.redis.pipeline()
+            pipe.zadd(self.lru_key, {digest: time.time()})
+            pipe.incr(self.hits_key)
+            pipe.execute()
+
+            entry['url'] = default_storage.url(entry['path'])
+            return entry
+
+        except Exception as e:
+            logger.warning(f"PDF cache lookup failed: {str(e)}")
+            return None
+
+    def store(self, digest: str, path: str, size: int):
+        """
+        تسجيل PDF جديد في الكاش ثم تطبيق سياسة الـ Eviction
+        """
+        try:
+            entry = json.dumps({'path': path, 'size': size})
+            if self.redis.hsetnx(self.entries_key, digest, entry):
+                self.redis.incrby(self.bytes_key, size)
+            self.redis.zadd(self.lru_key, {digest: time.time()})
+            self.evict()
+        except Exception as e:
+            logger.warning(f"PDF cache store failed: {str(e)}")
+
+    def evict(self) -> int:
+        """
+        حذف الأقدم استخداماً لحد ما الحجم الكلي يرجع تحت الحد المسموح
+
+        Returns:
+            عدد الـ entries اللي اتشالت
+        """
+        evicted = 0
+        while int(self.redis.get(self.bytes_key) or 0) > self.max_bytes:
+            oldest = self.redis.zpopmin(self.lru_key, 1)
+            if not oldest:
+                # الـ Index فاضي: نصفر العداد عشان ما يفضلش عالق
+                self.redis.set(self.bytes_key, 0)
+                break
+            digest = oldest[0][0]
+            entry = self._remove(digest, already_popped=True)
+            if entry:
+                self._delete_unreferenced(entry['path'])
+            evicted += 1
+
+        if evicted:
+            logger.info(f"PDF cache evicted {evicted} entries")
+        return evicted
+
+    def _remove(self, digest, already_popped: bool = False) -> Optional[Dict[str, Any]]:
+        raw = self.redis.hget(self.entries_key, digest)
+        entry = json.loads(raw) if raw is not None else None
+        pipe = self.redis.pipeline()
+        pipe.hdel(self.entries_key, digest)
+        if not already_popped:
+            pipe.zrem(self.lru_key, digest)
+        if entry is not None:
+            pipe.decrby(self.bytes_key, entry['size'])
+        pipe.execute()
+        return entry
+
+    def _delete_unreferenced(self, path: str) -> bool:
+        """
+        مسح PDF اتشال من الـ Index، إلا لو Job لسه بتعرضه للمستخدم
+
+        Returns:
+            True لو الملف اتمسح
+        """
+        from core.models import CompileJob
+
+        try:
+            # الـ URL ممكن يكون Signed أو Absolute، فبنقارن من غير الـ Query string
+            url = default_storage.url(path).split('?', 1)[0]
+            if CompileJob.objects.filter(pdf_url__contains=url).exists():
+                return False
+            default_storage.delete(path)
+            return True
+        except Exception as e:
+            logger.warning(f"PDF cache could not delete {path}: {str(e)}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات الكاش (hits / misses / الحجم)
+        """
+        hits = int(self.redis.get(self.hits_key) or 0)
+        misses = int(self.redis.get(self.misses_key) or 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'entries': self.redis.hlen(self.entries_key),
+            'bytes': int(self.redis.get(self.bytes_key) or 0),
+            'max_bytes': self.max_bytes,
+        }
@@ -0,0 +1,174 @@
+"""
+PDF Import Cache
+نفس ملف الـ PDF بيترفع أكتر من مرة (بعد Login redirect، Timeout، إعادة محاولة)
+فبنحفظ النص المستخرج والـ cv_data بمفتاح SHA-256 لمحتوى الملف ونرجعهم قبل أي Parsing
+"""
+import hashlib
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from .payload_codec import decode_json, decode_text, encode_json, encode_text
+
+logger = logging.getLogger(__name__)
+
+
+class PDFImportCacheService:
+    """
+    في Redis:
+        - entry:<digest>: hash {text, cv_data, parser} مضغوطين (payload_codec) بـ TTL
+        - lru:            digest -> آخر استخدام (Sorted Set)
+        - sizes:          digest -> حجم الـ Entry بالبايت (عشان الـ bytes يفضل مظبوط بعد الـ TTL)
+        - bytes:          مجموع الأحجام (Eviction لما يعدي PDF_IMPORT_CACHE_MAX_BYTES)
+
+    الـ cv_data مربوطة بنسخة الـ Parser (الـ Prompt + الـ Schema): لو اتغيرت بنستخدم النص بس
+    """
+
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.ttl = settings.PDF_IMPORT_CACHE_TTL
+        self.max_bytes = settings.PDF_IMPORT_CACHE_MAX_BYTES
+
+        self.lru_key = cache.make_key('pdf_import_cache:lru')
+        self.sizes_key = cache.make_key('pdf_import_cache:sizes')
+        self.bytes_key = cache.make_key('pdf_import_cache:bytes')
+        self.hits_key = cache.make_key('pdf_import_cache:hits')
+        self.misses_key = cache.make_key('pdf_import_cache:misses')
+
+    def _entry_key(self, digest: str) -> str:
+        return cache.make_key(f'pdf_import_cache:entry:{digest}')
+
+    @staticmethod
+    def compute_digest(uploaded_file) -> str:
+        """
+        SHA-256 لمحتوى الملف المرفوع (بالـ Chunks، والملف بيرجع لأوله بعدها)
+        """
+        digest = hashlib.sha256()
+        uploaded_file.seek(0)
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+        uploaded_file.seek(0)
+        return digest.hexdigest()
+
+    @staticmethod
+    def parser_version() -> str:
+        from core.schemas.classic import ClassicArabicCVSchema
+        from .openai_service import OpenAIService, PROMPT_VERSION
+
+        digest = hashlib.sha256()
+        for part in (OpenAIService.MODEL, OpenAIService.RESUME_PARSER_PROMPT, OpenAIService.RESUME_REDUCE_PROMPT,
+                     str(PROMPT_VERSION), ClassicArabicCVSchema.__name__, str(settings.RESUME_CHUNK_CHARS)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()[:16]
+
+    def get(self, digest: str) -> Dict[str, Any]:
+        """
+        Returns:
+            {'text': str أو None, 'cv_data': dict أو None}
+        """
+        try:
+            text, cv_data, parser = self.redis.hmget(self._entry_key(digest), 'text', 'cv_data', 'parser')
+            if cv_data is not None and (parser.decode() if isinstance(parser, bytes) else parser) != self.parser_version():
+                cv_data = None
+
+            pipe = self.redis.pipeline()
+            if text is not None:
+                pipe.zadd(self.lru_key, {digest: time.time()})
+            pipe.incr(self.hits_key if cv_data is not None else self.misses_key)
+            pipe.execute()
+
+            return {
+                'text': decode_text(text) if text is not None else None,
+                'cv_data': decode_json(cv_data),
+            }
+        except Exception as e:
+            logger.warning(f"PDF import cache lookup failed: {str(e)}")
+            return {'text': None, 'cv_data': None}
+
+    def store_text(self, digest: str, text: str):
+        self._store(digest, {'text': encode_text(text) or b''})
+
+    def store_cv_data(self, digest: str, cv_data: Dict[str, Any]):
+        self._store(digest, {'cv_data': encode_json(cv_data), 'parser': self.parser_version()})
+
+    def _store(self, digest: str, fields: Dict[str, Any]):
+        try:
+            entry_key = self._entry_key(digest)
+            pipe = self.redis.pipeline()
+            pipe.hset(entry_key, mapping=fields)
+            pipe.expire(entry_key, self.ttl)
+            pipe.execute()
+
+            size = sum(len(value) for value in self.redis.hvals(entry_key))
+            previous = int(self.redis.hget(self.sizes_key, digest) or 0)
+
+            pipe = self.redis.pipeline()
+            pipe.hset(self.sizes_key, digest, size)
+            pipe.incrby(self.bytes_key, size - previous)
+            pipe.zadd(self.lru_key, {digest: time.time()})
+            pipe.execute()
+            self.evict()
+        except Exception as e:
+            logger.warning(f"PDF import cache store failed: {str(e)}")
+
+    def evict(self) -> int:
+        """
+        شيل اللي انتهى الـ TTL بتاعه، وبعدين الأقدم استخداماً لحد ما الحجم يرجع تحت الحد
+
+        Returns:
+            عدد الـ entries اللي اتشالت
+        """
+        stale = self.redis.zrangebyscore(self.lru_key, 0, time.time() - self.ttl)
+        for digest in stale:
+            self._remove(digest)
+        evicted = len(stale)
+
+        while int(self.redis.get(self.bytes_key) or 0) > self.max_bytes:
+            oldest = self.redis.zrange(self.lru_key, 0, 0)
+            if not oldest:
+                self.redis.set(self.bytes_key, 0)
+                break
+            self._remove(oldest[0])
+            evicted += 1
+
+        if evicted:
+            logger.info(f"PDF import cache evicted {evicted} entries")
+        return evicted
+
+    def _remove(self, digest):
+        digest = digest.decode() if isinstance(digest, bytes) else digest
+        size = int(self.redis.hget(self.sizes_key, digest) or 0)
+        pipe = self.redis.pipeline()
+        pipe.delete(self._entry_key(digest))
+        pipe.zrem(self.lru_key, digest)
+        pipe.hdel(self.sizes_key, digest)
+        pipe.decrby(self.bytes_key, size)
+        pipe.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = int(self.redis.get(self.hits_key) or 0)
+        misses = int(self.redis.get(self.misses_key) or 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'entries': self.redis.zcard(self.lru_key),
+            'bytes': int(self.redis.get(self.bytes_key) or 0),
+            'max_bytes': self.max_bytes,
+        }
+
+
+def get_pdf_import_cache() -> Optional[PDFImportCacheService]:
+    if not settings.PDF_IMPORT_CACHE_ENABLED:
+        return None
+    try:
+        return PDFImportCacheService()
+    except Exception as e:
+        logger.warning(f"PDF import cache unavailable: {str(e)}")
+        return None
@@ -0,0 +1,38 @@
+"""
+PDF Import State
+حالة عمليات استيراد الـ CV من PDF (QUEUED / PROCESSING / SUCCESS / FAILED) في الـ Cache
+
+الضيوف مالهمش CompileJob، فالـ import_id (UUID) هو اللي بيوصلهم للنتيجة
+"""
+import uuid
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def _import_key(import_id) -> str:
+    return f'pdf_import:{import_id}'
+
+
+def create_import(owner_id=None) -> Dict[str, Any]:
+    state = {
+        'import_id': str(uuid.uuid4()),
+        'status': 'QUEUED',
+        'owner_id': str(owner_id) if owner_id else None,
+        'created_at': timezone.now().isoformat(),
+    }
+    cache.set(_import_key(state['import_id']), state, settings.PDF_IMPORT_RESULT_TTL)
+    return state
+
+
+def get_import(import_id) -> Optional[Dict[str, Any]]:
+    return cache.get(_import_key(import_id))
+
+
+def update_import(import_id, **fields) -> Dict[str, Any]:
+    state = get_import(import_id) or {'import_id': str(import_id)}
+    state.update(fields)
+    cache.set(_import_key(import_id), state, settings.PDF_IMPORT_RESULT_TTL)
+    return state
@@ -0,0 +1,65 @@
+"""
+PDF Text Extraction
+استخراج النص من PDF صفحة بصفحة، والملفات الكبيرة بتتقسم على Process pool
+(pypdf كله Python، فالـ Threads مش بتفرق بسبب الـ GIL)
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from django.conf import settings
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    # بتشتغل في Process تانية: pypdf بس، من غير Django
+    reader = PdfReader(path)
+    return [(reader.pages[index].extract_text() or '') for index in range(start, stop)]
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Pool واحد لكل Worker process (None لو مينفعش نعمل Processes، زي جوه prefork child)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None and settings.PDF_IMPORT_PROCESSES > 1:
+            try:
+                # spawn: الـ Worker بيشتغل بـ Threads، والـ fork مع Threads مش آمن
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.PDF_IMPORT_PROCESSES,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            except Exception as e:
+                logger.warning(f"PDF process pool unavailable, extracting in-process: {str(e)}")
+                return None
+        return _pool
+
+
+def extract_pdf_text(path: str) -> str:
+    """
+    النص الكامل للـ PDF (الصفحات مفصولة بـ Form feed)
+    """
+    page_count = len(PdfReader(path).pages)
+    pool = get_process_pool() if page_count >= settings.PDF_IMPORT_PARALLEL_MIN_PAGES else None
+
+    if pool is None:
+        pages = _extract_page_range(path, 0, page_count)
+    else:
+        chunk = -(-page_count // settings.PDF_IMPORT_PROCESSES)  # ceil
+        futures = [
+            pool.submit(_extract_page_range, path, start, min(start + chunk, page_count))
+            for start in range(0, page_count, chunk)
+        ]
+        pages = [page for future in futures for page in future.result()]
+
+    logger.info(f"Extracted {page_count} PDF pages ({'parallel' if pool else 'in-process'})")
+    # Form feed بين الصفحات عشان التنظيف يعرف الـ Headers/Footers المتكررة
+    return '\f'.join(pages)
@@ -0,0 +1,180 @@
+"""
+Precompiled Preamble Formats
+حفظ الجزء الثابت من Preamble كل قالب في XeLaTeX format (mylatexformat)
+عشان كل Compile يعالج الـ Body بس بدل تحميل الباكدجات من الأول
+
+Tectonic لا يدعم custom formats، لذلك المسار ده يستخدم xelatex (TeX Live)
+ولو مش متاح بنرجع لـ Tectonic تلقائياً.
+
+الـ Format بيتبني وقت الـ Deploy بس (python manage.py warm_tectonic_cache)، والـ Workers
+بيستخدموه لو موجود: البناء ممكن ياخد دقايق وما ينفعش يحصل جوه Compile عليه Time limit.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+from .latex_service import LaTeXService
+
+logger = logging.getLogger(__name__)
+
+
+class PreambleFormatService:
+    """
+    بناء واستخدام format لكل (قالب، نسخة)
+    """
+
+    # السطر اللي بيفصل الجزء الثابت في القالب (انظر classic_arabic_v1.tex)
+    DUMP_MARKER = r'\csname endofdump\endcsname'
+
+    def __init__(self):
+        self.format_dir = Path(settings.LATEX_FORMAT_DIR)
+        self.template_dir = Path(__file__).parent.parent / 'latex_templates'
+
+    def is_available(self) -> bool:
+        """
+        هل المسار ده مفعل و xelatex موجود؟
+        """
+        return settings.LATEX_PREAMBLE_FORMAT_ENABLED and shutil.which('xelatex') is not None
+
+    def format_name(self, template_name: str) -> str:
+        """
+        اسم الـ format مرتبط بنسخة القالب، فأي تعديل في القالب يبني format جديد
+        """
+        version = LaTeXService.get_template_version(template_name)
+        return f"{Path(template_name).stem}-{version}"
+
+    def extract_static_preamble(self, template_name: str) -> Optional[str]:
+        """
+        الجزء الثابت من القالب (قبل DUMP_MARKER) أو None لو القالب مش مجهز
+        """
+        template_path = self.template_dir / template_name
+        if not template_path.exists():
+            return None
+
+        content = template_path.read_text(encoding='utf-8')
+        if self.DUMP_MARKER not in content:
+            return None
+        return content.split(self.DUMP_MARKER, 1)[0]
+
+    def format_path(self, template_name: str) -> Path:
+        return self.format_dir / f"{self.format_name(template_name)}.fmt"
+
+    def failure_marker(self, template_name: str) -> Path:
+        # بناء فشل لنفس نسخة القالب ما يتعادش في كل Deploy (إلا بـ --rebuild-formats)
+        return self.format_dir / f"{self.format_name(template_name)}.failed"
+
+    def get_format(self, template_name: str) -> Optional[Path]:
+        """
+        مسار الـ format لو المسار مفعل ومبني (من غير بناء: ده شغل warm_tectonic_cache)
+        """
+        if not template_name or not self.is_available():
+            return None
+        fmt_path = self.format_path(template_name)
+        return fmt_path if fmt_path.exists() else None
+
+    def engine(self, template_name: str) -> str:
+        """
+        المحرك اللي هيترجم القالب (جزء من مفتاح كاش الـ PDFs: المحركين مش بيطلعوا نفس الملف)
+        """
+        if self.get_format(template_name):
+            return f"xelatex-fmt:{self.format_name(template_name)}"
+        return 'tectonic'
+
+    def build_format(self, template_name: str, force: bool = False) -> Optional[Path]:
+        """
+        بناء الـ format لنسخة القالب الحالية (مرة واحدة، وقت الـ Deploy)
+
+        Args:
+            force: إعادة المحاولة حتى لو فيه بناء فاشل متسجل للنسخة دي
+
+        Returns:
+            Path لملف .fmt أو None لو البناء مش ممكن
+        """
+        name = self.format_name(template_name)
+        fmt_path = self.format_path(template_name)
+        if fmt_path.exists():
+            return fmt_path
+
+        marker = self.failure_marker(template_name)
+        if marker.exists() and not force:
+            logger.info(f"Preamble format {name} failed before, skipping (see {marker})")
+            return None
+
+        preamble = self.extract_static_preamble(template_name)
+        if preamble is None:
+            return None
+
+        self.format_dir.mkdir(parents=True, exist_ok=True)
+
+        # البناء في مجلد مؤقت ثم os.replace: لو اتنين Workers بنوا في نفس الوقت
+        # آخر واحد يكسب والملف عمره ما يبقى نصه مكتوب
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            (tmpdir / 'preamble.tex').write_text(
+                preamble + self.DUMP_MARKER + '\n\\begin{document}\n\\end{document}\n',
+                encoding='utf-8'
+            )
+
+            try:
+                result = subprocess.run(
+                    [
+                        'xelatex', '-ini', '-interaction=nonstopmode',
+                        f'-jobname={name}', '&xelatex', 'mylatexformat.ltx', 'preamble.tex'
+                    ],
+                    cwd=tmpdir,
+                    capture_output=True,
+                    text=True,
+                    timeout=300
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                return self._build_failed(template_name, str(e))
+
+            built = tmpdir / f"{name}.fmt"
+            if result.returncode != 0 or not built.exists():
+                return self._build_failed(template_name, result.stdout[-500:])
+
+            os.replace(built, fmt_path)
+
+        marker.unlink(missing_ok=True)
+        logger.info(f"Built preamble format {fmt_path.name}")
+        return fmt_path
+
+    def _build_failed(self, template_name: str, details: str) -> None:
+        logger.warning(f"Preamble format build failed for {template_name}: {details}")
+        try:
+            self.failure_marker(template_name).write_text(details, encoding='utf-8')
+        except OSError as e:
+            logger.warning(f"Could not record preamble format failure: {str(e)}")
+        return None
+
+    def compile(
+        self,
+        tex_file: Path,
+        cwd: Path,
+        template_name: str,
+        timeout: int = 120
+    ) -> subprocess.CompletedProcess:
+        """
+        ترجمة ملف .tex باستخدام الـ format الجاهز (الـ Preamble الثابت بيتخطى)
+        """
+        env = os.environ.copy()
+        # الفاصل في الآخر يحافظ على مسارات TeX Live الافتراضية
+        env['TEXFORMATS'] = f"{self.format_dir}{os.pathsep}"
+
+        return subprocess.run(
+            [
+                'xelatex', '-interaction=nonstopmode', '-halt-on-error',
+                f'-fmt={self.format_name(template_name)}', tex_file.name
+            ],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
@@ -0,0 +1,80 @@
+"""
+Realtime Service
+إرسال أحداث من الـ Workers (Celery) للـ Clients المتصلين بالـ WebSocket عبر Channels
+"""
+import json
+import logging
+from typing import Dict, Any
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# Job status (ws/jobs/<job_id>/)
+# =============================================
+
+TERMINAL_STATUSES = ('SUCCESS', 'FAILED', 'CANCELLED')
+
+
+def job_group(job_id) -> str:
+    # نفس اسم الـ Group في JobStatusConsumer
+    return f'job_{job_id}'
+
+
+def job_status_payload(job) -> Dict[str, Any]:
+    """
+    حالة الـ Job بنفس شكل رد /api/check-job-status/<job_id>/
+    """
+    payload = {
+        'job_id': str(job.id),
+        'status': job.status,
+        'created_at': job.created_at,
+    }
+
+    if job.status == 'SUCCESS':
+        payload.update({
+            'pdf_url': job.pdf_url,
+            'completed_at': job.completed_at,
+            'duration_seconds': job.duration_seconds,
+        })
+    elif job.status == 'FAILED':
+        payload['error'] = job.error_message
+    elif job.status == 'PROCESSING':
+        payload['message'] = 'جاري توليد السيرة الذاتية...'
+
+    return payload
+
+
+def _publish_to_job(job_id, event_type: str, message: str):
+    try:
+        # Channel layer ناقص أو متظبط غلط ما يوقعش الـ Task ولا الـ on_commit hook بتاع الانتقال
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(job_group(job_id), {'type': event_type, 'message': message})
+    except Exception as e:
+        logger.warning(f"Realtime publish for job {job_id} failed: {str(e)}")
+
+
+def publish_job_status(job):
+    """
+    بيبعت الحالة الجديدة لكل اللي متابعين الـ Job (بدل ما الـ Client يعمل Polling)
+
+    فشل الـ Channel layer ما يوقفش الانتقال: check-job-status فاضل كـ Fallback
+    """
+    _publish_to_job(
+        job.id, 'job_status',
+        json.dumps(job_status_payload(job), ensure_ascii=False, cls=DjangoJSONEncoder),
+    )
+
+
+def publish_job_event(job_id, payload: Dict[str, Any]):
+    """
+    أحداث الـ Job غير الحالة (cv_data.partial / cv_data.complete) على نفس ws/jobs/<job_id>/:
+    الـ Consumer ده بيتأكد إن المتصل صاحب الـ Job، فبيانات الـ CV ما توصلش لحد تاني
+    """
+    _publish_to_job(job_id, 'job_event', json.dumps(payload, ensure_ascii=False, cls=DjangoJSONEncoder))
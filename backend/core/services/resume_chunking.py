@@ -0,0 +1,248 @@
+"""
+Resume Chunking (Map-Reduce Parsing)
+الـ CVs الطويلة (الأكاديمية مثلاً) بدل ما تتقص عند 10,000 حرف:
+    1. تنظيف النص (Headers/Footers المتكررة، أرقام الصفحات، المسافات الزيادة)
+    2. تقسيمه لأقسام (الخبرات، التعليم، ...) وتجميعها في Chunks بحد أقصى للحجم
+    3. كل Chunk بيتحلل لوحده (بالتوازي) على Schema مرنة كل حقولها اختيارية
+    4. دمج النتايج، وReduce: الحقول الإجبارية اللي ما ظهرتش في أي Chunk (الملخص مثلاً)
+       بتتكمّل في طلب واحد من البيانات المدموجة، وبعدين الـ Schema الأصلية
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type, get_args
+
+from pydantic import BaseModel, Field, ValidationError, create_model
+
+PAGE_BREAK = '\f'
+
+_SPACES_RE = re.compile(r'[ \t\u00a0]+')
+_PAGE_NUMBER_RE = re.compile(
+    r'^(?:page\s*)?\d{1,3}(?:\s*(?:/|of|من)\s*\d{1,3})?$|^(?:صفحة|الصفحة)\s*\d{1,3}(?:\s*من\s*\d{1,3})?$',
+    re.IGNORECASE
+)
+
+# عناوين الأقسام الشائعة (عربي وإنجليزي)
+_SECTION_WORDS = (
+    'summary', 'profile', 'objective', 'about me',
+    'experience', 'work experience', 'professional experience', 'employment', 'employment history',
+    'education', 'academic background', 'qualifications',
+    'skills', 'technical skills', 'core competencies',
+    'projects', 'publications', 'research', 'research experience', 'teaching', 'teaching experience',
+    'certifications', 'certificates', 'courses', 'training', 'awards', 'honors', 'grants',
+    'languages', 'volunteering', 'volunteer experience', 'activities', 'leadership', 'references',
+    'conferences', 'presentations', 'memberships',
+    'الملخص', 'الملخص المهني', 'نبذة', 'الهدف الوظيفي', 'الخبرات', 'الخبرة العملية', 'الخبرات العملية',
+    'التعليم', 'المؤهلات', 'المؤهلات العلمية', 'المهارات', 'المشاريع', 'الأبحاث', 'المنشورات',
+    'الشهادات', 'الدورات', 'الدورات التدريبية', 'الجوائز', 'اللغات', 'الأنشطة', 'العمل التطوعي',
+    'المسؤوليات', 'المسؤوليات والأنشطة',
+)
+_SECTION_RE = re.compile(
+    r'^[\W_]*(?:' + '|'.join(re.escape(word) for word in sorted(_SECTION_WORDS, key=len, reverse=True)) + r')[\W_]*$',
+    re.IGNORECASE
+)
+
+
+# =============================================
+# 1. Cleaning
+# =============================================
+
+def compact_resume_text(text: str) -> str:
+    """
+    نص أصغر بنفس المعلومات: بيشيل الـ Headers/Footers اللي بتتكرر في الصفحات وأرقام الصفحات
+    والسطور الفاضية المتكررة، وبيوحّد المسافات
+    """
+    pages = [
+        [_SPACES_RE.sub(' ', line).strip() for line in page.splitlines()]
+        for page in text.split(PAGE_BREAK)
+    ]
+
+    # سطر قصير موجود في أكتر من نص الصفحات = Header/Footer
+    repeated = set()
+    if len(pages) > 1:
+        counts = Counter(line for page in pages for line in set(page) if line and len(line) <= 80)
+        repeated = {line for line, count in counts.items() if count >= max(2, len(pages) // 2 + 1)}
+
+    lines: List[str] = []
+    for page in pages:
+        for line in page:
+            if line in repeated or _PAGE_NUMBER_RE.match(line):
+                continue
+            if not line and (not lines or not lines[-1]):
+                continue
+            lines.append(line)
+    return '\n'.join(lines).strip()
+
+
+# =============================================
+# 2. Sections / Chunks
+# =============================================
+
+def is_section_heading(line: str) -> bool:
+    return len(line) <= 40 and bool(_SECTION_RE.match(line))
+
+
+def split_sections(text: str) -> List[str]:
+    """
+    أقسام الـ CV بالترتيب (أول قسم = الـ Header: الاسم وبيانات الاتصال)
+    """
+    sections: List[List[str]] = [[]]
+    for line in text.splitlines():
+        if is_section_heading(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+    return ['\n'.join(section).strip() for section in sections if any(section)]
+
+
+def build_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    أقسام متتالية متجمعة في Chunks كل واحد <= max_chars
+    (القسم بيتنقل كله للـ Chunk الجاي لو مش هيكفي، إلا لو أطول من الحد فبيكمّل سطر بسطر)
+    """
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks, current = [], ''
+    for section in split_sections(text):
+        if not current or len(current) + len(section) + 2 <= max_chars:
+            if len(section) <= max_chars:
+                current = f'{current}\n\n{section}' if current else section
+                continue
+        elif len(section) <= max_chars:
+            chunks.append(current)
+            current = section
+            continue
+
+        separator = '\n\n'
+        for line in section.splitlines():
+            line = line[:max_chars]
+            if current and len(current) + len(separator) + len(line) > max_chars:
+                chunks.append(current)
+                current = ''
+            current = f'{current}{separator}{line}' if current else line
+            separator = '\n'
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# =============================================
+# 3. Partial schema
+# =============================================
+
+@lru_cache(maxsize=None)
+def partial_schema(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    نفس الـ Schema لكن كل الحقول اختيارية ومن غير min_items
+    (Chunk فيه الخبرات بس ما يتجبرش يخترع تعليم أو مهارات)
+    """
+    fields = {
+        name: (Optional[field.annotation], Field(None, description=field.description))
+        for name, field in schema.model_fields.items()
+    }
+    return create_model(f'Partial{schema.__name__}', __doc__=schema.__doc__, **fields)
+
+
+# =============================================
+# 4. Merge
+# =============================================
+
+def _is_empty(value) -> bool:
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _identity(item: Dict[str, Any], model: Optional[Type[BaseModel]]) -> Optional[tuple]:
+    # الحقول النصية الإجبارية (role + company، degree + institution، category_name، ...)
+    if model is None:
+        return None
+    keys = [
+        name for name, field in model.model_fields.items()
+        if field.is_required() and field.annotation is str
+    ]
+    if not keys:
+        return None
+    return tuple(str(item.get(key) or '').strip().lower() for key in keys)
+
+
+def _list_item_model(annotation) -> Optional[Type[BaseModel]]:
+    for arg in get_args(annotation):
+        if isinstance(arg, type) and issubclass(arg, BaseModel):
+            return arg
+        model = _list_item_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def _merge_values(current, incoming, annotation=None):
+    if _is_empty(current):
+        return incoming
+    if _is_empty(incoming):
+        return current
+    if isinstance(current, dict) and isinstance(incoming, dict):
+        return _merge_dicts(current, incoming)
+    if isinstance(current, list) and isinstance(incoming, list):
+        return _merge_lists(current, incoming, _list_item_model(annotation))
+    return current  # أول قيمة غير فاضية (بترتيب الـ Chunks)
+
+
+def _merge_dicts(current: Dict[str, Any], incoming: Dict[str, Any], model: Optional[Type[BaseModel]] = None):
+    merged = dict(current)
+    for key, value in incoming.items():
+        annotation = model.model_fields[key].annotation if model and key in model.model_fields else None
+        merged[key] = _merge_values(merged.get(key), value, annotation)
+    return merged
+
+
+def _merge_lists(current: List[Any], incoming: List[Any], model: Optional[Type[BaseModel]]) -> List[Any]:
+    merged = list(current)
+    for item in incoming:
+        if item in merged:
+            continue
+        identity = _identity(item, model) if isinstance(item, dict) else None
+        for index, existing in enumerate(merged):
+            if identity and isinstance(existing, dict) and _identity(existing, model) == identity:
+                # نفس الخبرة/الفئة اتقسمت على Chunkين
+                merged[index] = _merge_dicts(existing, item, model)
+                break
+        else:
+            merged.append(item)
+    return merged
+
+
+def merge_partial_data(partials: List[BaseModel], schema: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    دمج نتايج الـ Chunks (dict ممكن يكون ناقص حقول إجبارية)
+    """
+    merged: Dict[str, Any] = {}
+    for partial in partials:
+        merged = _merge_dicts(merged, partial.model_dump(exclude_none=True), schema)
+    return merged
+
+
+# =============================================
+# 5. Reduce
+# =============================================
+
+def missing_fields(data: Dict[str, Any], schema: Type[BaseModel]) -> List[str]:
+    """
+    حقول الـ Schema (أول مستوى) اللي بتفشل الـ Validation: ناقصة، فاضية تحت min_items، أو عناصرها ناقصة
+    """
+    try:
+        schema.model_validate(data)
+        return []
+    except ValidationError as e:
+        failing = {error['loc'][0] for error in e.errors() if error['loc']}
+    return [name for name in schema.model_fields if name in failing]
+
+
+@lru_cache(maxsize=None)
+def fill_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Schema فيها الحقول المطلوب تكميلها بس (بنفس الـ Annotations والقيود)
+    """
+    return create_model(
+        f'{schema.__name__}Fill',
+        __doc__=schema.__doc__,
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields}
+    )
@@ -0,0 +1,74 @@
+"""
+Tectonic Runner
+تشغيل Tectonic بإعدادات موحدة: Cache مشترك للـ Bundle والـ Formats + وضع Offline
+"""
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+
+
+def get_cache_dir() -> Path:
+    """
+    مجلد الـ Cache المشترك (ملفات الـ Bundle + XeLaTeX formats)
+    """
+    cache_dir = Path(settings.TECTONIC_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def get_tectonic_env() -> dict:
+    """
+    Environment variables لـ Tectonic بحيث كل الـ Workers يستخدموا نفس الـ Cache
+    """
+    env = os.environ.copy()
+    env['TECTONIC_CACHE_DIR'] = str(get_cache_dir())
+    return env
+
+
+def build_tectonic_command(tex_file: Path, offline: Optional[bool] = None) -> List[str]:
+    """
+    بناء أمر Tectonic
+
+    Args:
+        tex_file: مسار ملف .tex
+        offline: لو True نمنع أي اتصال بالشبكة (--only-cached)
+                 الافتراضي من settings.TECTONIC_OFFLINE
+    """
+    if offline is None:
+        offline = settings.TECTONIC_OFFLINE
+
+    command = ['tectonic']
+    if settings.TECTONIC_BUNDLE:
+        command += ['--bundle', settings.TECTONIC_BUNDLE]
+    if offline:
+        command.append('--only-cached')
+    command.append(str(tex_file))
+    return command
+
+
+def run_tectonic(
+    tex_file: Path,
+    cwd: Path,
+    timeout: int = 120,
+    offline: Optional[bool] = None
+) -> subprocess.CompletedProcess:
+    """
+    تشغيل Tectonic على ملف واحد
+
+    Returns:
+        subprocess.CompletedProcess (stdout/stderr كنص)
+
+    Raises:
+        subprocess.TimeoutExpired: لو الترجمة عدت الـ timeout
+    """
+    return subprocess.run(
+        build_tectonic_command(tex_file, offline=offline),
+        cwd=cwd,
+        env=get_tectonic_env(),
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
@@ -0,0 +1,150 @@
+"""
+Compile Workspace Pool
+مجلدات عمل قابلة لإعادة الاستخدام بدل إنشاء temp dir ونسخ الخط مع كل Job
+"""
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CompileWorkspace:
+    """
+    مجلد عمل واحد: الـ Assets (زي الخط) بتتربط مرة واحدة وبتفضل موجودة بين الـ Jobs
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.assets = set()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def link_asset(self, source: Path) -> Path:
+        """
+        ربط ملف ثابت داخل الـ Workspace (hardlink ثم symlink ثم copy كحل أخير)
+        """
+        dest = self.path / source.name
+        if source.name in self.assets and dest.exists():
+            return dest
+
+        try:
+            os.link(source, dest)
+        except OSError:
+            try:
+                os.symlink(source, dest)
+            except OSError:
+                shutil.copy(source, dest)
+
+        self.assets.add(source.name)
+        return dest
+
+    def scrub(self):
+        """
+        حذف كل ملفات الـ Job (cv.tex, cv.pdf, logs...) مع الإبقاء على الـ Assets
+        """
+        for entry in self.path.iterdir():
+            if entry.name in self.assets:
+                continue
+            if entry.is_dir() and not entry.is_symlink():
+                shutil.rmtree(entry)
+            else:
+                entry.unlink()
+
+    def destroy(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class WorkspacePool:
+    """
+    Pool لكل Process: الـ Workspace بيرجع للـ Pool بعد تنظيفه بدل ما يتمسح
+    """
+
+    def __init__(self, root: Path, max_idle: int = 4):
+        self.root = Path(root)
+        self.max_idle = max_idle
+        self.pid = os.getpid()
+        self._idle: List[CompileWorkspace] = []
+        self._lock = threading.Lock()
+        self._counter = 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_workspaces()
+
+    def _remove_stale_workspaces(self):
+        """
+        مسح مجلدات Processes انتهت (أو Process قديم بنفس الـ PID)
+        """
+        for entry in self.root.iterdir():
+            pid_part = entry.name.split('-', 1)[0]
+            if not pid_part.isdigit():
+                continue
+            pid = int(pid_part)
+            if pid == self.pid or not _pid_alive(pid):
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def _create(self) -> CompileWorkspace:
+        self._counter += 1
+        return CompileWorkspace(self.root / f"{self.pid}-{self._counter}")
+
+    @contextmanager
+    def acquire(self, assets: Iterable[Optional[str]] = ()):
+        """
+        استعارة Workspace جاهز فيه الـ Assets المطلوبة
+
+        Usage:
+            with pool.acquire(assets=[font_path]) as workspace:
+                (workspace.path / 'cv.tex').write_text(...)
+        """
+        with self._lock:
+            workspace = self._idle.pop() if self._idle else self._create()
+
+        healthy = False
+        try:
+            for asset in assets:
+                if asset and Path(asset).exists():
+                    workspace.link_asset(Path(asset))
+            yield workspace
+            workspace.scrub()
+            healthy = True
+        finally:
+            with self._lock:
+                if healthy and len(self._idle) < self.max_idle:
+                    self._idle.append(workspace)
+                    workspace = None
+            if workspace is not None:
+                workspace.destroy()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # PermissionError وغيرها: الـ Process موجود بس مش بتاعنا
+        return True
+    return True
+
+
+_pool: Optional[WorkspacePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_workspace_pool() -> WorkspacePool:
+    """
+    الـ Pool الخاص بالـ Process الحالي (بيتعمل من جديد بعد fork)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = WorkspacePool(
+                root=settings.COMPILE_WORKSPACE_ROOT,
+                max_idle=settings.COMPILE_WORKSPACE_POOL_SIZE
+            )
+        return _pool
@@ -4,32 +4,191 @@ Updated with: Sentry error tracking, Better retry logic
 """
 from celery import shared_task
 from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 import subprocess
-import tempfile
+import time
 from pathlib import Path
 import logging
 import sentry_sdk
 
+from core.services.metrics_service import MetricsService, observe_job
+from core.services.pdf_cache_service import PDFCacheService
+from core.services.preamble_format_service import PreambleFormatService
+from core.services.job_status_cache_service import get_job_status_cache, job_status_changed
+from core.services.realtime_service import publish_job_event, publish_job_status
+from core.services.tectonic_service import run_tectonic
+from core.services.workspace_pool import get_workspace_pool
+from core.tasks.routing import get_stage_queue
+
 logger = logging.getLogger(__name__)
 
 
-def update_job_failed(job_id: str, error_message: str):
+def update_job_failed(job_id: str, error_message: str, job=None):
     """
     Helper للتعامل مع الأخطاء
+
+    الانتقال لـ FAILED مشروط (QUEUED / PROCESSING بس) فالـ Job الملغية ما بتتغيرش
     """
     from core.models import CompileJob
     try:
-        job = CompileJob.objects.get(id=job_id)
-        job.status = 'FAILED'
-        job.error_message = error_message[:1000]  # Limit length
-        job.completed_at = timezone.now()
-        job.save(update_fields=['status', 'error_message', 'completed_at'])
+        if job is None:
+            job = CompileJob.objects.get(id=job_id)
+        if not job.transition('FAILED', error_message=error_message[:1000]):  # Limit length
+            return
+        observe_job(job)
         logger.error(f"Job {job_id} failed: {error_message}")
     except Exception as e:
         logger.error(f"Failed to update job {job_id}: {str(e)}")
 
 
+def persist_pdf(pdf_file: Path, job_id: str):
+    """
+    حفظ الـ PDF في الـ Storage على شكل chunks مباشرة من الملف
+
+    Returns:
+        (saved_path, pdf_size)
+    """
+    pdf_size = pdf_file.stat().st_size
+    logger.info(f"PDF generated: {pdf_size} bytes")
+    
+    with pdf_file.open('rb') as pdf_handle:
+        saved_path = default_storage.save(
+            f"cvs/{job_id}/cv.pdf",
+            File(pdf_handle, name=pdf_file.name)
+        )
+    
+    return saved_path, pdf_size
+
+
+def compile_in_workspace(workspace, latex_content: str, job_id: str, template_name: str = None, preamble_format=None):
+    """
+    كتابة cv.tex داخل الـ Workspace وترجمته (Precompiled preamble لو مبني، وإلا Tectonic)
+
+    Returns:
+        (result, pdf_file, engine) — engine زي PreambleFormatService.engine() للمحرك اللي اشتغل فعلاً
+
+    Raises:
+        Exception: لو الترجمة فشلت أو الـ PDF ما اتولدش
+    """
+    tmpdir = workspace.path
+    
+    # Write LaTeX file
+    tex_file = tmpdir / "cv.tex"
+    tex_file.write_text(latex_content, encoding='utf-8')
+    logger.info(f"Written LaTeX file: {tex_file}")
+    
+    # Precompiled preamble format لو مبني (warm_tectonic_cache)، وإلا Tectonic
+    result = None
+    preamble_format = preamble_format or PreambleFormatService()
+    engine = preamble_format.engine(template_name)
+    if engine != 'tectonic':
+        logger.info(f"Running xelatex with precompiled preamble for job {job_id}")
+        result = preamble_format.compile(tex_file, cwd=tmpdir, template_name=template_name, timeout=120)
+        if result.returncode != 0:
+            logger.warning(f"Precompiled preamble compile failed for job {job_id}, falling back to Tectonic")
+            result = None
+    
+    if result is None:
+        engine = 'tectonic'
+        # Run Tectonic compiler
+        logger.info(f"Running Tectonic for job {job_id}")
+        result = run_tectonic(
+            tex_file,
+            cwd=tmpdir,
+            timeout=120  # 2 minutes for compilation
+        )
+    
+    # Log output
+    if result.stdout:
+        logger.info(f"Tectonic stdout: {result.stdout[:500]}")
+    if result.stderr:
+        logger.warning(f"Tectonic stderr: {result.stderr[:500]}")
+    
+    # Check if compilation succeeded
+    if result.returncode != 0:
+        error_msg = f"Tectonic failed with code {result.returncode}"
+        if result.stderr:
+            error_msg += f": {result.stderr[:500]}"
+        elif result.stdout:
+            error_msg += f": {result.stdout[:500]}"
+        
+        logger.error(f"Compilation failed for job {job_id}: {error_msg}")
+        raise Exception(error_msg)
+    
+    # Check if PDF was created
+    pdf_file = tmpdir / "cv.pdf"
+    if not pdf_file.exists():
+        error_msg = "PDF file was not generated"
+        logger.error(f"Job {job_id}: {error_msg}")
+        raise Exception(error_msg)
+    
+    return result, pdf_file, engine
+
+
+def render_job_latex(job):
+    """
+    توليد LaTeX من الـ cv_data المحفوظ في الـ Job (تسليم المراحل عن طريق الـ Job نفسها)
+
+    Returns:
+        (latex_content, font_path, template_name)
+    """
+    from core.models import LaTeXTemplate
+    from core.services.latex_service import LaTeXService
+    
+    template = LaTeXTemplate.objects.get(id=job.cv_template_id)
+    latex_service = LaTeXService()
+    
+    stage_started = time.perf_counter()
+    latex_content = latex_service.render_latex(template.latex_file_name, job.cv_data)
+    job.render_seconds = time.perf_counter() - stage_started
+    
+    return latex_content, latex_service.get_arabic_font_path(), template.latex_file_name
+
+
+def cancel_superseded_jobs(new_job) -> int:
+    """
+    Latest-wins: إلغاء الـ Jobs الأقدم اللي لسه في الطابور أو شغالة لنفس المشروع
+    وعمل revoke لمهام Celery بتاعتها
+
+    Returns:
+        عدد الـ Jobs اللي اتلغت
+    """
+    from core.models import CompileJob
+    from celery import current_app
+    
+    superseded = CompileJob.objects.filter(
+        project_id=new_job.project_id,
+        status__in=CompileJob.allowed_sources('CANCELLED'),
+        created_at__lt=new_job.created_at
+    )
+    superseded_ids = list(superseded.values_list('id', 'celery_task_id'))
+    task_ids = [t for _, t in superseded_ids if t]
+    
+    cancelled = CompileJob.bulk_transition(superseded, 'CANCELLED')
+    
+    if cancelled:
+        # الـ Snapshots القديمة (QUEUED / PROCESSING) تتمسح والقراية الجاية تيجي من الـ DB
+        status_cache = get_job_status_cache()
+        if status_cache:
+            status_cache.invalidate([job_id for job_id, _ in superseded_ids])
+        # bulk_transition مش بيعدي على transition()، فاللي متابعين ws/jobs/<id>/ بيوصلهم CANCELLED من هنا
+        for job in CompileJob.objects.filter(id__in=[job_id for job_id, _ in superseded_ids], status='CANCELLED'):
+            publish_job_status(job)
+    
+    if task_ids:
+        # اللي لسه في الطابور مش هيتنفذ، واللي شغال بيتأكد من الحالة قبل ما يحفظ
+        current_app.control.revoke(task_ids)
+    
+    if cancelled:
+        logger.info(f"Cancelled {cancelled} superseded job(s) for project {new_job.project_id}")
+    return cancelled
+
+
 @shared_task(
     bind=True,
     name='core.tasks.compile_latex_to_pdf',
@@ -41,14 +200,16 @@ def update_job_failed(job_id: str, error_message: str):
     retry_backoff_max=600,
     retry_jitter=True,
 )
-def compile_latex_to_pdf(self, latex_content: str, job_id: str, font_path: str = None):
+def compile_latex_to_pdf(self, latex_content: str, job_id: str, font_path: str = None, template_name: str = None):
     """
     Compile LaTeX to PDF using Tectonic
     
     Args:
-        latex_content: LaTeX source code
+        latex_content: LaTeX source code (None = render from the job's cv_data,
+            used by the pipeline's CPU stage)
         job_id: CompileJob UUID
         font_path: Optional path to custom font
+        template_name: Optional template file name (part of the PDF cache key)
         
     Returns:
         dict with status and pdf_url
@@ -59,97 +220,101 @@ def compile_latex_to_pdf(self, latex_content: str, job_id: str, font_path: str =
     from core.models import CompileJob
     
     logger.info(f"Starting compilation for job {job_id}")
+    job = None
     
     try:
         # Get job from database
-        job = CompileJob.objects.get(id=job_id)
-        job.status = 'PROCESSING'
-        job.started_at = timezone.now()
-        job.celery_task_id = self.request.id
-        job.save(update_fields=['status', 'started_at', 'celery_task_id'])
+        jobs = CompileJob.objects.all()
+        if latex_content is None:
+            jobs = jobs.select_related('payload')
+        job = jobs.get(id=job_id)
         
-        # Create temporary directory
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmpdir = Path(tmpdir)
-            logger.info(f"Created temp dir: {tmpdir}")
-            
-            # Write LaTeX file
-            tex_file = tmpdir / "cv.tex"
-            tex_file.write_text(latex_content, encoding='utf-8')
-            logger.info(f"Written LaTeX file: {tex_file}")
-            
-            # Copy font if provided
-            if font_path and Path(font_path).exists():
-                import shutil
-                font_file = Path(font_path)
-                dest_font = tmpdir / font_file.name
-                shutil.copy(font_file, dest_font)
-                logger.info(f"Copied font: {font_file.name}")
-            
-            # Run Tectonic compiler
-            logger.info(f"Running Tectonic for job {job_id}")
-            result = subprocess.run(
-                ['tectonic', str(tex_file)],
-                cwd=tmpdir,
-                capture_output=True,
-                text=True,
-                timeout=120  # 2 minutes for compilation
-            )
-            
-            # Log output
-            if result.stdout:
-                logger.info(f"Tectonic stdout: {result.stdout[:500]}")
-            if result.stderr:
-                logger.warning(f"Tectonic stderr: {result.stderr[:500]}")
+        # الـ Pipeline بيبدأ الساعة قبل خطوة الـ AI (وبيسلم الـ Job وهي PROCESSING)، فما نصفرهاش هنا
+        started_at = job.started_at or timezone.now()
+        if not job.transition(
+            'PROCESSING',
+            from_statuses=('QUEUED', 'PROCESSING'),
+            started_at=started_at,
+            queue_wait_seconds=job.queue_wait_seconds or (started_at - job.created_at).total_seconds(),
+            celery_task_id=self.request.id,
+        ):
+            logger.info(f"Job {job_id} is {job.status}, skipping compilation")
+            return {'status': job.status.lower(), 'job_id': str(job_id)}
+        
+        # CPU stage للـ Pipeline: الـ LaTeX بيتولد هنا من الـ cv_data المحفوظ في الـ Job
+        if latex_content is None:
+            latex_content, font_path, template_name = render_job_latex(job)
+        
+        # Content-addressed cache: نفس المحتوى ونفس المحرك = نفس الـ PDF بدون Tectonic
+        preamble_format = PreambleFormatService()
+        engine = preamble_format.engine(template_name)
+        pdf_cache = None
+        cache_digest = None
+        if settings.PDF_CACHE_ENABLED:
+            pdf_cache = PDFCacheService()
+            cache_digest = pdf_cache.compute_digest(latex_content, font_path, template_name, engine)
+            cached = pdf_cache.lookup(cache_digest)
             
-            # Check if compilation succeeded
-            if result.returncode != 0:
-                error_msg = f"Tectonic failed with code {result.returncode}"
-                if result.stderr:
-                    error_msg += f": {result.stderr[:500]}"
-                elif result.stdout:
-                    error_msg += f": {result.stdout[:500]}"
+            if cached:
+                if not job.transition(
+                    'SUCCESS',
+                    pdf_url=cached['url'],
+                    pdf_size_bytes=cached['size'],
+                    logs=f"PDF served from cache ({cache_digest[:12]})",
+                    render_seconds=job.render_seconds,
+                ):
+                    logger.info(f"Job {job_id} was superseded before the cache hit was recorded")
+                    return {'status': 'cancelled', 'job_id': str(job_id)}
+                observe_job(job)
                 
-                logger.error(f"Compilation failed for job {job_id}: {error_msg}")
-                raise Exception(error_msg)
-            
-            # Check if PDF was created
-            pdf_file = tmpdir / "cv.pdf"
-            if not pdf_file.exists():
-                error_msg = "PDF file was not generated"
-                logger.error(f"Job {job_id}: {error_msg}")
-                raise Exception(error_msg)
-            
-            # Read PDF content
-            pdf_content = pdf_file.read_bytes()
-            pdf_size = len(pdf_content)
-            logger.info(f"PDF generated: {pdf_size} bytes")
-            
-            # TODO: Upload to S3 or storage
-            # For now, save locally or return base64
-            # You should implement proper storage here
+                logger.info(f"Job {job_id} served from PDF cache")
+                
+                return {
+                    'status': 'success',
+                    'job_id': str(job_id),
+                    'pdf_url': cached['url'],
+                    'pdf_size': cached['size'],
+                    'cached': True
+                }
+        
+        # Reusable workspace from the pool (الخط مربوط مرة واحدة لكل Workspace)
+        with get_workspace_pool().acquire(assets=[font_path]) as workspace:
+            tmpdir = workspace.path
+            logger.info(f"Using workspace: {tmpdir}")
             
-            # Example: Save to media folder (temporary solution)
-            from django.conf import settings
-            from django.core.files.base import ContentFile
-            from django.core.files.storage import default_storage
+            stage_started = time.perf_counter()
+            result, pdf_file, used_engine = compile_in_workspace(
+                workspace, latex_content, job_id, template_name, preamble_format
+            )
+            compile_seconds = time.perf_counter() - stage_started
             
-            pdf_filename = f"cvs/{job_id}/cv.pdf"
-            saved_path = default_storage.save(pdf_filename, ContentFile(pdf_content))
+            # Stream PDF from the workspace into storage (بدون نسخة كاملة في الذاكرة)
+            stage_started = time.perf_counter()
+            saved_path, pdf_size = persist_pdf(pdf_file, job_id)
             pdf_url = default_storage.url(saved_path)
+            storage_seconds = time.perf_counter() - stage_started
             
             logger.info(f"PDF saved: {pdf_url}")
             
-            # Update job with success
-            job.status = 'SUCCESS'
-            job.pdf_url = pdf_url
-            job.pdf_size_bytes = pdf_size
-            job.logs = result.stdout[:5000] if result.stdout else ''
-            job.completed_at = timezone.now()
-            job.save(update_fields=[
-                'status', 'pdf_url', 'pdf_size_bytes', 
-                'logs', 'completed_at'
-            ])
+            if pdf_cache:
+                if used_engine != engine:
+                    # xelatex فشل ورجعنا لـ Tectonic: الـ PDF يتسجل تحت مفتاح المحرك اللي طلّعه
+                    cache_digest = pdf_cache.compute_digest(latex_content, font_path, template_name, used_engine)
+                pdf_cache.store(cache_digest, saved_path, pdf_size)
+            
+            # Update job with success (مشروط: نسخة أحدث من نفس المشروع ممكن تكون لغت الـ Job أثناء الترجمة)
+            if not job.transition(
+                'SUCCESS',
+                pdf_url=pdf_url,
+                pdf_size_bytes=pdf_size,
+                logs=result.stdout[:5000] if result.stdout else '',
+                render_seconds=job.render_seconds,
+                compile_seconds=compile_seconds,
+                storage_seconds=storage_seconds,
+            ):
+                logger.info(f"Job {job_id} was superseded during compilation")
+                return {'status': 'cancelled', 'job_id': str(job_id)}
+            observe_job(job)
             
             logger.info(f"Job {job_id} completed successfully")
             
@@ -171,7 +336,13 @@ def compile_latex_to_pdf(self, latex_content: str, job_id: str, font_path: str =
             level='warning'
         )
         
-        update_job_failed(job_id, error_msg)
+        if self.request.retries >= 2:
+            update_job_failed(job_id, error_msg, job)
+            raise
+        
+        # رجوع للطابور بدل FAILED عشان الـ Retry يقدر يكمل (PROCESSING -> QUEUED)
+        if job is not None:
+            job.transition('QUEUED', retry_count=F('retry_count') + 1, error_message=error_msg)
         
         # Retry with exponential backoff
         raise self.retry(
@@ -187,7 +358,7 @@ def compile_latex_to_pdf(self, latex_content: str, job_id: str, font_path: str =
         # Track in Sentry
         sentry_sdk.capture_exception(e)
         
-        update_job_failed(job_id, error_msg)
+        update_job_failed(job_id, error_msg, job)
         raise
     
     except Exception as e:
@@ -198,16 +369,233 @@ def compile_latex_to_pdf(self, latex_content: str, job_id: str, font_path: str =
         sentry_sdk.capture_exception(e)
         sentry_sdk.set_context("job", {
             "job_id": job_id,
-            "latex_length": len(latex_content),
+            "latex_length": len(latex_content or ''),
             "has_font": font_path is not None,
         })
         
-        update_job_failed(job_id, error_msg)
+        update_job_failed(job_id, error_msg, job)
         
         # Don't retry on non-timeout errors
         raise
 
 
+@shared_task(
+    bind=True,
+    name='core.tasks.compile_batch',
+    soft_time_limit=3600,  # 1 hour soft limit للدفعة كلها
+    time_limit=3900,
+)
+def compile_batch(self, job_ids: list = None, template_id: str = None):
+    """
+    إعادة توليد PDFs لمجموعة Jobs في Worker session واحدة
+    (بعد تصليح قالب مثلاً، أو دفعة سير ذاتية لجهة واحدة)
+
+    Workspace واحد والخط مربوط مرة واحدة، والقوالب بتتحمل مرة واحدة،
+    وتحديث الحالات في الـ DB بيتم بـ update / bulk_update بدل save لكل Job
+
+    Args:
+        job_ids: قائمة CompileJob IDs
+        template_id: أو كل الـ Jobs الناجحة اللي بتستخدم القالب ده
+
+    Returns:
+        dict فيه نتيجة كل Job والـ Throughput الكلي
+    """
+    from core.models import CompileJob, LaTeXTemplate
+    from core.services.latex_service import LaTeXService
+    
+    if not job_ids and not template_id:
+        raise ValueError("compile_batch needs job_ids or template_id")
+    
+    batch_started = time.perf_counter()
+    
+    # select_related: الـ cv_data المضغوط بيتحمل مع الـ Jobs في نفس الـ Query
+    jobs_qs = CompileJob.objects.exclude(status='CANCELLED').select_related('payload')
+    if job_ids:
+        jobs_qs = jobs_qs.filter(id__in=job_ids)
+    else:
+        jobs_qs = jobs_qs.filter(cv_template_id=str(template_id), status='SUCCESS')
+    jobs = list(jobs_qs)
+    
+    logger.info(f"Batch {self.request.id}: compiling {len(jobs)} job(s)")
+    
+    template_ids = {job.cv_template_id for job in jobs if job.cv_template_id}
+    templates = {
+        str(template.id): template
+        for template in LaTeXTemplate.objects.filter(id__in=template_ids)
+    }
+    
+    # Round trip واحد لتعليم الدفعة كلها PROCESSING (مشروط بالحالة زي أي انتقال)
+    now = timezone.now()
+    sources = CompileJob.allowed_sources('PROCESSING')
+    jobs = [job for job in jobs if job.status in sources]
+    # Job كانت SUCCESS وإعادة توليدها فشلت بترجع SUCCESS بالـ PDF القديم (الفشل في نتيجة الدفعة)
+    previously_succeeded = {job.id for job in jobs if job.status == 'SUCCESS'}
+    CompileJob.bulk_transition(
+        CompileJob.objects.filter(id__in=[job.id for job in jobs]),
+        'PROCESSING', started_at=now
+    )
+    status_cache = get_job_status_cache()
+    if status_cache:
+        status_cache.invalidate([job.id for job in jobs])
+    for job in jobs:
+        job.status, job.started_at = 'PROCESSING', now
+        publish_job_status(job)
+    
+    latex_service = LaTeXService()
+    font_path = latex_service.get_arabic_font_path()
+    preamble_format = PreambleFormatService()
+    pdf_cache = PDFCacheService() if settings.PDF_CACHE_ENABLED else None
+    
+    items = []
+    pending = []
+    update_fields = [
+        'status', 'pdf_url', 'pdf_size_bytes',
+        'started_at', 'completed_at', 'failed_at', 'duration_seconds', 'updated_at',
+        'render_seconds', 'compile_seconds', 'storage_seconds'
+    ]
+    
+    def flush():
+        # التأكد من الحالة والكتابة في Transaction واحدة والصفوف مقفولة: إلغاء (تعديل أحدث من المستخدم)
+        # بيستنى لحد الـ Commit وبعدها بيلاقي الـ Job خلصت، أو بيسبقنا والـ Job ما تتكتبش فوقه
+        with transaction.atomic():
+            processing = set(CompileJob.objects.select_for_update().filter(
+                id__in=[job.id for job in pending], status='PROCESSING'
+            ).values_list('id', flat=True))
+            written = [job for job in pending if job.id in processing]
+            CompileJob.objects.bulk_update(written, update_fields)
+            # logs / error_message في الجدول الجانبي
+            CompileJob.bulk_save_payloads(written)
+        try:
+            MetricsService().observe_jobs(written)
+        except Exception as e:
+            logger.warning(f"Metrics unavailable: {str(e)}")
+        # bulk_update مش بيعدي على transition()، فالـ Snapshot والـ Push هنا
+        for job in written:
+            job_status_changed(job)
+        pending.clear()
+    
+    with get_workspace_pool().acquire(assets=[font_path]) as workspace:
+        for job in jobs:
+            item_started = time.perf_counter()
+            job_id = str(job.id)
+            job.started_at = now
+            template = templates.get(job.cv_template_id)
+            
+            try:
+                if not job.cv_data:
+                    raise Exception("No CV data found for job")
+                if template is None:
+                    raise Exception("Template not found for job")
+                
+                stage_started = time.perf_counter()
+                latex_content = latex_service.render_latex(template.latex_file_name, job.cv_data)
+                job.render_seconds = time.perf_counter() - stage_started
+                
+                cached = None
+                engine = preamble_format.engine(template.latex_file_name)
+                if pdf_cache:
+                    cache_digest = pdf_cache.compute_digest(
+                        latex_content, font_path, template.latex_file_name, engine
+                    )
+                    cached = pdf_cache.lookup(cache_digest)
+                
+                if cached:
+                    job.pdf_url = cached['url']
+                    job.pdf_size_bytes = cached['size']
+                    job.logs = f"PDF served from cache ({cache_digest[:12]})"
+                else:
+                    stage_started = time.perf_counter()
+                    result, pdf_file, used_engine = compile_in_workspace(
+                        workspace, latex_content, job_id,
+                        template.latex_file_name, preamble_format
+                    )
+                    job.compile_seconds = time.perf_counter() - stage_started
+                    
+                    stage_started = time.perf_counter()
+                    saved_path, pdf_size = persist_pdf(pdf_file, job_id)
+                    job.storage_seconds = time.perf_counter() - stage_started
+                    if pdf_cache:
+                        if used_engine != engine:
+                            cache_digest = pdf_cache.compute_digest(
+                                latex_content, font_path, template.latex_file_name, used_engine
+                            )
+                        pdf_cache.store(cache_digest, saved_path, pdf_size)
+                    
+                    job.pdf_url = default_storage.url(saved_path)
+                    job.pdf_size_bytes = pdf_size
+                    job.logs = result.stdout[:5000] if result.stdout else ''
+                
+                job.status = 'SUCCESS'
+                job.failed_at = None
+                job.error_message = ''
+                items.append({
+                    'job_id': job_id,
+                    'status': 'success',
+                    'pdf_url': job.pdf_url,
+                    'cached': bool(cached),
+                    'seconds': round(time.perf_counter() - item_started, 3),
+                })
+            
+            except SoftTimeLimitExceeded:
+                raise
+            
+            except Exception as e:
+                logger.error(f"Batch {self.request.id}: job {job_id} failed: {e}")
+                sentry_sdk.capture_exception(e)
+                error = str(e)[:1000]
+                kept_previous = job.id in previously_succeeded
+                if kept_previous:
+                    # الـ PDF اللي عند المستخدم لسه سليم: ما نحولوش FAILED بسبب إعادة توليد
+                    job.status = 'SUCCESS'
+                    job.logs = f"Re-render failed, keeping the previous PDF: {error}"
+                else:
+                    job.status = 'FAILED'
+                    job.failed_at = timezone.now()
+                    job.error_message = error
+                items.append({
+                    'job_id': job_id,
+                    'status': 'failed',
+                    'error': error,
+                    'kept_previous_pdf': kept_previous,
+                    'seconds': round(time.perf_counter() - item_started, 3),
+                })
+            
+            finally:
+                # ملفات الـ Job دي ما تأثرش على اللي بعدها (cv.pdf قديم مثلاً)
+                workspace.scrub()
+            
+            # bulk_update ما بيستدعيش save() فبنحسب المدة هنا
+            job.completed_at = timezone.now()
+            job.updated_at = job.completed_at
+            job.duration_seconds = (job.completed_at - job.started_at).total_seconds()
+            pending.append(job)
+            
+            if len(pending) >= settings.COMPILE_BATCH_SAVE_EVERY:
+                flush()
+        
+        if pending:
+            flush()
+    
+    elapsed = time.perf_counter() - batch_started
+    succeeded = sum(1 for item in items if item['status'] == 'success')
+    throughput = len(items) / elapsed * 60 if elapsed else 0.0
+    
+    logger.info(
+        f"Batch {self.request.id} done: {succeeded}/{len(items)} succeeded "
+        f"in {elapsed:.1f}s ({throughput:.1f} CVs/min)"
+    )
+    
+    return {
+        'status': 'done',
+        'total': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'elapsed_seconds': round(elapsed, 3),
+        'cvs_per_minute': round(throughput, 2),
+        'items': items,
+    }
+
+
 @shared_task(name='core.tasks.cleanup_old_jobs')
 def cleanup_old_jobs(days: int = 30):
     """
@@ -250,7 +638,7 @@ def update_template_stats():
     for template in templates:
         # Count successful compilations using this template
         usage = CompileJob.objects.filter(
-            cv_data__template_id=str(template.id),
+            cv_template_id=str(template.id),
             status='SUCCESS'
         ).count()
         
@@ -288,35 +676,75 @@ def update_template_stats():
 #     return {'templates_updated': templates.count()}
 @shared_task(name='core.tasks.full_ai_cv_pipeline')
 def full_ai_cv_pipeline(job_id):
+    """
+    I/O stage: استخراج البيانات من OpenAI (طوابير pipeline.* على Worker بـ `-P threads`؛
+    الـ Thread بيستنى بس، والطلبات نفسها على الـ Event loop المشترك في async_openai_service)
+
+    الـ cv_data بيتحفظ في الـ Job وبعدين الـ Job بترجع QUEUED على طابور compile.* لنفس الـ Tier،
+    وcompile_latex_to_pdf (prefork بعدد الـ CPU cores) بيولد الـ LaTeX ويترجمه من الـ Job نفسها
+    """
     # استدعاء الخدمات داخل التاسك لضمان الـ Speed
     from core.models import CompileJob, LaTeXTemplate
-    from core.services.openai_service import OpenAIService
-    from core.services.latex_service import LaTeXService
+    from core.services.async_openai_service import get_openai_service
     from core.schemas import get_schema_by_name
 
-    job = CompileJob.objects.get(id=job_id)
-    job.status = 'PROCESSING'
-    job.save()
+    job = CompileJob.objects.select_related('payload').get(id=job_id)
+    started_at = timezone.now()
+    if not job.transition(
+        'PROCESSING',
+        from_statuses=('QUEUED',),
+        started_at=started_at,
+        queue_wait_seconds=(started_at - job.created_at).total_seconds(),
+    ):
+        logger.info(f"Pipeline job {job_id} is {job.status}, skipping")
+        return
 
     try:
         # أ. استخراج البيانات (AI Accuracy)
         template = LaTeXTemplate.objects.get(id=job.cv_data['template_id'])
-        ai_service = OpenAIService()
+        ai_service = get_openai_service()
         schema_class = get_schema_by_name(template.schema_class_name)
         
-        cv_data_obj = ai_service.extract_cv_data(job.cv_data['raw_prompt'], schema_class, job.cv_data['language'])
+        # الأقسام بتتبعت لصاحب الـ Job (ws/jobs/<job_id>/) أول ما تتكتب بدل ما يستنى الرد كله
+        on_partial = None
+        if settings.OPENAI_STREAMING_ENABLED:
+            def on_partial(partial):
+                publish_job_event(job.id, {
+                    'type': 'cv_data.partial',
+                    'job_id': str(job.id),
+                    'cv_data': partial,
+                })
+
+        stage_started = time.perf_counter()
+        cv_data_obj = ai_service.extract_cv_data(
+            job.cv_data['raw_prompt'], schema_class, job.cv_data['language'],
+            on_partial=on_partial
+        )
+        ai_seconds = time.perf_counter() - stage_started
         cv_data = cv_data_obj.model_dump()
         cv_data['template_id'] = str(template.id)
 
-        # ب. حقن البيانات (Latex Injection)
-        latex_service = LaTeXService()
-        latex_content = latex_service.render_latex(template.latex_file_name, cv_data)
+        # ب. تسليم الـ Job لمرحلة الـ CPU (حفظ الداتا الحقيقية بدلاً من البرومبت)
+        compile_queue = get_stage_queue(job.queue, 'compile')
+        if not job.transition(
+            'QUEUED',
+            from_statuses=('PROCESSING',),
+            queue=compile_queue,
+            ai_seconds=ai_seconds,
+            cv_data=cv_data,
+        ):
+            # job.status هنا لسه القيمة القديمة: الـ UPDATE المشروط هو اللي عرف إن الحالة اتغيرت
+            logger.info(f"Pipeline job {job_id} is no longer PROCESSING, not handing off to compile")
+            return
 
-        # ج. التحديث والتحويل النهائي
-        job.cv_data = cv_data # حفظ الداتا الحقيقية بدلاً من البرومبت
-        job.save()
+        publish_job_event(job.id, {
+            'type': 'cv_data.complete',
+            'job_id': str(job.id),
+            'cv_data': cv_data,
+        })
         
-        compile_latex_to_pdf(latex_content, str(job.id), latex_service.get_arabic_font_path())
+        # ج. الـ Compile على طابور الـ CPU (الـ LaTeX بيتولد هناك من الـ Job)
+        compile_latex_to_pdf.apply_async(args=[None, str(job.id)], queue=compile_queue)
 
     except Exception as e:
-        update_job_failed(job_id, str(e))
\ No newline at end of file
+        update_job_failed(job_id, str(e), job)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+استيراد CV من PDF في الخلفية (طوابير pipeline.*)
+استخراج النص (Process pool للملفات الكبيرة) وبعدين تحليل OpenAI
+"""
+from celery import shared_task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from contextlib import contextmanager
+import logging
+import os
+import shutil
+import tempfile
+
+from core.services.pdf_import_service import update_import
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def local_copy(file_name):
+    """
+    مسار محلي للملف المرفوع (الـ Storage لو مش Filesystem بيتنزل في ملف مؤقت)
+    """
+    try:
+        path = default_storage.path(file_name)
+    except NotImplementedError:
+        path = None
+
+    if path is not None:
+        yield path
+        return
+
+    with default_storage.open(file_name, 'rb') as source, \
+            tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as target:
+        shutil.copyfileobj(source, target)
+    try:
+        yield target.name
+    finally:
+        os.unlink(target.name)
+
+
+def finish_import(import_id, cv_data, user_id=None):
+    """
+    تسجيل نتيجة الاستيراد (من التحليل أو من الكاش)
+
+    المستخدم المسجل بيتعمله Project + CompileJob (SUCCESS) زي الاستيراد القديم،
+    والضيف بياخد الـ cv_data من /api/import-status/<import_id>/
+    """
+    from django.contrib.auth import get_user_model
+    from core.models import CompileJob, LaTeXTemplate, Project
+
+    cv_data = dict(cv_data)
+    default_template = LaTeXTemplate.objects.filter(is_active=True).first()
+    cv_data['template_id'] = str(default_template.id) if default_template else None
+
+    job_id = None
+    if user_id:
+        user = get_user_model().objects.get(pk=user_id)
+        project = Project.objects.create(
+            name=f"Imported CV - {cv_data.get('full_name', 'User')}",
+            owner=user
+        )
+        job = CompileJob.objects.create(
+            project=project,
+            triggered_by=user,
+            status='SUCCESS',
+            cv_data=cv_data
+        )
+        job_id = str(job.id)
+
+    logger.info(f"PDF import {import_id} done (job={job_id})")
+    return update_import(import_id, status='SUCCESS', job_id=job_id, cv_data=cv_data)
+
+
+@shared_task(name='core.tasks.import_cv_from_pdf')
+def import_cv_from_pdf(import_id, file_name, user_id=None, file_digest=None):
+    """
+    PDF مرفوع -> نص -> ClassicArabicCVSchema
+
+    النص والـ cv_data بيتحفظوا في PDFImportCacheService بمفتاح بصمة الملف
+    (رفع نفس الملف تاني ما يعيدش الاستخراج ولا طلب OpenAI)
+    """
+    from core.schemas.classic import ClassicArabicCVSchema
+    from core.services.async_openai_service import get_openai_service
+    from core.services.pdf_import_cache_service import get_pdf_import_cache
+    from core.services.pdf_text_service import extract_pdf_text
+
+    update_import(import_id, status='PROCESSING')
+    import_cache = get_pdf_import_cache() if file_digest else None
+    try:
+        cached = import_cache.get(file_digest) if import_cache else {'text': None, 'cv_data': None}
+        if cached['cv_data'] is not None:
+            finish_import(import_id, cached['cv_data'], user_id)
+            return
+
+        # 1. استخراج النص (لو مش في الكاش)
+        raw_text = cached['text']
+        if raw_text is None:
+            with local_copy(file_name) as path:
+                raw_text = extract_pdf_text(path)
+            if import_cache:
+                import_cache.store_text(file_digest, raw_text)
+
+        if len(raw_text.strip()) < 50:
+            update_import(import_id, status='FAILED', error='لم نتمكن من قراءة النص، الملف قد يكون صورة.')
+            return
+
+        # 2. تحليل النص بالذكاء الاصطناعي
+        structured_data = get_openai_service().parse_resume_text(raw_text, ClassicArabicCVSchema)
+        cv_data = structured_data.model_dump()
+        if import_cache:
+            import_cache.store_cv_data(file_digest, cv_data)
+
+        # 3. التخزين حسب حالة المستخدم
+        finish_import(import_id, cv_data, user_id)
+
+    except Exception as e:
+        logger.error(f"PDF import {import_id} failed: {str(e)}")
+        update_import(import_id, status='FAILED', error=f'فشل تحليل الملف: {str(e)}')
+
+    finally:
+        try:
+            default_storage.delete(file_name)
+        except Exception as e:
+            logger.warning(f"Could not delete uploaded PDF {file_name}: {str(e)}")
@@ -0,0 +1,43 @@
+"""
+Tiered Task Routing
+توجيه مهام الـ Compile والـ Pipeline لطوابير منفصلة حسب نوع المستخدم
+(premium / free / guest) عشان زحمة الضيوف ما تأثرش على المشتركين
+"""
+from django.conf import settings
+
+TIER_PREMIUM = 'premium'
+TIER_FREE = 'free'
+TIER_GUEST = 'guest'
+
+
+def get_user_tier(user) -> str:
+    """
+    تحديد الـ Tier من المستخدم (None أو AnonymousUser = guest)
+    """
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return TIER_GUEST
+    if getattr(user, 'is_premium', False):
+        return TIER_PREMIUM
+    return TIER_FREE
+
+
+def get_queue(task_kind: str, user=None) -> str:
+    """
+    اسم الطابور لنوع المهمة ('compile' أو 'pipeline') حسب الـ Tier
+
+    القواعد في settings.CELERY_TIER_QUEUES
+    """
+    tier_queues = settings.CELERY_TIER_QUEUES.get(get_user_tier(user)) \
+        or settings.CELERY_TIER_QUEUES[TIER_FREE]
+    return tier_queues[task_kind]
+
+
+def get_stage_queue(current_queue: str, task_kind: str) -> str:
+    """
+    طابور المرحلة التالية لنفس الـ Tier
+    (مثلاً pipeline.premium -> compile.premium لما الـ AI يخلص ويسلم للـ Compile)
+    """
+    for tier_queues in settings.CELERY_TIER_QUEUES.values():
+        if current_queue in tier_queues.values():
+            return tier_queues[task_kind]
+    return settings.CELERY_TIER_QUEUES[TIER_FREE][task_kind]
@@ -1,3 +1,1289 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import re_path
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import User, Project, CompileJob, CompileJobPayload, LaTeXTemplate
+from .schemas import ClassicArabicCVSchema
+from .consumers import JobStatusConsumer
+from .services.async_openai_service import RedisTokenBucket, run_in_loop
+from .services import job_status_listener
+from .services.job_status_cache_service import JobStatusCacheService
+from .services.llm_cache_service import LLMCacheService
+from .services.metrics_service import MetricsService
+from .services.openai_service import (
+    OpenAIService, StructuredOutputStream, build_system_prompt, get_response_format, parse_structured_completion
+)
+from .services.pdf_cache_service import PDFCacheService
+from .services.pdf_import_cache_service import PDFImportCacheService
+from .services.preamble_format_service import PreambleFormatService
+from .services.realtime_service import publish_job_event
+from .services.tectonic_service import build_tectonic_command, run_tectonic
+from .services.workspace_pool import WorkspacePool
+from .services.resume_chunking import (
+    build_chunks, compact_resume_text, fill_schema, merge_partial_data, missing_fields, partial_schema
+)
+from .tasks.routing import get_queue, get_stage_queue, get_user_tier
+from .tasks.compile_tasks import (
+    cancel_superseded_jobs, compile_batch, compile_in_workspace, full_ai_cv_pipeline, persist_pdf
+)
+
+try:
+    import fakeredis
+except ImportError:  # Optional: اختبارات الـ Redis بتتخطى من غيره
+    fakeredis = None
+
+
+# الـ Snapshots والـ Push بيتختبروا لوحدهم، هنا الـ DB بس
+TEST_SETTINGS = dict(
+    JOB_STATUS_CACHE_ENABLED=False,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+
+
+@override_settings(**TEST_SETTINGS)
+class CompileJobTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='x')
+        self.project = Project.objects.create(name='CV', owner=self.user)
+
+    def create_job(self, status='QUEUED', **fields):
+        return CompileJob.objects.create(project=self.project, triggered_by=self.user, status=status, **fields)
+
+
+class TransitionTests(CompileJobTestCase):
+
+    def test_allowed_transition_updates_row_and_timestamps(self):
+        job = self.create_job()
+        self.assertTrue(job.transition('PROCESSING'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'PROCESSING')
+        self.assertIsNotNone(job.started_at)
+
+        self.assertTrue(job.transition('SUCCESS', pdf_url='https://cdn.example.com/cv.pdf'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertIsNotNone(job.completed_at)
+        self.assertEqual(job.pdf_url, 'https://cdn.example.com/cv.pdf')
+
+    def test_rejected_transition_leaves_row_untouched(self):
+        job = self.create_job(status='CANCELLED')
+        self.assertFalse(job.transition('PROCESSING'))
+        self.assertFalse(job.transition('SUCCESS'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'CANCELLED')
+        self.assertIsNone(job.started_at)
+
+    def test_stale_instance_cannot_overwrite_newer_status(self):
+        job = self.create_job()
+        stale = CompileJob.objects.get(id=job.id)
+        self.assertTrue(job.transition('CANCELLED'))
+        # النسخة القديمة لسه شايفة QUEUED، لكن الـ UPDATE مشروط بالحالة اللي في الـ DB
+        self.assertFalse(stale.transition('PROCESSING', from_statuses=('QUEUED',)))
+        self.assertEqual(CompileJob.objects.get(id=job.id).status, 'CANCELLED')
+
+    def test_allowed_sources(self):
+        self.assertEqual(set(CompileJob.allowed_sources('CANCELLED')), {'QUEUED', 'PROCESSING'})
+        self.assertEqual(set(CompileJob.allowed_sources('PROCESSING')), {'QUEUED', 'SUCCESS', 'FAILED'})
+        self.assertEqual(CompileJob.allowed_sources('QUEUED'), ('PROCESSING',))
+
+    def test_bulk_transition_skips_disallowed_sources(self):
+        jobs = [self.create_job(status=s) for s in ('QUEUED', 'PROCESSING', 'SUCCESS', 'CANCELLED')]
+        moved = CompileJob.bulk_transition(CompileJob.objects.filter(id__in=[j.id for j in jobs]), 'CANCELLED')
+        self.assertEqual(moved, 2)
+        statuses = dict(CompileJob.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[j.id] for j in jobs], ['CANCELLED', 'CANCELLED', 'SUCCESS', 'CANCELLED'])
+
+    def test_failed_payload_write_rolls_back_transition(self):
+        job = self.create_job()
+        with mock.patch.object(CompileJob, '_save_payload', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                job.transition('FAILED', error_message='LaTeX error')
+        loaded = CompileJob.objects.get(id=job.id)
+        self.assertEqual(loaded.status, 'QUEUED')
+        self.assertIsNone(loaded.failed_at)
+
+    def test_transition_notifies_after_commit(self):
+        job = self.create_job()
+        with mock.patch('core.services.job_status_cache_service.job_status_changed') as changed:
+            with self.captureOnCommitCallbacks(execute=True):
+                job.transition('PROCESSING', cv_data={'template_id': 't1'})
+        changed.assert_called_once_with(job, {'template_id': 't1'})
+
+
+class SupersedeTests(CompileJobTestCase):
+
+    @mock.patch('celery.current_app')
+    def test_older_pending_jobs_are_cancelled_and_revoked(self, celery_app):
+        queued = self.create_job(celery_task_id='task-queued')
+        processing = self.create_job(status='PROCESSING', celery_task_id='task-processing')
+        done = self.create_job(status='SUCCESS')
+        other_project = Project.objects.create(name='Other', owner=self.user)
+        unrelated = CompileJob.objects.create(project=other_project, triggered_by=self.user, status='QUEUED')
+        new_job = self.create_job()
+
+        self.assertEqual(cancel_superseded_jobs(new_job), 2)
+
+        statuses = dict(CompileJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[queued.id], 'CANCELLED')
+        self.assertEqual(statuses[processing.id], 'CANCELLED')
+        self.assertEqual(statuses[done.id], 'SUCCESS')
+        self.assertEqual(statuses[unrelated.id], 'QUEUED')
+        self.assertEqual(statuses[new_job.id], 'QUEUED')
+
+        revoked = set(celery_app.control.revoke.call_args.args[0])
+        self.assertEqual(revoked, {'task-queued', 'task-processing'})
+
+    @mock.patch('celery.current_app')
+    def test_nothing_to_supersede(self, celery_app):
+        self.assertEqual(cancel_superseded_jobs(self.create_job()), 0)
+        celery_app.control.revoke.assert_not_called()
+
+
+@override_settings(PDF_CACHE_ENABLED=False, COMPILE_BATCH_SAVE_EVERY=10)
+class CompileBatchTests(CompileJobTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = LaTeXTemplate.objects.create(
+            name='Classic', slug='classic', category='classic',
+            latex_file_name='classic_arabic_v1.tex', schema_class_name='ClassicArabicCVSchema'
+        )
+        self.cv_data = {'template_id': str(self.template.id), 'full_name': 'سارة أحمد'}
+
+        pool = mock.patch('core.tasks.compile_tasks.get_workspace_pool').start()
+        pool.return_value.acquire.return_value.__enter__.return_value = mock.MagicMock()
+        self.render = mock.patch('core.services.latex_service.LaTeXService.render_latex', return_value='tex').start()
+        mock.patch('core.services.latex_service.LaTeXService.get_arabic_font_path', return_value=None).start()
+        mock.patch(
+            'core.tasks.compile_tasks.compile_in_workspace',
+            return_value=(SimpleNamespace(stdout='ok'), Path('cv.pdf'), 'tectonic')
+        ).start()
+        mock.patch('core.tasks.compile_tasks.persist_pdf', return_value=('pdfs/new.pdf', 10)).start()
+        mock.patch('core.tasks.compile_tasks.default_storage.url', return_value='https://cdn.example.com/new.pdf').start()
+        mock.patch('core.tasks.compile_tasks.job_status_changed').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def run_batch(self, *jobs):
+        return compile_batch.apply(kwargs={'job_ids': [str(job.id) for job in jobs]}).get()
+
+    def test_success_clears_failed_at(self):
+        job = self.create_job(status='FAILED', cv_data=self.cv_data, failed_at=timezone.now())
+        result = self.run_batch(job)
+        self.assertEqual(result['succeeded'], 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertIsNone(job.failed_at)
+        self.assertEqual(job.pdf_url, 'https://cdn.example.com/new.pdf')
+
+    def test_failed_rerender_keeps_previous_pdf(self):
+        job = self.create_job(status='SUCCESS', cv_data=self.cv_data, pdf_url='https://cdn.example.com/old.pdf')
+        self.render.side_effect = Exception('Undefined control sequence')
+        result = self.run_batch(job)
+        self.assertEqual(result['failed'], 1)
+        self.assertTrue(result['items'][0]['kept_previous_pdf'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.pdf_url, 'https://cdn.example.com/old.pdf')
+        self.assertIsNone(job.failed_at)
+
+    def test_failure_of_new_job_marks_it_failed(self):
+        job = self.create_job(cv_data=self.cv_data)
+        self.render.side_effect = Exception('Undefined control sequence')
+        self.run_batch(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIsNotNone(job.failed_at)
+        self.assertEqual(job.error_message, 'Undefined control sequence')
+
+    def test_job_cancelled_mid_batch_is_not_overwritten(self):
+        job = self.create_job(cv_data=self.cv_data)
+        other = self.create_job(cv_data=self.cv_data)
+
+        def cancel_then_render(template_name, cv_data):
+            # تعديل أحدث من المستخدم بيلغي الـ Job وهي بتتولد
+            CompileJob.objects.filter(id=job.id).update(status='CANCELLED')
+            return 'tex'
+
+        self.render.side_effect = cancel_then_render
+        self.run_batch(job, other)
+        statuses = dict(CompileJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[job.id], 'CANCELLED')
+        self.assertEqual(statuses[other.id], 'SUCCESS')
+        self.assertIsNone(CompileJob.objects.get(id=job.id).pdf_url)
+
+
+class PayloadTests(CompileJobTestCase):
+
+    CV_DATA = {'template_id': 'tpl-1', 'full_name': 'سارة أحمد', 'skills': ['Python', 'LaTeX']}
+
+    def test_round_trip(self):
+        job = self.create_job(cv_data=self.CV_DATA, logs='x' * 5000)
+        self.assertEqual(job.cv_template_id, 'tpl-1')
+
+        loaded = CompileJob.objects.get(id=job.id)
+        self.assertEqual(loaded.cv_data, self.CV_DATA)
+        self.assertEqual(loaded.logs, 'x' * 5000)
+        self.assertEqual(loaded.error_message, '')
+        # مضغوط مش نص صريح
+        self.assertLess(len(bytes(loaded.payload.logs_blob)), 5000)
+
+    def test_empty_payload_row_is_not_created(self):
+        job = self.create_job()
+        self.assertFalse(CompileJobPayload.objects.filter(job=job).exists())
+        self.assertIsNone(CompileJob.objects.get(id=job.id).cv_data)
+
+    def test_payload_loads_lazily_once(self):
+        job = self.create_job(cv_data=self.CV_DATA, error_message='boom')
+        with self.assertNumQueries(1):
+            loaded = CompileJob.objects.get(id=job.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(loaded.cv_data, self.CV_DATA)
+            self.assertEqual(loaded.error_message, 'boom')
+
+    def test_transition_writes_payload(self):
+        job = self.create_job()
+        self.assertTrue(job.transition('FAILED', error_message='LaTeX error', logs='! Undefined control sequence'))
+        loaded = CompileJob.objects.get(id=job.id)
+        self.assertEqual(loaded.error_message, 'LaTeX error')
+        self.assertEqual(loaded.logs, '! Undefined control sequence')
+
+    def test_refresh_from_db_drops_pending_and_cached_values(self):
+        job = self.create_job(logs='first')
+        loaded = CompileJob.objects.get(id=job.id)
+        self.assertEqual(loaded.logs, 'first')
+
+        CompileJob.objects.get(id=job.id).transition('PROCESSING', logs='second')
+        loaded.error_message = 'never saved'
+        loaded.refresh_from_db()
+        self.assertEqual(loaded.logs, 'second')
+        self.assertEqual(loaded.error_message, '')
+
+        loaded.logs = 'pending'
+        loaded.refresh_from_db(fields=['logs'])
+        self.assertEqual(loaded.logs, 'second')
+
+
+@override_settings(LLM_CACHE_VERSION='1')
+class LLMCacheKeyTests(TestCase):
+
+    MESSAGES = [
+        {'role': 'system', 'content': 'Extract the CV'},
+        {'role': 'user', 'content': 'Software engineer,  5 years of Python'},
+    ]
+
+    def key(self, messages=None, **kwargs):
+        options = dict(model='gpt-4o-mini', schema=ClassicArabicCVSchema)
+        options.update(kwargs)
+        return LLMCacheService.compute_key(messages=messages or self.MESSAGES, **options)
+
+    def test_equivalent_text_shares_key(self):
+        spaced = [self.MESSAGES[0], {'role': 'user', 'content': ' Software   engineer, 5 years of Python\n'}]
+        self.assertEqual(self.key().digest, self.key(spaced).digest)
+        self.assertEqual(self.key([{'role': 'user', 'content': 'مهندس برمجيات'}]).digest,
+                         self.key([{'role': 'user', 'content': 'مهـندس برمجـيات'}]).digest)
+
+    def test_scope_changes_with_model_prompt_and_language(self):
+        base = self.key()
+        other_prompt = [{'role': 'system', 'content': 'Extract the CV v2'}, self.MESSAGES[1]]
+        for other in (self.key(model='gpt-4o'), self.key(other_prompt), self.key(language='ar')):
+            self.assertNotEqual(base.scope, other.scope)
+            self.assertNotEqual(base.digest, other.digest)
+
+    def test_cache_version_invalidates_keys(self):
+        with override_settings(LLM_CACHE_VERSION='2'):
+            bumped = self.key().digest
+        self.assertNotEqual(bumped, self.key().digest)
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+@override_settings(**TEST_SETTINGS)
+class LLMCacheMatchTests(TestCase):
+    """
+    مطابقة تامة بس: Prompt قريب (تعديل بسيط من نفس المستخدم أو CV شخص تاني) ما يرجعش نتيجة قديمة
+    """
+
+    MESSAGES = [
+        {'role': 'system', 'content': 'Generate the CV'},
+        {'role': 'user', 'content': 'Senior backend engineer with eight years of Django, Celery and PostgreSQL in Cairo'},
+    ]
+    NEAR_MESSAGES = [
+        MESSAGES[0],
+        {'role': 'user', 'content': 'Senior backend engineer with eight years of Django, Celery and PostgreSQL in Giza'},
+    ]
+    CV_DATA = {
+        'full_name': 'سارة أحمد',
+        'contact': {'email': 'sara@example.com'},
+        'professional_summary': 'مهندسة Backend',
+        'education': [{'degree': 'بكالوريوس حاسبات', 'institution': 'جامعة القاهرة'}],
+        'skills': [{'category_name': 'لغات البرمجة', 'skills': ['Python']}],
+    }
+
+    def setUp(self):
+        patcher = mock.patch('core.services.llm_cache_service.get_redis_connection', return_value=fakeredis.FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = LLMCacheService()
+        self.result = ClassicArabicCVSchema.model_validate(self.CV_DATA)
+
+    def lookup(self, messages):
+        return self.cache.lookup('gpt-4o-mini', messages, ClassicArabicCVSchema)
+
+    def test_exact_prompt_hits(self):
+        _, key = self.lookup(self.MESSAGES)
+        self.cache.store(key, self.result)
+        self.assertEqual(self.lookup(self.MESSAGES)[0], self.result)
+
+    def test_edited_prompt_misses(self):
+        _, key = self.lookup(self.MESSAGES)
+        self.cache.store(key, self.result)
+        self.assertIsNone(self.lookup(self.NEAR_MESSAGES)[0])
+        self.assertEqual(self.cache.stats()['hits'], 0)
+
+    @override_settings(LLM_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LLMCacheService()
+        # ساعة بتزيد ثانية مع كل قراية عشان ترتيب الاستخدام يبقى واضح
+        clock = itertools.count(time.time())
+        with mock.patch('core.services.llm_cache_service.time.time', side_effect=lambda: next(clock)):
+            cache.set('first', self.result)
+            cache.set('second', self.result)
+            cache.get('first', ClassicArabicCVSchema)  # first بقت أحدث استخدام من second
+            cache.set('third', self.result)
+
+        self.assertIsNone(cache.redis.get(cache._entry_key('second')))
+        self.assertIsNotNone(cache.get('first', ClassicArabicCVSchema))
+        self.assertIsNotNone(cache.get('third', ClassicArabicCVSchema))
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def test_expired_entries_leave_the_index(self):
+        self.cache.set('old', self.result)
+        with mock.patch('core.services.llm_cache_service.time.time', return_value=time.time() + self.cache.ttl + 1):
+            self.cache.evict()
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+@override_settings(**TEST_SETTINGS)
+class JobStatusConsumerTests(TransactionTestCase):
+    """
+    ws/jobs/<job_id>/: الحالة وبيانات الـ CV اللي بتتولد بتوصل لصاحب الـ Job بس
+    """
+
+    application = URLRouter([re_path(r'^ws/jobs/(?P<job_id>[0-9a-f-]+)/$', JobStatusConsumer.as_asgi())])
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='x')
+        self.other = User.objects.create_user(username='other', password='x')
+        project = Project.objects.create(name='CV', owner=self.owner)
+        self.job = CompileJob.objects.create(project=project, triggered_by=self.owner, status='PROCESSING')
+        self.tokens = {user: Token.objects.create(user=user).key for user in (self.owner, self.other)}
+
+    def connect(self, user=None):
+        path = f'/ws/jobs/{self.job.id}/'
+        if user is not None:
+            path += f'?token={self.tokens[user]}'
+        return WebsocketCommunicator(self.application, path)
+
+    def test_owner_receives_status_and_cv_data(self):
+        async def scenario():
+            communicator = self.connect(self.owner)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertEqual((await communicator.receive_json_from())['status'], 'PROCESSING')
+
+            await sync_to_async(publish_job_event)(self.job.id, {
+                'type': 'cv_data.partial',
+                'job_id': str(self.job.id),
+                'cv_data': {'full_name': 'سارة'},
+            })
+            event = await communicator.receive_json_from()
+            self.assertEqual(event['type'], 'cv_data.partial')
+            self.assertEqual(event['cv_data'], {'full_name': 'سارة'})
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_anonymous_and_other_users_are_rejected(self):
+        async def scenario():
+            for user, code in ((None, 4401), (self.other, 4404)):
+                communicator = self.connect(user)
+                connected, close_code = await communicator.connect()
+                self.assertFalse(connected)
+                self.assertEqual(close_code, code)
+
+        async_to_sync(scenario)()
+
+    def test_client_messages_are_not_broadcast(self):
+        async def scenario():
+            first, second = self.connect(self.owner), self.connect(self.owner)
+            for communicator in (first, second):
+                await communicator.connect()
+                await communicator.receive_json_from()
+            await first.send_to(text_data='{"type": "cv_data.complete", "cv_data": {"full_name": "fake"}}')
+            self.assertTrue(await second.receive_nothing())
+            await first.disconnect()
+            await second.disconnect()
+
+        async_to_sync(scenario)()
+
+
+@override_settings(OPENAI_STREAM_PUSH_INTERVAL=0)
+class StructuredOutputStreamTests(TestCase):
+
+    @staticmethod
+    def chunk(content=None, refusal=None, usage=None):
+        delta = SimpleNamespace(content=content, refusal=refusal)
+        return SimpleNamespace(usage=usage, choices=[SimpleNamespace(delta=delta)])
+
+    def test_partials_then_result(self):
+        stream = StructuredOutputStream(ClassicArabicCVSchema)
+        partials = [stream.feed(self.chunk(part)) for part in (
+            '{"full_name": "سا', 'رة أحمد", "contact": {}, ',
+            '"professional_summary": "x", "education": [{"degree": "BSc", "institution": "CU"}], ',
+            '"skills": [{"category_name": "Lang", "skills": ["Python"]}]}',
+        )]
+        self.assertEqual(partials[0], {'full_name': 'سا'})
+        self.assertEqual(partials[1]['full_name'], 'سارة أحمد')
+        self.assertIsNone(stream.feed(self.chunk(None)))
+        self.assertEqual(stream.result().skills[0].skills, ['Python'])
+        self.assertIsNotNone(stream.first_token_seconds)
+
+    def test_refusal_raises(self):
+        stream = StructuredOutputStream(ClassicArabicCVSchema)
+        stream.feed(self.chunk(refusal="I can't help with that"))
+        with self.assertRaises(ValueError):
+            stream.result()
+
+
+class PreambleFormatTests(TestCase):
+    """
+    الـ Format بيتبني في warm_tectonic_cache بس، والـ Worker بيستخدمه لو موجود
+    """
+
+    TEMPLATE = 'classic_arabic_v1.tex'
+
+    def setUp(self):
+        format_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(format_dir.cleanup)
+        overrides = override_settings(LATEX_FORMAT_DIR=format_dir.name, LATEX_PREAMBLE_FORMAT_ENABLED=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        which = mock.patch('core.services.preamble_format_service.shutil.which', return_value='/usr/bin/xelatex')
+        which.start()
+        self.addCleanup(which.stop)
+        self.service = PreambleFormatService()
+
+    @mock.patch('core.services.preamble_format_service.subprocess.run')
+    def test_worker_path_never_builds(self, run):
+        self.assertIsNone(self.service.get_format(self.TEMPLATE))
+        self.assertEqual(self.service.engine(self.TEMPLATE), 'tectonic')
+        run.assert_not_called()
+
+    @mock.patch('core.services.preamble_format_service.subprocess.run')
+    def test_failed_build_is_remembered(self, run):
+        run.return_value = subprocess.CompletedProcess([], 1, stdout='! LaTeX Error', stderr='')
+        self.assertIsNone(self.service.build_format(self.TEMPLATE))
+        self.assertTrue(self.service.failure_marker(self.TEMPLATE).exists())
+
+        self.assertIsNone(self.service.build_format(self.TEMPLATE))
+        self.assertEqual(run.call_count, 1)
+
+        self.service.build_format(self.TEMPLATE, force=True)
+        self.assertEqual(run.call_count, 2)
+
+    @mock.patch('core.services.preamble_format_service.subprocess.run')
+    def test_built_format_switches_engine(self, run):
+        def build(args, cwd, **kwargs):
+            name = next(arg for arg in args if arg.startswith('-jobname=')).split('=', 1)[1]
+            (Path(cwd) / f'{name}.fmt').write_bytes(b'fmt')
+            return subprocess.CompletedProcess(args, 0, stdout='', stderr='')
+
+        run.side_effect = build
+        fmt_path = self.service.build_format(self.TEMPLATE)
+        self.assertEqual(self.service.get_format(self.TEMPLATE), fmt_path)
+        self.assertTrue(self.service.engine(self.TEMPLATE).startswith('xelatex-fmt:'))
+
+        # المسار ده Opt-in: من غير الـ Setting الـ Worker يفضل على Tectonic حتى لو الـ Format موجود
+        with override_settings(LATEX_PREAMBLE_FORMAT_ENABLED=False):
+            self.assertEqual(self.service.engine(self.TEMPLATE), 'tectonic')
+
+    @mock.patch('core.tasks.compile_tasks.run_tectonic')
+    def test_failed_xelatex_compile_falls_back_to_tectonic(self, run_tectonic):
+        def tectonic(tex_file, cwd, timeout):
+            (Path(cwd) / 'cv.pdf').write_bytes(b'%PDF')
+            return subprocess.CompletedProcess([], 0, stdout='', stderr='')
+
+        run_tectonic.side_effect = tectonic
+        self.service.format_dir.mkdir(parents=True, exist_ok=True)
+        self.service.format_path(self.TEMPLATE).write_bytes(b'fmt')
+        failed = subprocess.CompletedProcess([], 1, stdout='! Emergency stop', stderr='')
+
+        with tempfile.TemporaryDirectory() as workspace_dir, \
+                mock.patch.object(self.service, 'compile', return_value=failed):
+            workspace = SimpleNamespace(path=Path(workspace_dir))
+            _, pdf_file, engine = compile_in_workspace(workspace, 'x', 'job', self.TEMPLATE, self.service)
+            self.assertTrue(pdf_file.exists())
+        self.assertEqual(engine, 'tectonic')
+
+    def test_pdf_cache_key_includes_engine(self):
+        tectonic = PDFCacheService.compute_digest('\\documentclass{article}', None, self.TEMPLATE, 'tectonic')
+        xelatex = PDFCacheService.compute_digest('\\documentclass{article}', None, self.TEMPLATE, 'xelatex-fmt:x')
+        self.assertNotEqual(tectonic, xelatex)
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+@override_settings(PDF_CACHE_MAX_BYTES=250, **TEST_SETTINGS)
+class PDFCacheTests(CompileJobTestCase):
+
+    TEMPLATE = 'classic_arabic_v1.tex'
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('core.services.pdf_cache_service.get_redis_connection', return_value=fakeredis.FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name, MEDIA_URL='/media/')
+        media.enable()
+        self.addCleanup(media.disable)
+        self.cache = PDFCacheService()
+
+    def save_pdf(self, name, size=100):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        return default_storage.save(f'pdfs/{name}.pdf', ContentFile(b'%' * size))
+
+    def test_digest_changes_with_source_template_and_font(self):
+        base = PDFCacheService.compute_digest('a', None, self.TEMPLATE)
+        self.assertEqual(base, PDFCacheService.compute_digest('a', None, self.TEMPLATE))
+        self.assertNotEqual(base, PDFCacheService.compute_digest('b', None, self.TEMPLATE))
+        self.assertNotEqual(base, PDFCacheService.compute_digest('a', None, 'other.tex'))
+
+        with tempfile.NamedTemporaryFile(suffix='.ttf') as font:
+            font.write(b'font-v1')
+            font.flush()
+            with_font = PDFCacheService.compute_digest('a', font.name, self.TEMPLATE)
+        self.assertNotEqual(base, with_font)
+
+    def test_store_then_lookup(self):
+        path = self.save_pdf('one')
+        self.assertIsNone(self.cache.lookup('d1'))
+        self.cache.store('d1', path, 100)
+
+        entry = self.cache.lookup('d1')
+        self.assertEqual(entry['path'], path)
+        self.assertEqual(entry['url'], f'/media/{path}')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['bytes']), (1, 1, 100))
+
+    def test_lookup_drops_entry_whose_file_is_gone(self):
+        from django.core.files.storage import default_storage
+        path = self.save_pdf('gone')
+        self.cache.store('d1', path, 100)
+        default_storage.delete(path)
+        self.assertIsNone(self.cache.lookup('d1'))
+        self.assertEqual(self.cache.stats()['entries'], 0)
+        self.assertEqual(self.cache.stats()['bytes'], 0)
+
+    def test_eviction_deletes_least_recently_used_unreferenced_pdf(self):
+        from django.core.files.storage import default_storage
+        paths = [self.save_pdf(name) for name in ('old', 'mid', 'new')]
+        self.cache.store('old', paths[0], 100)
+        self.cache.store('mid', paths[1], 100)
+        self.cache.lookup('old')  # old بقى أحدث استخدام من mid
+        self.cache.store('new', paths[2], 100)
+
+        self.assertIsNone(self.cache.redis.hget(self.cache.entries_key, 'mid'))
+        self.assertFalse(default_storage.exists(paths[1]))
+        self.assertTrue(default_storage.exists(paths[0]))
+        self.assertEqual(self.cache.stats()['bytes'], 200)
+
+    def test_eviction_keeps_pdf_a_job_still_serves(self):
+        from django.core.files.storage import default_storage
+        kept = self.save_pdf('kept')
+        self.create_job(status='SUCCESS', pdf_url=f'http://testserver{default_storage.url(kept)}')
+        self.cache.store('kept', kept, 100)
+        self.cache.store('b', self.save_pdf('b'), 100)
+        self.cache.store('c', self.save_pdf('c'), 100)
+
+        self.assertIsNone(self.cache.redis.hget(self.cache.entries_key, 'kept'))
+        self.assertTrue(default_storage.exists(kept))
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+@override_settings(**TEST_SETTINGS)
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch(
+            'core.services.async_openai_service.get_redis_connection', return_value=fakeredis.FakeRedis()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_buckets_in_different_processes_share_the_budget(self):
+        # كل Process بيعمل الـ Bucket بتاعه، بس الرصيد واحد في Redis
+        worker_a = RedisTokenBucket('openai_rate:test:requests', rate_per_minute=60, capacity=2)
+        worker_b = RedisTokenBucket('openai_rate:test:requests', rate_per_minute=60, capacity=2)
+        self.assertEqual(worker_a.take(1), 0)
+        self.assertEqual(worker_b.take(1), 0)
+        self.assertAlmostEqual(worker_a.take(1), 1.0, delta=0.1)
+
+    def test_bucket_refills_over_time(self):
+        bucket = RedisTokenBucket('openai_rate:test:tokens', rate_per_minute=60, capacity=1)
+        with mock.patch('core.services.async_openai_service.time.time', return_value=1000.0):
+            self.assertEqual(bucket.take(1), 0)
+            self.assertGreater(bucket.take(1), 0)
+        with mock.patch('core.services.async_openai_service.time.time', return_value=1001.0):
+            self.assertEqual(bucket.take(1), 0)
+
+    def test_acquire_lets_requests_through_without_redis(self):
+        bucket = RedisTokenBucket('openai_rate:test:requests', rate_per_minute=60)
+        with mock.patch.object(bucket, 'take', side_effect=ConnectionError('redis down')):
+            async_to_sync(bucket.acquire)(1)
+
+    def test_run_in_loop_cancels_coroutine_on_timeout(self):
+        cancelled = threading.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with self.assertRaises(TimeoutError):
+            run_in_loop(slow(), timeout=0.05)
+        self.assertTrue(cancelled.wait(5))
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'redis://127.0.0.1:6379/1'
+}})
+class JobStatusListenerTests(TestCase):
+
+    def tearDown(self):
+        job_status_listener._listener = None
+
+    def test_concurrent_requests_share_one_listener(self):
+        starts = []
+
+        async def start(listener):
+            starts.append(listener)
+            await asyncio.sleep(0.01)  # الـ PSUBSCRIBE بياخد Round trip
+            listener.reader = asyncio.get_running_loop().create_future()
+
+        async def scenario():
+            listeners = await asyncio.gather(*[job_status_listener.get_job_status_listener() for _ in range(5)])
+            starts[0].reader.cancel()
+            return listeners
+
+        with mock.patch.object(job_status_listener.JobStatusListener, 'start', start):
+            listeners = async_to_sync(scenario)()
+
+        self.assertEqual(len(starts), 1)
+        self.assertTrue(all(listener is starts[0] for listener in listeners))
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+@override_settings(**dict(TEST_SETTINGS, JOB_STATUS_CACHE_ENABLED=True, SECURE_SSL_REDIRECT=False))
+class JobStatusSnapshotTests(CompileJobTestCase):
+
+    CV_DATA = {'template_id': 'tpl-1', 'full_name': 'سارة أحمد'}
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch(
+            'core.services.job_status_cache_service.get_redis_connection', return_value=fakeredis.FakeRedis()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.job = self.create_job(status='SUCCESS', cv_data=self.CV_DATA, pdf_url='https://cdn.example.com/cv.pdf')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+
+    def test_get_cv_data_returns_304_for_current_etag(self):
+        url = f'/api/get-cv-data/{self.job.id}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['cv_data'], self.CV_DATA)
+        self.assertIn('Last-Modified', first)
+
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_check_job_status_etag_changes_with_status(self):
+        url = f'/api/check-job-status/{self.job.id}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['status'], 'SUCCESS')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.job.transition('PROCESSING')
+        self.job.refresh_from_db()
+        JobStatusCacheService().store(self.job)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['status'], 'PROCESSING')
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_snapshot_is_scoped_to_owner(self):
+        JobStatusCacheService().store(self.job, self.CV_DATA)
+        other = User.objects.create_user(username='other', password='x')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=other).key}'
+        self.assertEqual(self.client.get(f'/api/check-job-status/{self.job.id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/get-cv-data/{self.job.id}/').status_code, 404)
+
+    def test_older_snapshot_does_not_overwrite_newer(self):
+        status_cache = JobStatusCacheService()
+        stale = CompileJob.objects.get(id=self.job.id)
+        self.job.transition('PROCESSING')
+        self.job.refresh_from_db()
+        status_cache.store(self.job)
+        status_cache.store(stale)
+        self.assertEqual(status_cache.get(self.job.id)['status']['status'], 'PROCESSING')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, **TEST_SETTINGS)
+class PreviewTests(CompileJobTestCase):
+
+    CV_DATA = {'full_name': 'سارة أحمد'}
+
+    def setUp(self):
+        super().setUp()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+
+    def preview(self, **body):
+        return self.client.post('/api/preview-cv/', dict(cv_data=self.CV_DATA, **body), content_type='application/json')
+
+    @mock.patch('core.cv_views.LaTeXService.render_html_preview', return_value='<article></article>')
+    def test_renders_html_for_template(self, render):
+        template = LaTeXTemplate.objects.create(
+            name='Classic', slug='classic', category='classic',
+            latex_file_name='classic_arabic_v1.tex', schema_class_name='ClassicArabicCVSchema'
+        )
+        response = self.preview(template_id=str(template.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['html'], '<article></article>')
+        render.assert_called_once_with('classic_arabic_v1.tex', self.CV_DATA)
+
+    def test_invalid_template_id_is_rejected(self):
+        self.assertEqual(self.preview(template_id='not-a-uuid').status_code, 400)
+        self.assertEqual(
+            self.client.post(
+                '/api/preview-cv/', {'cv_data': dict(self.CV_DATA, template_id=5)}, content_type='application/json'
+            ).status_code,
+            400
+        )
+
+    def test_unknown_template_is_404(self):
+        self.assertEqual(self.preview(template_id='00000000-0000-0000-0000-000000000000').status_code, 404)
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+@override_settings(METRICS_TOKEN='scrape-secret', SECURE_SSL_REDIRECT=False, **TEST_SETTINGS)
+class MetricsTests(CompileJobTestCase):
+
+    def setUp(self):
+        super().setUp()
+        redis = fakeredis.FakeRedis()
+        for module in ('metrics_service', 'pdf_cache_service', 'llm_cache_service', 'pdf_import_cache_service'):
+            patcher = mock.patch(f'core.services.{module}.get_redis_connection', return_value=redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_metrics_view_requires_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'cvmaker_compile_queue_depth', response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_view_is_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    def test_histograms_and_queue_depth(self):
+        self.create_job(queue='compile.free')
+        job = self.create_job(status='SUCCESS', queue='compile.free', compile_seconds=0.7, render_seconds=0.02)
+        MetricsService().observe_job(job)
+
+        text = MetricsService().render_prometheus()
+        self.assertIn('cvmaker_compile_queue_depth{queue="compile.free",status="queued"} 1', text)
+        self.assertIn('cvmaker_compile_jobs_total{queue="compile.free",status="SUCCESS"} 1', text)
+        labels = 'stage="compile",queue="compile.free"'
+        self.assertIn(f'cvmaker_compile_stage_seconds_bucket{{{labels},le="0.5"}} 0', text)
+        self.assertIn(f'cvmaker_compile_stage_seconds_bucket{{{labels},le="1"}} 1', text)
+        self.assertIn(f'cvmaker_compile_stage_seconds_count{{{labels}}} 1', text)
+
+
+class ResumeChunkingTests(TestCase):
+
+    PARTIAL = partial_schema(ClassicArabicCVSchema)
+
+    def test_compact_drops_repeated_headers_and_page_numbers(self):
+        text = '\f'.join(
+            f'Sara Ahmed - CV\n\n\n{body}\nPage {page} of 3'
+            for page, body in enumerate(('Experience', 'Backend Engineer  at   Acme', 'Education'), start=1)
+        )
+        self.assertEqual(compact_resume_text(text), 'Experience\n\nBackend Engineer at Acme\n\nEducation')
+
+    def test_chunks_keep_sections_together_under_limit(self):
+        sections = ['Sara Ahmed\nsara@example.com', 'Experience\n' + 'a' * 60, 'Education\n' + 'b' * 60]
+        chunks = build_chunks('\n'.join(sections), max_chars=100)
+        self.assertEqual(chunks, [f'{sections[0]}\n\n{sections[1]}', sections[2]])
+        self.assertTrue(all(len(chunk) <= 100 for chunk in build_chunks('x\n' * 500, max_chars=100)))
+
+    def test_merge_joins_entries_split_across_chunks(self):
+        first = self.PARTIAL(full_name='سارة أحمد', experience=[
+            {'role': 'Backend Engineer', 'company': 'Acme', 'responsibilities': ['APIs']},
+        ])
+        second = self.PARTIAL(full_name='Sara', experience=[
+            {'role': 'backend engineer', 'company': 'ACME', 'date_range': '2020 - 2024', 'responsibilities': ['Celery']},
+            {'role': 'Intern', 'company': 'Beta'},
+        ])
+        merged = merge_partial_data([first, second], ClassicArabicCVSchema)
+        self.assertEqual(merged['full_name'], 'سارة أحمد')
+        self.assertEqual(len(merged['experience']), 2)
+        self.assertEqual(merged['experience'][0]['date_range'], '2020 - 2024')
+        self.assertEqual(merged['experience'][0]['responsibilities'], ['APIs', 'Celery'])
+
+    def test_missing_fields_and_fill_schema(self):
+        data = {
+            'full_name': 'سارة أحمد',
+            'contact': {'email': 'sara@example.com'},
+            'education': [],
+            'skills': [{'category_name': 'لغات البرمجة', 'skills': ['Python']}],
+        }
+        missing = missing_fields(data, ClassicArabicCVSchema)
+        self.assertEqual(missing, ['professional_summary', 'education'])
+
+        fill = fill_schema(ClassicArabicCVSchema, tuple(missing))
+        self.assertEqual(set(fill.model_fields), {'professional_summary', 'education'})
+        self.assertIs(fill, fill_schema(ClassicArabicCVSchema, tuple(missing)))
+
+    @override_settings(RESUME_CHUNK_CHARS=60, RESUME_MAX_CHUNKS=8)
+    def test_long_resume_is_parsed_per_chunk_then_reduced(self):
+        replies = {
+            'Experience': {'full_name': 'سارة أحمد', 'contact': {'email': 'sara@example.com'},
+                           'experience': [{'role': 'Engineer', 'company': 'Acme'}]},
+            'Education': {'education': [{'degree': 'BSc', 'institution': 'Cairo University'}]},
+            'Skills': {'skills': [{'category_name': 'Programming', 'skills': ['Python']}]},
+        }
+
+        def parse(messages, schema, temperature, *args):
+            if schema.__name__.endswith('Fill'):
+                return schema(professional_summary='Backend engineer')
+            chunk = messages[-1]['content']
+            return schema(**next(reply for heading, reply in replies.items() if heading in chunk))
+
+        text = '\n'.join(f'{heading}\n' + 'x' * 40 for heading in replies)
+        service = OpenAIService()
+        with mock.patch.object(service, '_cached_parse', side_effect=parse) as cached_parse:
+            result = service.parse_resume_text(text, ClassicArabicCVSchema)
+
+        self.assertEqual(cached_parse.call_count, 4)  # 3 Chunks + Reduce للملخص
+        self.assertEqual(result.professional_summary, 'Backend engineer')
+        self.assertEqual(result.education[0].institution, 'Cairo University')
+        self.assertEqual(result.experience[0].company, 'Acme')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, JOB_STATUS_BATCH_MAX_IDS=3, **TEST_SETTINGS)
+class BatchJobStatusTests(CompileJobTestCase):
+
+    URL = '/api/job-statuses/'
+
+    def setUp(self):
+        super().setUp()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+
+    def statuses(self, job_ids):
+        return self.client.post(self.URL, {'job_ids': job_ids}, content_type='application/json')
+
+    def test_returns_own_jobs_in_request_order(self):
+        failed = self.create_job(status='FAILED', error_message='LaTeX error')
+        done = self.create_job(status='SUCCESS', pdf_url='https://cdn.example.com/cv.pdf')
+        other_user = User.objects.create_user(username='other', password='x')
+        foreign = CompileJob.objects.create(project=self.project, triggered_by=other_user)
+
+        response = self.statuses([str(done.id), str(failed.id), str(foreign.id)])
+        self.assertEqual(response.status_code, 200)
+        jobs = response.json()['jobs']
+        self.assertEqual([job['job_id'] for job in jobs], [str(done.id), str(failed.id)])
+        self.assertEqual(jobs[0]['pdf_url'], 'https://cdn.example.com/cv.pdf')
+        self.assertEqual(jobs[1]['error'], 'LaTeX error')
+        self.assertEqual(response.json()['not_found'], [str(foreign.id)])
+
+    def test_rejects_bad_input(self):
+        self.assertEqual(self.statuses([]).status_code, 400)
+        self.assertEqual(self.statuses(['not-a-uuid']).status_code, 400)
+        ids = [str(self.create_job().id) for _ in range(4)]
+        self.assertEqual(self.statuses(ids).status_code, 400)
+        # التكرار بيتحسب مرة واحدة
+        response = self.statuses(ids[:1] * 3)
+        self.assertEqual(len(response.json()['jobs']), 1)
+
+    @skipUnless(fakeredis, 'fakeredis is not installed')
+    @override_settings(JOB_STATUS_CACHE_ENABLED=True)
+    def test_second_request_is_served_from_snapshots(self):
+        patcher = mock.patch(
+            'core.services.job_status_cache_service.get_redis_connection', return_value=fakeredis.FakeRedis()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        ids = [str(self.create_job(status='SUCCESS').id) for _ in range(3)]
+
+        first = self.statuses(ids)
+        with self.assertNumQueries(1):  # الـ Token بس
+            second = self.statuses(ids)
+        summary = lambda response: [(job['job_id'], job['status']) for job in response.json()['jobs']]
+        self.assertEqual(summary(second), summary(first))
+        self.assertEqual(summary(second), [(job_id, 'SUCCESS') for job_id in ids])
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+@override_settings(PDF_IMPORT_CACHE_TTL=3600, PDF_IMPORT_CACHE_MAX_BYTES=10_000, **TEST_SETTINGS)
+class PDFImportCacheTests(TestCase):
+
+    CV_DATA = {'full_name': 'سارة أحمد', 'skills': [{'category_name': 'Programming', 'skills': ['Python']}]}
+
+    def setUp(self):
+        patcher = mock.patch(
+            'core.services.pdf_import_cache_service.get_redis_connection', return_value=fakeredis.FakeRedis()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = PDFImportCacheService()
+
+    def test_digest_is_content_hash_and_rewinds_file(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        upload = SimpleUploadedFile('cv.pdf', b'%PDF-1.7 resume')
+        digest = PDFImportCacheService.compute_digest(upload)
+        self.assertEqual(upload.read(), b'%PDF-1.7 resume')
+        self.assertEqual(digest, PDFImportCacheService.compute_digest(SimpleUploadedFile('other.pdf', b'%PDF-1.7 resume')))
+        self.assertNotEqual(digest, PDFImportCacheService.compute_digest(SimpleUploadedFile('cv.pdf', b'%PDF-1.7 other')))
+
+    def test_text_and_cv_data_round_trip(self):
+        self.assertEqual(self.cache.get('d1'), {'text': None, 'cv_data': None})
+        self.cache.store_text('d1', 'Sara Ahmed\nBackend Engineer')
+        self.assertEqual(self.cache.get('d1'), {'text': 'Sara Ahmed\nBackend Engineer', 'cv_data': None})
+
+        self.cache.store_cv_data('d1', self.CV_DATA)
+        self.assertEqual(self.cache.get('d1')['cv_data'], self.CV_DATA)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_parser_change_keeps_text_but_drops_cv_data(self):
+        self.cache.store_text('d1', 'Sara Ahmed')
+        self.cache.store_cv_data('d1', self.CV_DATA)
+        with mock.patch.object(PDFImportCacheService, 'parser_version', return_value='new-prompt'):
+            self.assertEqual(self.cache.get('d1'), {'text': 'Sara Ahmed', 'cv_data': None})
+
+    def test_eviction_keeps_total_under_limit(self):
+        for index in range(5):
+            # نص عشوائي عشان الضغط ما يصغّرهوش تحت الحد
+            self.cache.store_text(f'd{index}', os.urandom(3000).hex())
+        self.assertLessEqual(self.cache.stats()['bytes'], 10_000)
+        self.assertIsNone(self.cache.get('d0')['text'])
+        self.assertIsNotNone(self.cache.get('d4')['text'])
+
+
+class StructuredOutputSchemaTests(TestCase):
+
+    def walk(self, node):
+        yield node
+        for value in node.values():
+            children = value if isinstance(value, list) else [value]
+            for child in children:
+                if isinstance(child, dict):
+                    yield from self.walk(child)
+
+    def test_response_format_is_strict(self):
+        response_format = get_response_format(ClassicArabicCVSchema)
+        self.assertIs(response_format, get_response_format(ClassicArabicCVSchema))
+        self.assertTrue(response_format['json_schema']['strict'])
+
+        for node in self.walk(response_format['json_schema']['schema']):
+            if node.get('type') == 'object' and 'properties' in node:
+                self.assertIs(node['additionalProperties'], False)
+                self.assertEqual(set(node['required']), set(node['properties']))
+            if '$ref' in node:
+                self.assertEqual(list(node), ['$ref'])
+            self.assertFalse('default' in node and node['default'] is None)
+
+    def test_system_prompt_is_a_stable_prefix(self):
+        service = OpenAIService()
+        first = service._extract_messages('Backend engineer in Cairo', ClassicArabicCVSchema, 'ar')
+        second = service._extract_messages('Designer in Alexandria', ClassicArabicCVSchema, 'ar')
+        # الـ Prefix الثابت بيخلي الـ Provider يعمل Cache للـ System prompt
+        self.assertEqual(first[0], second[0])
+        self.assertIs(
+            build_system_prompt(ClassicArabicCVSchema, 'ar'), build_system_prompt(ClassicArabicCVSchema, 'ar')
+        )
+        english = build_system_prompt(ClassicArabicCVSchema, 'en')
+        common = len(english) - len(english.rsplit('\n', 1)[-1])
+        self.assertEqual(english[:common], first[0]['content'][:common])
+
+    def test_refusal_is_raised(self):
+        message = SimpleNamespace(refusal='I cannot help with that', content=None)
+        completion = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        with self.assertRaisesRegex(ValueError, 'refused'):
+            parse_structured_completion(completion, ClassicArabicCVSchema)
+
+
+class TierRoutingTests(TestCase):
+
+    def test_tier_follows_user(self):
+        from django.contrib.auth.models import AnonymousUser
+        self.assertEqual(get_user_tier(None), 'guest')
+        self.assertEqual(get_user_tier(AnonymousUser()), 'guest')
+        self.assertEqual(get_user_tier(User(username='free')), 'free')
+        self.assertEqual(get_user_tier(User(username='paid', is_premium=True)), 'premium')
+
+    def test_queue_per_tier_and_task_kind(self):
+        self.assertEqual(get_queue('compile', User(username='paid', is_premium=True)), 'compile.premium')
+        self.assertEqual(get_queue('pipeline', User(username='free')), 'pipeline.free')
+        self.assertEqual(get_queue('compile'), 'compile.guest')
+
+    @override_settings(CELERY_TIER_QUEUES={
+        'free': {'compile': 'compile.free', 'pipeline': 'pipeline.free'},
+    })
+    def test_unconfigured_tier_falls_back_to_free(self):
+        self.assertEqual(get_queue('compile', User(username='paid', is_premium=True)), 'compile.free')
+        self.assertEqual(get_queue('pipeline'), 'pipeline.free')
+
+
+@override_settings(OPENAI_STREAMING_ENABLED=False, **TEST_SETTINGS)
+class PipelineStageTests(CompileJobTestCase):
+
+    CV_DATA = {
+        'full_name': 'سارة أحمد',
+        'contact': {'email': 'sara@example.com'},
+        'professional_summary': 'مهندسة Backend',
+        'education': [{'degree': 'بكالوريوس حاسبات', 'institution': 'جامعة القاهرة'}],
+        'skills': [{'category_name': 'لغات البرمجة', 'skills': ['Python']}],
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.template = LaTeXTemplate.objects.create(
+            name='Classic', slug='classic', category='classic',
+            latex_file_name='classic_arabic_v1.tex', schema_class_name='ClassicArabicCVSchema'
+        )
+        self.job = self.create_job(queue='pipeline.premium', cv_data={
+            'template_id': str(self.template.id), 'raw_prompt': 'Backend engineer in Cairo', 'language': 'ar',
+        })
+        self.ai_service = mock.Mock()
+        self.ai_service.extract_cv_data.return_value = ClassicArabicCVSchema.model_validate(self.CV_DATA)
+        mock.patch('core.services.async_openai_service.get_openai_service', return_value=self.ai_service).start()
+        mock.patch('core.tasks.compile_tasks.publish_job_event').start()
+        self.compile = mock.patch('core.tasks.compile_tasks.compile_latex_to_pdf').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_stage_queue_keeps_tier(self):
+        self.assertEqual(get_stage_queue('pipeline.premium', 'compile'), 'compile.premium')
+        self.assertEqual(get_stage_queue('compile.guest', 'pipeline'), 'pipeline.guest')
+        self.assertEqual(get_stage_queue('unknown', 'compile'), 'compile.free')
+
+    def test_ai_stage_hands_job_to_compile_queue(self):
+        full_ai_cv_pipeline(str(self.job.id))
+
+        job = CompileJob.objects.get(id=self.job.id)
+        self.assertEqual(job.status, 'QUEUED')
+        self.assertEqual(job.queue, 'compile.premium')
+        self.assertEqual(job.cv_data['full_name'], 'سارة أحمد')
+        self.assertEqual(job.cv_data['template_id'], str(self.template.id))
+        self.assertIsNotNone(job.ai_seconds)
+        self.compile.apply_async.assert_called_once_with(args=[None, str(job.id)], queue='compile.premium')
+
+    def test_job_cancelled_during_ai_is_not_handed_off(self):
+        def cancel(*args, **kwargs):
+            CompileJob.objects.filter(id=self.job.id).update(status='CANCELLED')
+            return ClassicArabicCVSchema.model_validate(self.CV_DATA)
+
+        self.ai_service.extract_cv_data.side_effect = cancel
+        full_ai_cv_pipeline(str(self.job.id))
+
+        self.assertEqual(CompileJob.objects.get(id=self.job.id).status, 'CANCELLED')
+        self.compile.apply_async.assert_not_called()
+
+
+class WorkspacePoolTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        self.font = self.root / 'Amiri.ttf'
+        self.font.write_bytes(b'font')
+
+    def test_workspace_is_reused_with_assets_and_scrubbed(self):
+        pool = WorkspacePool(self.root / 'pool', max_idle=2)
+        with pool.acquire(assets=[str(self.font)]) as workspace:
+            first_path = workspace.path
+            (workspace.path / 'cv.tex').write_text('x')
+            (workspace.path / 'cv.pdf').write_bytes(b'%PDF')
+            self.assertEqual((workspace.path / 'Amiri.ttf').read_bytes(), b'font')
+
+        with pool.acquire(assets=[str(self.font)]) as workspace:
+            self.assertEqual(workspace.path, first_path)
+            self.assertEqual(sorted(p.name for p in workspace.path.iterdir()), ['Amiri.ttf'])
+
+    def test_failed_job_workspace_is_destroyed(self):
+        pool = WorkspacePool(self.root / 'pool')
+        with self.assertRaises(RuntimeError):
+            with pool.acquire() as workspace:
+                broken_path = workspace.path
+                raise RuntimeError('tectonic crashed')
+        self.assertFalse(broken_path.exists())
+        with pool.acquire() as workspace:
+            self.assertNotEqual(workspace.path, broken_path)
+
+    def test_idle_workspaces_are_capped(self):
+        pool = WorkspacePool(self.root / 'pool', max_idle=1)
+        with pool.acquire() as first, pool.acquire() as second:
+            paths = (first.path, second.path)
+        self.assertEqual(len(pool._idle), 1)
+        self.assertEqual(sum(path.exists() for path in paths), 1)
+
+    def test_stale_workspaces_of_dead_processes_are_removed(self):
+        root = self.root / 'pool'
+        (root / '999999999-1').mkdir(parents=True)
+        (root / 'not-a-workspace').mkdir()
+        WorkspacePool(root)
+        self.assertFalse((root / '999999999-1').exists())
+        self.assertTrue((root / 'not-a-workspace').exists())
+
+
+class TectonicRunnerTests(TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name) / 'tectonic'
+
+    @override_settings(TECTONIC_OFFLINE=True, TECTONIC_BUNDLE='/opt/tectonic/bundle.tar')
+    def test_command_uses_pinned_bundle_and_offline_mode(self):
+        self.assertEqual(
+            build_tectonic_command(Path('cv.tex')),
+            ['tectonic', '--bundle', '/opt/tectonic/bundle.tar', '--only-cached', 'cv.tex']
+        )
+        # الـ warm_tectonic_cache أول مرة بيحتاج الشبكة
+        self.assertNotIn('--only-cached', build_tectonic_command(Path('cv.tex'), offline=False))
+
+    @mock.patch('core.services.tectonic_service.subprocess.run')
+    def test_runs_with_shared_cache_dir(self, run):
+        with override_settings(TECTONIC_CACHE_DIR=str(self.cache_dir), TECTONIC_OFFLINE=False, TECTONIC_BUNDLE=''):
+            run_tectonic(Path('cv.tex'), cwd=Path('/tmp'), timeout=30)
+        self.assertTrue(self.cache_dir.is_dir())
+        self.assertEqual(run.call_args.args[0], ['tectonic', 'cv.tex'])
+        self.assertEqual(run.call_args.kwargs['env']['TECTONIC_CACHE_DIR'], str(self.cache_dir))
+        self.assertEqual(run.call_args.kwargs['timeout'], 30)
+
+
+class PersistPDFTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        media = override_settings(MEDIA_ROOT=str(self.tmp / 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_pdf_is_streamed_from_disk_to_storage(self):
+        from django.core.files.storage import default_storage
+        pdf_file = self.tmp / 'cv.pdf'
+        pdf_file.write_bytes(b'%PDF-1.7' + os.urandom(200_000))
+
+        # من غير تحميل الملف كله في الذاكرة
+        with mock.patch.object(Path, 'read_bytes', side_effect=AssertionError('read into memory')):
+            saved_path, size = persist_pdf(pdf_file, 'job-1')
+
+        self.assertEqual(size, pdf_file.stat().st_size)
+        self.assertTrue(saved_path.startswith('cvs/job-1/'))
+        with default_storage.open(saved_path, 'rb') as stored:
+            self.assertEqual(stored.read(), pdf_file.read_bytes())
+
+
+@override_settings(PDF_IMPORT_CACHE_ENABLED=False, SECURE_SSL_REDIRECT=False, **TEST_SETTINGS)
+class PDFImportTests(CompileJobTestCase):
+
+    RESUME_TEXT = 'Sara Ahmed\nBackend Engineer at Acme, Cairo\nEducation: BSc Computer Science'
+    CV_DATA = {
+        'full_name': 'سارة أحمد',
+        'contact': {'email': 'sara@example.com'},
+        'professional_summary': 'مهندسة Backend',
+        'education': [{'degree': 'بكالوريوس حاسبات', 'institution': 'جامعة القاهرة'}],
+        'skills': [{'category_name': 'لغات البرمجة', 'skills': ['Python']}],
+    }
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, content=b'%PDF-1.7 resume', **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return self.client.post('/api/parse-cv-pdf/', {'file': SimpleUploadedFile('cv.pdf', content)}, **extra)
+
+    @mock.patch('core.tasks.import_tasks.import_cv_from_pdf.apply_async')
+    def test_upload_is_queued_not_parsed_in_request(self, apply_async):
+        from django.core.files.storage import default_storage
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        import_id, file_name, user_id, digest = apply_async.call_args.kwargs['args']
+        self.assertEqual(import_id, response.json()['import_id'])
+        self.assertIsNone(user_id)
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'pipeline.guest')
+        self.assertTrue(default_storage.exists(file_name))
+        self.assertEqual(self.client.get(f'/api/import-status/{import_id}/').json()['status'], 'QUEUED')
+
+    def test_non_pdf_is_rejected(self):
+        self.assertEqual(self.upload(b'GIF89a').status_code, 400)
+
+    @mock.patch('core.services.pdf_text_service.extract_pdf_text')
+    @mock.patch('core.services.async_openai_service.get_openai_service')
+    def test_worker_parses_and_stores_result(self, get_service, extract_text):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from .services.pdf_import_service import create_import
+        from .tasks.import_tasks import import_cv_from_pdf
+
+        extract_text.return_value = self.RESUME_TEXT
+        get_service.return_value.parse_resume_text.return_value = ClassicArabicCVSchema.model_validate(self.CV_DATA)
+        state = create_import(owner_id=self.user.id)
+        file_name = default_storage.save(f"imports/{state['import_id']}.pdf", ContentFile(b'%PDF-1.7'))
+
+        import_cv_from_pdf(state['import_id'], file_name, str(self.user.id))
+
+        self.assertFalse(default_storage.exists(file_name))
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+        result = self.client.get(f"/api/import-status/{state['import_id']}/").json()
+        self.assertEqual(result['status'], 'SUCCESS')
+        self.assertEqual(result['cv_data']['full_name'], 'سارة أحمد')
+        self.assertEqual(CompileJob.objects.get(id=result['job_id']).status, 'SUCCESS')
+
+        # استيراد مستخدم مسجل مايظهرش لغيره
+        del self.client.defaults['HTTP_AUTHORIZATION']
+        self.assertEqual(self.client.get(f"/api/import-status/{state['import_id']}/").status_code, 404)
@@ -4,7 +4,7 @@ from rest_framework.authtoken import views as auth_views
 from django.conf import settings
 from django.conf.urls.static import static
 from . import cv_views
-from .cv_views import parse_cv_from_pdf
+from .cv_views import parse_cv_from_pdf, pdf_import_status
 from .cv_views import save_imported_cv
 
 # 1. Import ViewSets and Auth Views
@@ -17,15 +17,18 @@ from .views import (
     CurrentUserView,
     custom_social_signup,
     CustomAuthToken,
+    metrics_view,
 )
 
 # 2. Import CV Specific Views (Added new imports here)
 from .cv_views import (
     generate_cv_with_ai,
     check_job_status,
+    batch_job_status,
     list_templates,
     update_cv_data,
     get_cv_data,
+    preview_cv_html,
     user_stats,
     
 )
@@ -54,12 +57,14 @@ urlpatterns = [
 
     # 2. Job Status Polling
     path('api/check-job-status/<uuid:job_id>/', check_job_status, name='check-job-status'),
+    path('api/job-statuses/', batch_job_status, name='job-statuses'),                # حالة Jobs كتير في طلب واحد
     
     # 3. Templates List
     path('api/templates/', list_templates, name='list-templates'),
     
     # 4. Hybrid Editing Endpoints (New)
     path('api/get-cv-data/<uuid:job_id>/', get_cv_data, name='get-cv-data'),     # جلب البيانات
+    path('api/preview-cv/', preview_cv_html, name='preview-cv'),                  # معاينة HTML فورية
     path('api/update-cv-data/', update_cv_data, name='update-cv-data'),           # تحديث البيانات
     
     # 5. User Statistics
@@ -71,7 +76,11 @@ urlpatterns = [
     path('api/users/me/', cv_views.get_current_user, name='current-user'),
     # New Endpoint for PDF Upload
     path('api/parse-cv-pdf/', parse_cv_from_pdf, name='parse-cv-pdf'),
+    path('api/import-status/<uuid:import_id>/', pdf_import_status, name='import-status'),
     path('api/save-imported-cv/', save_imported_cv, name='save-imported-cv'),
     
+    # Prometheus metrics (stage timings + queue depth)
+    path('metrics/', metrics_view, name='metrics'),
+    
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
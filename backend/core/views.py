@@ -1,3 +1,5 @@
+import hmac
+
 from django.shortcuts import render
 from django.contrib.auth import get_user_model
 from django.shortcuts import redirect
@@ -9,10 +11,14 @@ from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 
 # استيراد النماذج والمهام الخاصة بمشروعنا
-from .models import Project, ProjectFile, CompileJob
+from .models import Project, ProjectFile, CompileJob, LaTeXTemplate
 from .serializers import ProjectSerializer, ProjectFileSerializer
-from .tasks.compile_tasks import compile_latex_to_pdf
+from .tasks.compile_tasks import cancel_superseded_jobs, compile_latex_to_pdf
+from .tasks.routing import get_queue
 from django.db.models import Prefetch, Subquery, OuterRef
+from django.conf import settings
+from django.http import HttpResponse
+from .services.metrics_service import MetricsService
 
 
 User = get_user_model()
@@ -288,17 +294,59 @@ class TriggerCompileView(views.APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # 2. إنشاء سجل Job في قاعدة البيانات لتتبع الحالة
+        # 2. بيانات آخر نسخة ناجحة من المشروع (الـ Task بيولد الـ LaTeX من cv_data الـ Job نفسها)
+        source_job = project.compile_jobs.filter(status='SUCCESS').exclude(cv_template_id='') \
+            .select_related('payload').order_by('-created_at').first()
+        if source_job is None or not source_job.cv_data:
+            return Response(
+                {"error": "No CV data to compile for this project"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not LaTeXTemplate.objects.filter(id=source_job.cv_template_id, is_active=True).exists():
+            return Response(
+                {"error": "Template not found"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # 3. إنشاء سجل Job في قاعدة البيانات لتتبع الحالة (cv_data بيضبط cv_template_id)
+        queue = get_queue('compile', request.user)
         job = CompileJob.objects.create(
             project=project,
-            triggered_by=request.user
+            triggered_by=request.user,
+            queue=queue,
+            cv_data=source_job.cv_data
         )
         
-        # 3. إرسال المهمة إلى Celery Worker (في الخلفية)
-        # نستخدم .delay() لكي لا يتوقف السيرفر عن العمل أثناء الانتظار
-        compile_latex_to_pdf.delay(job.id)
+        # 4. إرسال المهمة إلى Celery Worker (في الخلفية) على طابور الـ Tier الخاص بالمستخدم
+        task = compile_latex_to_pdf.apply_async(args=[None, str(job.id)], queue=queue)
+        job.celery_task_id = task.id
+        job.save(update_fields=['celery_task_id'])
+        
+        # Latest-wins زي update-cv-data
+        cancel_superseded_jobs(job)
         
         return Response(
             {"job_id": job.id, "status": "QUEUED"}, 
             status=status.HTTP_202_ACCEPTED
-        )
\ No newline at end of file
+        )
+
+
+# ==========================================
+# 5. Monitoring
+# ==========================================
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint (histograms لمراحل الـ CompileJob + عمق الطوابير)
+    لازم Authorization: Bearer <METRICS_TOKEN>، ولو مفيش Token متحدد الـ Endpoint مقفول (404)
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+
+    return HttpResponse(
+        MetricsService().render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
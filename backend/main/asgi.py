@@ -2,7 +2,7 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.urls import re_path
-from core.consumers import EditorConsumer
+from core.consumers import EditorConsumer, JobStatusConsumer
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
 
@@ -11,5 +11,7 @@ application = ProtocolTypeRouter({
     "websocket": URLRouter([
         # هذا الرابط الذي سيتصل به الـ React
         re_path(r'ws/editor/(?P<project_id>[0-9a-f-]+)/$', EditorConsumer.as_asgi()),
+        # حالة الـ Job (Push بدل Polling على check-job-status)
+        re_path(r'ws/jobs/(?P<job_id>[0-9a-f-]+)/$', JobStatusConsumer.as_asgi()),
     ]),
 })
\ No newline at end of file
@@ -1,8 +1,27 @@
 import os
 from celery import Celery
+from celery.signals import celeryd_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
 
 app = Celery('main')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@celeryd_init.connect
+def configure_queue_concurrency(sender=None, conf=None, options=None, **kwargs):
+    """
+    Worker بيستهلك طابور واحد بياخد الـ concurrency بتاعته من CELERY_QUEUE_CONCURRENCY
+    (لو -c اتحددت في الأمر بتكسب)
+    """
+    from django.conf import settings
+
+    queues = (options or {}).get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+
+    if len(queues) == 1 and not (options or {}).get('concurrency'):
+        concurrency = settings.CELERY_QUEUE_CONCURRENCY.get(queues[0].strip())
+        if concurrency:
+            conf.worker_concurrency = concurrency
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 import dj_database_url
 from dotenv import load_dotenv
@@ -65,6 +66,23 @@ SESSION_CACHE_ALIAS = 'default'
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# Async extraction: one shared event loop per process (core/services/async_openai_service.py)
+OPENAI_ASYNC_ENABLED = os.getenv('OPENAI_ASYNC_ENABLED', 'True') == 'True'
+OPENAI_MAX_IN_FLIGHT = int(os.getenv('OPENAI_MAX_IN_FLIGHT', '32'))  # concurrent requests per process
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '3'))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+OPENAI_COMPLETION_TOKENS_ESTIMATE = int(os.getenv('OPENAI_COMPLETION_TOKENS_ESTIMATE', '1500'))
+# Stream AI generation and push partial cv_data to ws/jobs/<job_id>/
+OPENAI_STREAMING_ENABLED = os.getenv('OPENAI_STREAMING_ENABLED', 'True') == 'True'
+OPENAI_STREAM_PUSH_INTERVAL = float(os.getenv('OPENAI_STREAM_PUSH_INTERVAL', '0.3'))  # seconds between pushes
+# Per-model limits shared by all processes through Redis: requests and tokens per minute
+OPENAI_RATE_LIMITS = {
+    'gpt-4o-mini': {
+        'rpm': int(os.getenv('OPENAI_RPM_GPT_4O_MINI', '500')),
+        'tpm': int(os.getenv('OPENAI_TPM_GPT_4O_MINI', '200000')),
+    },
+}
+
 # ==================================================
 # CELERY CONFIGURATION
 # ==================================================
@@ -73,6 +91,117 @@ CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'django://')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'django-db')
 CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'True') == 'True'
 
+# Tiered queues: premium / free / guest traffic never share a worker pool
+# Run one worker per queue, e.g. `celery -A main worker -Q compile.premium -n premium@%h`
+CELERY_TIER_QUEUES = {
+    'premium': {'compile': 'compile.premium', 'pipeline': 'pipeline.premium'},
+    'free': {'compile': 'compile.free', 'pipeline': 'pipeline.free'},
+    'guest': {'compile': 'compile.guest', 'pipeline': 'pipeline.guest'},
+}
+
+# Default routes for dispatches that don't pick a tier explicitly
+CELERY_TASK_ROUTES = {
+    'core.tasks.compile_latex_to_pdf': {'queue': 'compile.free'},
+    'core.tasks.full_ai_cv_pipeline': {'queue': 'pipeline.free'},
+    'core.tasks.import_cv_from_pdf': {'queue': 'pipeline.free'},
+    # Bulk regenerations (admin actions) never compete with interactive compiles
+    'core.tasks.compile_batch': {'queue': 'compile.batch'},
+}
+
+# Worker concurrency per queue (used when a worker consumes a single queue and no -c is given)
+# compile.* = CPU-bound Tectonic runs: prefork pool sized to the CPU cores
+# pipeline.* = OpenAI calls (network I/O): run with `-P threads`; threads only wait on the shared
+#              asyncio loop of AsyncOpenAIService, which caps real in-flight requests
+CPU_CORES = os.cpu_count() or 1
+CELERY_QUEUE_CONCURRENCY = {
+    'compile.premium': int(os.getenv('CELERY_CONCURRENCY_COMPILE_PREMIUM', str(CPU_CORES))),
+    'compile.free': int(os.getenv('CELERY_CONCURRENCY_COMPILE_FREE', str(max(1, CPU_CORES // 2)))),
+    'compile.guest': int(os.getenv('CELERY_CONCURRENCY_COMPILE_GUEST', '1')),
+    'pipeline.premium': int(os.getenv('CELERY_CONCURRENCY_PIPELINE_PREMIUM', '64')),
+    'pipeline.free': int(os.getenv('CELERY_CONCURRENCY_PIPELINE_FREE', '32')),
+    'pipeline.guest': int(os.getenv('CELERY_CONCURRENCY_PIPELINE_GUEST', '16')),
+    'compile.batch': int(os.getenv('CELERY_CONCURRENCY_COMPILE_BATCH', '1')),
+}
+
+# ==================================================
+# PDF COMPILE CACHE
+# ==================================================
+
+PDF_CACHE_ENABLED = os.getenv('PDF_CACHE_ENABLED', 'True') == 'True'
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))  # 2 GB
+
+# ==================================================
+# LLM RESULT CACHE
+# ==================================================
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True') == 'True'
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))  # 7 days
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '50000'))
+# Bump to invalidate every cached extraction (prompt/schema edits already change the key)
+LLM_CACHE_VERSION = os.getenv('LLM_CACHE_VERSION', '1')
+
+
+# ==================================================
+# JOB STATUS SNAPSHOTS
+# ==================================================
+
+# Written by the workers on every transition; check-job-status / get-cv-data serve from them (ETag / 304)
+JOB_STATUS_CACHE_ENABLED = os.getenv('JOB_STATUS_CACHE_ENABLED', 'True') == 'True'
+JOB_STATUS_CACHE_TTL = int(os.getenv('JOB_STATUS_CACHE_TTL', str(24 * 3600)))  # 1 day
+# check-job-status?wait=N holds the request until the status changes (capped here)
+JOB_STATUS_LONG_POLL_MAX_SECONDS = float(os.getenv('JOB_STATUS_LONG_POLL_MAX_SECONDS', '30'))
+# Max job ids per /api/job-statuses/ request
+JOB_STATUS_BATCH_MAX_IDS = int(os.getenv('JOB_STATUS_BATCH_MAX_IDS', '100'))
+
+# ==================================================
+# METRICS
+# ==================================================
+
+# Bearer token required by /metrics/ (empty = endpoint disabled, returns 404)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# ==================================================
+# TECTONIC (LaTeX Compiler)
+# ==================================================
+
+# Shared bundle + format cache (mount a persistent volume here in production)
+TECTONIC_CACHE_DIR = os.getenv('TECTONIC_CACHE_DIR', str(BASE_DIR / '.tectonic-cache'))
+# Optional local bundle (zip/dir) or mirror URL instead of the default web bundle
+TECTONIC_BUNDLE = os.getenv('TECTONIC_BUNDLE', '')
+# Never touch the network once the cache is warmed (python manage.py warm_tectonic_cache)
+TECTONIC_OFFLINE = os.getenv('TECTONIC_OFFLINE', 'False') == 'True'
+
+# Precompiled per-template preamble formats: compiles with TeX Live xelatex instead of Tectonic
+# (opt-in; needs xelatex + mylatexformat, formats are built by warm_tectonic_cache, falls back to Tectonic)
+LATEX_PREAMBLE_FORMAT_ENABLED = os.getenv('LATEX_PREAMBLE_FORMAT_ENABLED', 'False') == 'True'
+LATEX_FORMAT_DIR = os.getenv('LATEX_FORMAT_DIR', os.path.join(TECTONIC_CACHE_DIR, 'preamble-formats'))
+
+# Reusable compile workspaces (point at tmpfs, e.g. /dev/shm/cv-compile, to keep them in RAM)
+COMPILE_WORKSPACE_ROOT = os.getenv(
+    'COMPILE_WORKSPACE_ROOT',
+    os.path.join(tempfile.gettempdir(), 'cv-compile-workspaces')
+)
+COMPILE_WORKSPACE_POOL_SIZE = int(os.getenv('COMPILE_WORKSPACE_POOL_SIZE', '4'))  # idle workspaces per process
+COMPILE_BATCH_SAVE_EVERY = int(os.getenv('COMPILE_BATCH_SAVE_EVERY', '25'))  # bulk_update chunk size for batch compiles
+COMPILE_PAYLOAD_ZSTD_LEVEL = int(os.getenv('COMPILE_PAYLOAD_ZSTD_LEVEL', '3'))  # logs / cv_data compression in CompileJobPayload
+
+# ==================================================
+# PDF IMPORT
+# ==================================================
+
+PDF_IMPORT_MAX_BYTES = int(os.getenv('PDF_IMPORT_MAX_BYTES', str(10 * 1024 * 1024)))  # 10 MB
+PDF_IMPORT_RESULT_TTL = int(os.getenv('PDF_IMPORT_RESULT_TTL', '3600'))  # import status kept for 1 hour
+# Page extraction runs in a spawn-based process pool for PDFs with at least this many pages
+PDF_IMPORT_PROCESSES = int(os.getenv('PDF_IMPORT_PROCESSES', str(min(4, CPU_CORES))))
+PDF_IMPORT_PARALLEL_MIN_PAGES = int(os.getenv('PDF_IMPORT_PARALLEL_MIN_PAGES', '8'))
+# Long resumes are parsed in section chunks concurrently and merged (instead of truncating)
+RESUME_CHUNK_CHARS = int(os.getenv('RESUME_CHUNK_CHARS', '8000'))
+RESUME_MAX_CHUNKS = int(os.getenv('RESUME_MAX_CHUNKS', '8'))
+# Extracted text + cv_data keyed by the uploaded file's SHA-256 (re-uploads skip parsing)
+PDF_IMPORT_CACHE_ENABLED = os.getenv('PDF_IMPORT_CACHE_ENABLED', 'True') == 'True'
+PDF_IMPORT_CACHE_TTL = int(os.getenv('PDF_IMPORT_CACHE_TTL', str(7 * 24 * 3600)))  # 7 days
+PDF_IMPORT_CACHE_MAX_BYTES = int(os.getenv('PDF_IMPORT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))  # 256 MB
+
 # ==================================================
 # MEDIA FILES
 # ==================================================
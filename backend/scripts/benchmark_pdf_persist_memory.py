@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory per job when persisting a compiled PDF to storage.
+
+Modes:
+    bytes   old path: pdf_file.read_bytes() -> ContentFile -> storage.save
+    stream  new path: open file handle -> File -> storage.save (chunked)
+
+Each mode runs in a fresh subprocess so peak RSS is not shared between
+them. A FileSystemStorage in a temp directory stands in for default_storage.
+
+Usage:
+    python backend/scripts/benchmark_pdf_persist_memory.py
+    python backend/scripts/benchmark_pdf_persist_memory.py --size-mb 40 --jobs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+
+def peak_rss_kb() -> int:
+    import resource
+    # Linux: KB, macOS: bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_child(mode: str, pdf_path: Path, jobs: int):
+    from django.conf import settings
+    settings.configure()
+
+    from django.core.files import File
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import FileSystemStorage
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        storage = FileSystemStorage(location=storage_dir)
+        rss_before = peak_rss_kb()
+        tracemalloc.start()
+
+        for job in range(jobs):
+            name = f"cvs/job-{job}/cv.pdf"
+            if mode == 'bytes':
+                pdf_content = pdf_path.read_bytes()
+                size = len(pdf_content)
+                storage.save(name, ContentFile(pdf_content))
+                del pdf_content
+            else:
+                size = pdf_path.stat().st_size
+                with pdf_path.open('rb') as pdf_handle:
+                    storage.save(name, File(pdf_handle, name=pdf_path.name))
+
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(json.dumps({
+            'mode': mode,
+            'size': size,
+            'rss_before_kb': rss_before,
+            'rss_peak_kb': peak_rss_kb(),
+            'traced_peak_kb': traced_peak // 1024,
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=20, help='Size of the synthetic PDF')
+    parser.add_argument('--jobs', type=int, default=3, help='PDFs saved per process')
+    parser.add_argument('--pdf', help='Use an existing PDF instead of a synthetic one')
+    parser.add_argument('--child', choices=['bytes', 'stream'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, Path(args.pdf), args.jobs)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdf_path = Path(args.pdf) if args.pdf else Path(tmpdir) / 'cv.pdf'
+        if not args.pdf:
+            # محتوى عشوائي عشان ما يحصلش أي ضغط أو مشاركة صفحات
+            with pdf_path.open('wb') as f:
+                remaining = int(args.size_mb * 1024 * 1024)
+                while remaining > 0:
+                    chunk = min(remaining, 1024 * 1024)
+                    f.write(os.urandom(chunk))
+                    remaining -= chunk
+
+        results = {}
+        for mode in ('bytes', 'stream'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', mode, '--pdf', str(pdf_path), '--jobs', str(args.jobs)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    size_mb = results['bytes']['size'] / (1024 * 1024)
+    print(f"PDF size: {size_mb:.1f} MB, {args.jobs} job(s) per process")
+    print(f"{'mode':<8} {'peak RSS delta':>16} {'peak traced':>14}")
+    for mode, result in results.items():
+        delta_mb = (result['rss_peak_kb'] - result['rss_before_kb']) / 1024
+        print(f"{mode:<8} {delta_mb:>13.1f} MB {result['traced_peak_kb'] / 1024:>11.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
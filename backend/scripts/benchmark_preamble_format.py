@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-compile time with and without the precompiled preamble format.
+
+Compiles the same rendered CV (schema example data) repeatedly with:
+    1. tectonic                      (current default path)
+    2. xelatex, full preamble        (same engine, no format)
+    3. xelatex, precompiled preamble (-fmt=<template>-<version>)
+
+Usage:
+    python backend/scripts/benchmark_preamble_format.py
+    python backend/scripts/benchmark_preamble_format.py --template classic_arabic_v1.tex --runs 20
+
+Requires tectonic and/or xelatex (with mylatexformat) on PATH; missing
+engines are skipped.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from core.services.latex_service import LaTeXService  # noqa: E402
+from core.services.preamble_format_service import PreambleFormatService  # noqa: E402
+from core.services.tectonic_service import run_tectonic  # noqa: E402
+
+
+def time_runs(label, runs, latex_content, font_path, compile_fn):
+    timings = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            tex_file = tmpdir / 'cv.tex'
+            tex_file.write_text(latex_content, encoding='utf-8')
+            shutil.copy(font_path, tmpdir / Path(font_path).name)
+
+            started = time.perf_counter()
+            result = compile_fn(tex_file, tmpdir)
+            elapsed = time.perf_counter() - started
+
+            if result.returncode != 0 or not (tmpdir / 'cv.pdf').exists():
+                print(f"{label}: compile failed\n{(result.stderr or result.stdout)[-500:]}")
+                return None
+            timings.append(elapsed)
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(
+        f"{label:<28} mean {statistics.mean(timings):6.3f}s  "
+        f"median {statistics.median(timings):6.3f}s  p95 {p95:6.3f}s  (n={len(timings)})"
+    )
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--template', default='classic_arabic_v1.tex')
+    parser.add_argument('--schema', default='ClassicArabicCVSchema')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    latex_service = LaTeXService()
+    latex_content = latex_service.render_latex(args.template, latex_service.get_sample_data(args.schema))
+    font_path = latex_service.get_arabic_font_path()
+    preamble_format = PreambleFormatService()
+
+    print(f"Template: {args.template} (version {LaTeXService.get_template_version(args.template)})")
+
+    if shutil.which('tectonic'):
+        # تشغيل أول للتأكد إن الـ Bundle في الـ Cache قبل القياس
+        time_runs('tectonic (warm-up)', 1, latex_content, font_path, lambda f, d: run_tectonic(f, cwd=d))
+        time_runs('tectonic', args.runs, latex_content, font_path, lambda f, d: run_tectonic(f, cwd=d))
+    else:
+        print('tectonic not found, skipping')
+
+    if not shutil.which('xelatex'):
+        print('xelatex not found, skipping format comparison')
+        return
+
+    def xelatex_full(tex_file, cwd):
+        return subprocess.run(
+            ['xelatex', '-interaction=nonstopmode', '-halt-on-error', tex_file.name],
+            cwd=cwd, capture_output=True, text=True, timeout=300
+        )
+
+    baseline = time_runs('xelatex full preamble', args.runs, latex_content, font_path, xelatex_full)
+
+    started = time.perf_counter()
+    fmt_path = preamble_format.ensure_format(args.template)
+    if not fmt_path:
+        print('Could not build the preamble format (is mylatexformat installed?)')
+        return
+    print(f"Format {fmt_path.name} ready in {time.perf_counter() - started:.3f}s (one-off per template version)")
+
+    precompiled = time_runs(
+        'xelatex precompiled preamble', args.runs, latex_content, font_path,
+        lambda f, d: preamble_format.compile(f, cwd=d, template_name=args.template)
+    )
+
+    if baseline and precompiled:
+        print(f"Speed-up (median): {baseline / precompiled:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
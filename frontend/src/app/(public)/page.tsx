@@ -6,6 +6,7 @@ import Image from "next/image";
 import Link from "next/link";
 // ✅ استيراد مكتبة الاتصال بالباك اند بدلاً من الـ fetch العادي
 import api from "@/lib/api"; 
+import { importCvFromPdf } from "@/lib/pdfImport";
 import MagicButton from "@/components/ui//MagicButton";
 import CountUp from "@/components/ui/CountUp";
 import LoadingMessage from "@/components/ui/LoadingMessage";
@@ -112,16 +113,12 @@ export default function Home() {
         return;
     }
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     setIsLoading(true);
     setError(null);
 
     try {
-      const { data } = await api.post('/parse-cv-pdf/', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
-      });
+      // الرفع بيرجع فوراً والتحليل بيكمل في الخلفية لحد ما النتيجة تجهز
+      const data = await importCvFromPdf(file);
 
       console.log("Extracted Data:", data);
 
@@ -139,7 +136,7 @@ export default function Home() {
 
     } catch (error: any) {
       console.error("Upload Error:", error);
-      setError(error.response?.data?.error || "فشل تحليل الملف، يرجى المحاولة مرة أخرى");
+      setError(error.response?.data?.error || error.message || "فشل تحليل الملف، يرجى المحاولة مرة أخرى");
     } finally {
       setIsLoading(false);
       event.target.value = '';
@@ -3,6 +3,7 @@
 import { useState } from "react";
 import { useRouter } from "next/navigation";
 import api from "@/lib/api"; 
+import { importCvFromPdf } from "@/lib/pdfImport";
 import { Loader2, Upload, Sparkles, AlertCircle } from "lucide-react";
 import { toast } from "sonner"; // لعرض التنبيهات بشكل جميل
 
@@ -55,16 +56,12 @@ export default function CreateResumePage() {
         return;
     }
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     setIsLoading(true);
     setError(null);
 
     try {
-      const { data } = await api.post('/parse-cv-pdf/', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
-      });
+      // الرفع بيرجع فوراً والتحليل بيكمل في الخلفية لحد ما النتيجة تجهز
+      const data = await importCvFromPdf(file);
 
       toast.success("تم استيراد الملف بنجاح!");
       
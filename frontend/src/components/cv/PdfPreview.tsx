@@ -1,7 +1,7 @@
 "use client";
 
-import { useState, useEffect, useCallback } from "react";
-import api from "@/lib/api";
+import { useState, useEffect } from "react";
+import { watchJobStatus } from "@/lib/jobStatus";
 
 interface PdfPreviewProps {
   resumeId: string;
@@ -18,40 +18,35 @@ export default function PdfPreview({ resumeId }: PdfPreviewProps) {
   const [pdfUrl, setPdfUrl] = useState<string | null>(null);
 
   /**
-   * دالة فحص حالة الملف من السيرفر
+   * متابعة حالة الملف من السيرفر (WebSocket، والـ Polling كـ Fallback)
    */
-  const checkJobStatus = useCallback(async () => {
-    try {
-      // نستخدم الـ ID للتحقق من حالة المهمة في الـ Backend
-      const { data } = await api.get(`/check-job-status/${resumeId}/`);
-      
-      if (data.status === 'SUCCESS' && data.pdf_url) {
-        // تم الانتهاء بنجاح
-        setPdfUrl(data.pdf_url); // حفظ الرابط القادم من السيرفر
-        setPdfError(null);
-        setIsChecking(false);
-      } else if (data.status === 'FAILED') {
-        // حدث خطأ في السيرفر
-        setPdfError(data.error || "The PDF file could not be generated.");
-        setIsChecking(false);
-      } else {
-        // ما زال قيد المعالجة (QUEUED أو PROCESSING)
-        setIsChecking(true);
-        // نعيد الفحص بعد ثانيتين
-        setTimeout(checkJobStatus, 2000);
-      }
-    } catch (err) {
-      console.error(err);
-      setPdfError("Unable to check PDF availability");
-      setIsChecking(false);
-    }
-  }, [resumeId]);
-
-  // تشغيل الفحص عند التحميل أو عند الضغط على تحديث
   useEffect(() => {
     setIsChecking(true);
-    checkJobStatus();
-  }, [checkJobStatus, refreshKey]);
+
+    return watchJobStatus(
+      resumeId,
+      (data) => {
+        if (data.status === 'SUCCESS' && data.pdf_url) {
+          // تم الانتهاء بنجاح
+          setPdfUrl(data.pdf_url); // حفظ الرابط القادم من السيرفر
+          setPdfError(null);
+          setIsChecking(false);
+        } else if (data.status === 'FAILED' || data.status === 'CANCELLED') {
+          // حدث خطأ في السيرفر
+          setPdfError(data.error || "The PDF file could not be generated.");
+          setIsChecking(false);
+        } else {
+          // ما زال قيد المعالجة (QUEUED أو PROCESSING)
+          setIsChecking(true);
+        }
+      },
+      (err) => {
+        console.error(err);
+        setPdfError("Unable to check PDF availability");
+        setIsChecking(false);
+      }
+    );
+  }, [resumeId, refreshKey]);
 
   /**
    * Handle refresh button click.
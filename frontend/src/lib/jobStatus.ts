@@ -0,0 +1,95 @@
+import api from './api';
+
+export interface JobStatus {
+    job_id: string;
+    status: 'QUEUED' | 'PROCESSING' | 'SUCCESS' | 'FAILED' | 'CANCELLED';
+    created_at: string;
+    pdf_url?: string;
+    completed_at?: string;
+    duration_seconds?: number;
+    error?: string;
+    message?: string;
+}
+
+export interface CvDataEvent {
+    type: 'cv_data.partial' | 'cv_data.complete';
+    job_id: string;
+    cv_data: Record<string, unknown>;
+}
+
+const TERMINAL_STATUSES = ['SUCCESS', 'FAILED', 'CANCELLED'];
+const POLL_INTERVAL_MS = 2000;
+const LONG_POLL_WAIT_SECONDS = 25;
+
+const wsBaseUrl = () => {
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api';
+    return apiUrl.replace(/^http/, 'ws').replace(/\/api\/?$/, '');
+};
+
+/**
+ * ✅ Follow a CompileJob until it reaches a terminal status
+ * Updates are pushed over ws/jobs/<job_id>/; if the socket can't be used,
+ * falls back to long-polling /check-job-status/<job_id>/?wait=N
+ * The same socket streams the generated cv_data (partial sections, then the complete object) to onCvData
+ *
+ * Returns a cleanup function (closes the socket / stops polling)
+ */
+export function watchJobStatus(
+    jobId: string,
+    onStatus: (status: JobStatus) => void,
+    onError: (error: unknown) => void,
+    onCvData?: (event: CvDataEvent) => void
+): () => void {
+    let stopped = false;
+    let done = false;
+    let socket: WebSocket | null = null;
+    let timer: ReturnType<typeof setTimeout> | null = null;
+
+    const handle = (status: JobStatus) => {
+        if (stopped) return;
+        done = TERMINAL_STATUSES.includes(status.status);
+        onStatus(status);
+    };
+
+    // Long-poll: the server holds the request until the status changes (the browser sends If-None-Match)
+    const poll = async () => {
+        if (stopped || done) return;
+        const started = Date.now();
+        try {
+            const { data } = await api.get(`/check-job-status/${jobId}/?wait=${LONG_POLL_WAIT_SECONDS}`);
+            handle(data);
+            if (!done) timer = setTimeout(poll, Math.max(0, POLL_INTERVAL_MS - (Date.now() - started)));
+        } catch (err) {
+            if (!stopped) onError(err);
+        }
+    };
+
+    const token = typeof window !== 'undefined' ? localStorage.getItem('auth_token') : null;
+    if (typeof WebSocket === 'undefined' || !token) {
+        poll();
+    } else {
+        socket = new WebSocket(`${wsBaseUrl()}/ws/jobs/${jobId}/?token=${encodeURIComponent(token)}`);
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (typeof message.type === 'string' && message.type.startsWith('cv_data.')) {
+                if (!stopped) onCvData?.(message);
+            } else {
+                handle(message);
+            }
+        };
+        // Socket closed before a final status (network, server restart, ...): polling takes over
+        socket.onclose = () => {
+            socket = null;
+            poll();
+        };
+    }
+
+    return () => {
+        stopped = true;
+        if (timer) clearTimeout(timer);
+        if (socket) {
+            socket.onclose = null;
+            socket.close();
+        }
+    };
+}
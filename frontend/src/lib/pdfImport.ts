@@ -0,0 +1,48 @@
+import api from './api';
+
+export interface PdfImportResult {
+    import_id: string;
+    status: 'SUCCESS';
+    job_id: string | null;
+    cv_data: Record<string, any>;
+    is_guest: boolean;
+}
+
+const POLL_INTERVAL_MS = 1500;
+const MAX_WAIT_MS = 3 * 60 * 1000;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * ✅ Upload a PDF and wait for the background import to finish
+ * POST /parse-cv-pdf/ returns an import_id right away; the result comes from /import-status/<id>/
+ */
+export async function importCvFromPdf(file: File): Promise<PdfImportResult> {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    const { data: started } = await api.post('/parse-cv-pdf/', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' }
+    });
+
+    // Same file was parsed before: the result comes back with the upload
+    if (started.status === 'SUCCESS') {
+        return started as PdfImportResult;
+    }
+
+    const deadline = Date.now() + MAX_WAIT_MS;
+    while (Date.now() < deadline) {
+        await sleep(POLL_INTERVAL_MS);
+        const { data } = await api.get(`/import-status/${started.import_id}/`);
+
+        if (data.status === 'SUCCESS') {
+            return data as PdfImportResult;
+        }
+        if (data.status === 'FAILED') {
+            throw new Error(data.error || 'فشل تحليل الملف، يرجى المحاولة مرة أخرى');
+        }
+        // QUEUED أو PROCESSING: نكمل انتظار
+    }
+
+    throw new Error('استغرق تحليل الملف وقتاً أطول من المتوقع، يرجى المحاولة مرة أخرى');
+}